@@ -0,0 +1,82 @@
+"""
+Compares the first-line block classifier with the original per-line classifier on huge list, quote
+and paragraph blocks.
+
+    python3 bench/bench_blocks.py [--repeat N]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from blocks import block_to_blocktype
+
+
+def legacy_get_list_seperator(block):
+    for line in block.split("\n"):
+        if not line:
+            continue
+        for marker in "-*+":
+            if line.startswith(marker):
+                return f"{marker} ", True
+        return "", False
+    return "", False
+
+
+def legacy_block_to_blocktype(block):
+    """The original classifier: splits the block twice and checks every line against every type"""
+    is_quote, is_ordered_list = True, True
+    lines = block.split("\n")
+    list_seperator, is_unordered_list = legacy_get_list_seperator(block)
+    if len(lines[0]) >= 3 and len(lines[-1]) >= 3 and lines[0][:3] == "```" and lines[-1][-3:] == "```":
+        return "code"
+    for i, line in enumerate(lines):
+        length = min(6, len(line) - 1)
+        for j in range(length):
+            if line[j] == "#":
+                if line[j + 1] == " ":
+                    return "heading"
+            else:
+                break
+        if length > 0 and line[0] != ">":
+            is_quote = False
+        if not line.startswith(list_seperator):
+            is_unordered_list = False
+        if not line.startswith(f"{i+1}. "):
+            is_ordered_list = False
+    if is_quote:
+        return "quote"
+    elif is_unordered_list:
+        return "unordered list"
+    elif is_ordered_list:
+        return "ordered list"
+    return "paragraph"
+
+
+def synthetic_blocks(lines: int) -> dict[str, str]:
+    return {
+        "unordered list": "\n".join(f"- item number {i} with a few words" for i in range(lines)),
+        "ordered list": "\n".join(f"{i + 1}. item number {i} with a few words" for i in range(lines)),
+        "quote": "\n".join(f"> quoted line {i} with a few words" for i in range(lines)),
+        "paragraph": "\n".join(f"plain line {i} with a few words" for i in range(lines)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'block':>15} {'lines':>8} {'legacy (ms)':>12} {'classifier (ms)':>16} {'speedup':>8}")
+    for lines in (1_000, 10_000, 100_000):
+        for name, block in synthetic_blocks(lines).items():
+            assert legacy_block_to_blocktype(block) == block_to_blocktype(block).value
+            legacy = min(timeit.repeat(lambda: legacy_block_to_blocktype(block), number=1, repeat=args.repeat))
+            classifier = min(timeit.repeat(lambda: block_to_blocktype(block), number=1, repeat=args.repeat))
+            print(f"{name:>15} {lines:>8} {legacy * 1000:>12.2f} {classifier * 1000:>16.2f} {legacy / classifier:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
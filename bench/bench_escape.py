@@ -0,0 +1,116 @@
+"""
+Measures what HTML escaping adds to to_html on a large document, by timing the same tree with the
+escaping serializer and with the original one that interpolated values unescaped. Exits 1 if escaping
+adds more than --limit.
+
+    python3 bench/bench_escape.py [--blocks N] [--repeat N] [--limit 0.10]
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import htmlnode
+from blocks import markdown_to_html_node
+
+from corpus import synthetic_markdown
+
+SPECIAL_WORDS = ["a < b", "fish & chips", "x > y", "AT&T"]
+
+
+def with_special_characters(markdown: str, density: float, seed: int = 0) -> str:
+    """Replaces a fraction density of the plain words with ones that need escaping"""
+    rng = random.Random(seed)
+    words = markdown.split(" ")
+    for i, word in enumerate(words):
+        if word.isalpha() and rng.random() < density:
+            words[i] = rng.choice(SPECIAL_WORDS)
+    return " ".join(words)
+
+
+def legacy_props_to_html(self, url_rewriter=None):
+    if self.props is None:
+        return ""
+    if url_rewriter is None:
+        mapped = map(lambda element: f' {element[0]}="{element[1]}"', self.props.items())
+    else:
+        mapped = map(
+            lambda element: f' {element[0]}="{url_rewriter(element[1]) if element[0] in htmlnode.URL_ATTRIBUTES else element[1]}"',
+            self.props.items(),
+        )
+    return "".join(mapped)
+
+
+def legacy_leaf_to_html(self, url_rewriter=None):
+    if self.value is None and self.tag != "br":
+        raise ValueError("LeafNode must have a value, unless it is self-closing tag, i.e. <br>")
+    if self.tag == None:
+        return self.value
+    if self.tag == "br":
+        return f"<{self.tag}>"
+    return f"<{self.tag}{self.props_to_html(url_rewriter)}>{self.value}</{self.tag}>"
+
+
+def legacy_opening_tag(self, url_rewriter=None):
+    return f"<{self.tag}{self.props_to_html(url_rewriter)}>"
+
+
+LEGACY = {
+    (htmlnode.HTMLNode, "props_to_html"): legacy_props_to_html,
+    (htmlnode.HTMLNode, "opening_tag"): legacy_opening_tag,
+    (htmlnode.LeafNode, "to_html"): legacy_leaf_to_html,
+}
+
+
+def time_to_html(tree, escaping: bool) -> float:
+    originals = {key: getattr(*key) for key in LEGACY}
+    if not escaping:
+        for (cls, name), func in LEGACY.items():
+            setattr(cls, name, func)
+    try:
+        return timeit.timeit(tree.to_html, number=1)
+    finally:
+        for (cls, name), func in originals.items():
+            setattr(cls, name, func)
+
+
+def compare(tree, repeat: int) -> tuple[float, float]:
+    """
+    Best unescaped and escaping times. The two are timed alternately rather than one batch after the
+    other, so a slow stretch on the machine doesn't land on only one side of the comparison
+    """
+    plain = escaped = float("inf")
+    for _ in range(repeat):
+        plain = min(plain, time_to_html(tree, escaping=False))
+        escaped = min(escaped, time_to_html(tree, escaping=True))
+    return plain, escaped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--blocks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--limit", type=float, default=0.10, help="allowed overhead as a fraction (default: 0.10)")
+    args = parser.parse_args()
+
+    markdown = synthetic_markdown(args.blocks)
+    print(f"{len(markdown) / 1024:.0f} KiB of markdown")
+    print(f"{'special words':>14} {'unescaped (ms)':>17} {'escaping (ms)':>14} {'overhead':>9}")
+    worst = 0.0
+    for density in (0.0, 0.01, 0.05):
+        tree = markdown_to_html_node(with_special_characters(markdown, density))
+        plain, escaped = compare(tree, args.repeat)
+        overhead = escaped / plain - 1
+        worst = max(worst, overhead)
+        print(f"{density:>14.0%} {plain * 1000:>17.2f} {escaped * 1000:>14.2f} {overhead:>+9.1%}")
+
+    if worst > args.limit:
+        sys.exit(f"Escaping adds {worst:.1%} to to_html, more than {args.limit:.0%}")
+
+
+if __name__ == "__main__":
+    main()
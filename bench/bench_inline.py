@@ -0,0 +1,101 @@
+"""
+Compares the single-pass inline tokenizer with the original five-pass pipeline
+(three split_nodes_delimiter passes, then the findall + str.split image and link splitters)
+on large synthetic paragraphs.
+
+    python3 bench/bench_inline.py [--repeat N]
+"""
+import argparse
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import memo
+from inline import split_nodes_delimiter, text_to_textnodes
+from textnode import TextNode, TextType
+
+
+def legacy_split(old_nodes, pattern, prefix, text_type):
+    """The pre-tokenizer image/link splitter: findall, then re-split the remaining text per match"""
+    result = []
+    for node in old_nodes:
+        if node.text_type != TextType.TEXT:
+            result.append(node)
+            continue
+        matches = re.findall(pattern, node.text)
+        if not matches:
+            result.append(node)
+            continue
+        current_text = node.text
+        for text, url in matches:
+            parts = current_text.split(f"{prefix}[{text}]({url})", 1)
+            if parts[0]:
+                result.append(TextNode(parts[0], TextType.TEXT))
+            result.append(TextNode(text, text_type, url))
+            current_text = parts[1] if len(parts) > 1 else ""
+        if current_text:
+            result.append(TextNode(current_text, TextType.TEXT))
+    return result
+
+
+def legacy_text_to_textnodes(text):
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = legacy_split(nodes, r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", "!", TextType.IMAGE)
+    nodes = legacy_split(nodes, r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", "", TextType.LINK)
+    return nodes
+
+
+def synthetic_paragraph(words: int, link_every: int, formatting: bool = True, seed: int = 0) -> str:
+    """
+    A paragraph of roughly `words` words with a link or image every `link_every` words, and bold,
+    italic and code spans sprinkled in when formatting is set
+    """
+    rng = random.Random(seed)
+    parts = []
+    for i in range(words):
+        if i % link_every == 0:
+            if rng.random() < 0.2:
+                parts.append(f"![image {i}](/images/{i}.png)")
+            else:
+                parts.append(f"[link {i}](/page/{i})")
+        elif not formatting:
+            parts.append(rng.choice(["lorem", "ipsum", "dolor", "sit", "amet", "elvish", "valinor"]))
+        elif i % 11 == 0:
+            parts.append(f"**bold {i}**")
+        elif i % 13 == 0:
+            parts.append(f"_italic {i}_")
+        elif i % 17 == 0:
+            parts.append(f"`code {i}`")
+        else:
+            parts.append(rng.choice(["lorem", "ipsum", "dolor", "sit", "amet", "elvish", "valinor"]))
+    return " ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    # time the tokenizer itself rather than memo hits on the repeated paragraph
+    memo.configure(0)
+
+    print(f"{'words':>8} {'links':>8} {'formatting':>10} {'legacy (ms)':>12} {'tokenizer (ms)':>15} {'speedup':>8}")
+    for words, link_every, formatting in [
+        (1_000, 10, True), (10_000, 10, True), (100_000, 3, True),
+        (1_000, 10, False), (10_000, 10, False), (100_000, 3, False),
+    ]:
+        text = synthetic_paragraph(words, link_every, formatting)
+        assert legacy_text_to_textnodes(text) == text_to_textnodes(text)
+        legacy = min(timeit.repeat(lambda: legacy_text_to_textnodes(text), number=1, repeat=args.repeat))
+        tokenizer = min(timeit.repeat(lambda: text_to_textnodes(text), number=1, repeat=args.repeat))
+        print(f"{words:>8} {words // link_every:>8} {str(formatting):>10} {legacy * 1000:>12.2f} {tokenizer * 1000:>15.2f} {legacy / tokenizer:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
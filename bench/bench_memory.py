@@ -0,0 +1,74 @@
+"""
+Measures peak memory per page with tracemalloc while parsing synthetic pages into HTMLNode trees and
+rendering them, once with the __slots__ node classes and once with the same classes rebuilt without
+__slots__ (every instance carrying a __dict__, as before).
+
+    python3 bench/bench_memory.py [--pages N] [--blocks N]
+"""
+import argparse
+import importlib
+import re
+import sys
+import tracemalloc
+import types
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import synthetic_markdown
+
+NODE_MODULES = ("htmlnode", "textnode")
+DEPENDENT_MODULES = ("inline", "blocks")
+
+
+def load_blocks_module(with_slots: bool):
+    """Imports a fresh copy of blocks, with the node classes rebuilt without __slots__ if asked"""
+    for name in NODE_MODULES + DEPENDENT_MODULES:
+        sys.modules.pop(name, None)
+    if not with_slots:
+        for name in NODE_MODULES:
+            path = SRC / f"{name}.py"
+            source = re.sub(r"^(\s*)__slots__ = .*$", r"\1pass", path.read_text(), flags=re.M)
+            module = types.ModuleType(name)
+            module.__file__ = str(path)
+            sys.modules[name] = module
+            exec(compile(source, str(path), "exec"), module.__dict__)
+    return importlib.import_module("blocks")
+
+
+def peak_per_page(blocks_module, pages: list[str]) -> list[int]:
+    peaks = []
+    for md in pages:
+        tracemalloc.start()
+        node = blocks_module.markdown_to_html_node(md)
+        node.to_html()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del node
+    return peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--blocks", type=int, default=400)
+    args = parser.parse_args()
+
+    pages = [synthetic_markdown(args.blocks, seed) for seed in range(args.pages)]
+    corpus_bytes = sum(len(md) for md in pages)
+    print(f"{args.pages} pages, {corpus_bytes / args.pages / 1024:.0f} KiB of markdown per page")
+
+    results = {}
+    for label, with_slots in (("__dict__", False), ("__slots__", True)):
+        peaks = peak_per_page(load_blocks_module(with_slots), pages)
+        results[label] = sum(peaks) / len(peaks)
+        print(f"{label:>10}: mean peak {results[label] / 1024:8.0f} KiB/page, max {max(peaks) / 1024:8.0f} KiB")
+
+    saved = 1 - results["__slots__"] / results["__dict__"]
+    print(f"__slots__ saves {saved:.0%} of peak memory per page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Load test for the preview server: builds a synthetic site, serves it with `main.py serve` (and with
+`python3 -m http.server` for comparison) and fetches pages and assets from N client threads, some
+of them revalidating with If-None-Match. Reports throughput and latency percentiles.
+
+    python3 bench/bench_serve.py [--clients N] [--requests N] [--pages N] [--no-compare]
+"""
+import argparse
+import http.client
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_server import percentile
+from corpus import write_corpus
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "main.py"
+
+
+def start(command: list[str], cwd: Path, banner: str) -> tuple[subprocess.Popen, int]:
+    """Starts a server and reads its port from the first line matching banner"""
+    server = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in server.stdout:
+        match = re.search(banner, line)
+        if match:
+            return server, int(match.group(1))
+    raise Exception(f"{command[0]} exited before it was ready")
+
+
+def client(port: int, paths: list[str], revalidate: int, latencies: list[float], transferred: list[int]) -> None:
+    """Fetches paths in turn on one keep-alive connection, sending every revalidate-th one with its last ETag"""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    etags = {}
+    for i, path in enumerate(paths):
+        headers = {"Accept-Encoding": "gzip"}
+        if revalidate and i % revalidate == 0 and path in etags:
+            headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status not in (200, 304):
+            raise Exception(f"GET {path} failed with status {response.status}")
+        transferred.append(len(body))
+        if response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    connection.close()
+
+
+def load(port: int, urls: list[str], clients: int, requests: int, revalidate: int) -> None:
+    latencies = []
+    transferred = []
+    per_client = requests // clients
+    threads = [
+        threading.Thread(target=client, args=(port, [urls[(c * 7 + i) % len(urls)] for i in range(per_client)],
+                                              revalidate, latencies, transferred))
+        for c in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"  {len(latencies)} requests in {elapsed:.2f}s: {len(latencies) / elapsed:.0f} requests/s, "
+          f"{sum(transferred) / elapsed / 1e6:.1f} MB/s")
+    print(f"  latency (ms): p50 {percentile(latencies, 0.5) * 1000:.2f}  p95 {percentile(latencies, 0.95) * 1000:.2f}  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f}  max {latencies[-1] * 1000:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=16, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=4000, help="requests in total")
+    parser.add_argument("--pages", type=int, default=100, help="pages in the synthetic site")
+    parser.add_argument("--revalidate", type=int, default=3, help="send every Nth request with If-None-Match, 0 for never")
+    parser.add_argument("--no-compare", action="store_true", help="skip the python -m http.server run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        write_corpus(root, args.pages, blocks=30)
+        (root / "static").mkdir()
+        (root / "static" / "index.css").write_text("body { margin: 0 }\n" * 200)
+        (root / "static" / "large.bin").write_bytes(bytes(range(256)) * 8192)
+        subprocess.run([sys.executable, str(MAIN), "--compress"], cwd=root, check=True, stdout=subprocess.DEVNULL)
+
+        docs = root / "docs"
+        urls = ["/" + path.relative_to(docs).as_posix().removesuffix("index.html")
+                for path in sorted(docs.rglob("*.html"))]
+        urls += ["/index.css", "/large.bin"]
+
+        servers = {"main.py serve": ([sys.executable, "-u", str(MAIN), "serve", "--port", "0", "--quiet"], root, r":(\d+)/")}
+        if not args.no_compare:
+            servers["http.server"] = ([sys.executable, "-u", "-m", "http.server", "0", "--bind", "127.0.0.1"], docs, r"port (\d+)")
+        for label, (command, cwd, banner) in servers.items():
+            print(f"{label}:")
+            server, port = start(command, cwd, banner)
+            try:
+                load(port, urls, args.clients, args.requests, args.revalidate)
+            finally:
+                server.send_signal(signal.SIGINT)
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
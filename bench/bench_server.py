@@ -0,0 +1,107 @@
+"""
+Load generator for the render server: starts `main.py render-server`, sends markdown pages from N
+client threads over keep-alive connections and reports throughput, client latency percentiles and
+the server's own /metrics.
+
+    python3 bench/bench_server.py [--clients N] [--requests N] [--workers N] [--blocks N]
+"""
+import argparse
+import http.client
+import json
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import TEMPLATE, synthetic_markdown
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "main.py"
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def client(port: int, sources: list[str], latencies: list[float]) -> None:
+    """Renders each source in turn on one connection, appending the latency of each request"""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    for source in sources:
+        start = time.perf_counter()
+        connection.request("POST", "/render", source.encode())
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise Exception(f"render failed with status {response.status}")
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=8, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=2000, help="requests in total")
+    parser.add_argument("--workers", type=int, default=None, help="render-server worker processes")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--blocks", type=int, default=20, help="blocks per page")
+    args = parser.parse_args()
+
+    sources = [synthetic_markdown(args.blocks, seed=i) for i in range(64)]
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "template.html").write_text(TEMPLATE)
+        (root / "content").mkdir()
+        command = [sys.executable, "-u", str(MAIN), "render-server", "/site/", "--port", "0", "--quiet"]
+        if args.workers is not None:
+            command += ["--workers", str(args.workers)]
+        if args.batch_size is not None:
+            command += ["--batch-size", str(args.batch_size)]
+        server = subprocess.Popen(command, cwd=root, stdout=subprocess.PIPE, text=True)
+        try:
+            # "Rendering on http://127.0.0.1:PORT/render ..."
+            banner = server.stdout.readline()
+            print(banner.strip())
+            port = int(banner.split("://")[1].split("/")[0].rsplit(":", 1)[1])
+
+            # warm the workers up before measuring
+            client(port, sources[:8], [])
+
+            latencies = []
+            per_client = args.requests // args.clients
+            threads = [
+                threading.Thread(target=client, args=(port, [sources[(c + i) % len(sources)] for i in range(per_client)], latencies))
+                for c in range(args.clients)
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            connection.request("GET", "/metrics")
+            metrics = json.loads(connection.getresponse().read())
+            connection.close()
+        finally:
+            # an interrupt lets the server shut its worker pool down, where terminate() would orphan the workers
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+    latencies.sort()
+    print(f"{len(latencies)} requests from {args.clients} clients in {elapsed:.2f}s: {len(latencies) / elapsed:.0f} pages/s")
+    print(f"client latency (ms): p50 {percentile(latencies, 0.5) * 1000:.2f}  p95 {percentile(latencies, 0.95) * 1000:.2f}  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f}  max {latencies[-1] * 1000:.2f}")
+    print(f"server: {metrics['requests']} requests in {metrics['batches']} batches, "
+          f"{metrics['requests'] / max(1, metrics['batches']):.1f} per batch")
+    for name in ("latency_ms", "render_ms"):
+        stats = metrics[name]
+        print(f"server {name}: p50 {stats['p50']:.2f}  p95 {stats['p95']:.2f}  p99 {stats['p99']:.2f}  max {stats['max']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures CLI startup: wall time of short commands against a bare interpreter, and where the import
+time goes according to python -X importtime.
+
+    python3 bench/bench_startup.py [--repeat N] [--top N]
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import TEMPLATE, synthetic_markdown
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "main.py"
+
+
+def run(args: list[str], cwd: Path, importtime: bool = False) -> tuple[float, str]:
+    """Runs python with args, returning the wall time and stderr"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """(nesting depth, cumulative us, module) for every import in -X importtime output"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        # nested imports are indented by two spaces per level, under the module that triggered them
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((depth, int(cumulative), name.strip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=8, help="slowest imports listed per command")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "template.html").write_text(TEMPLATE)
+        (root / "content").mkdir()
+        (root / "content" / "index.md").write_text(synthetic_markdown(20))
+        (root / "static").mkdir()
+
+        commands = {
+            "python -c pass": ["-c", "pass"],
+            "render-one": [str(MAIN), "render-one", "content/index.md", "/site/"],
+            "build (no changes)": [str(MAIN), "/site/"],
+        }
+        # the first runs build docs/ and warm the bytecode cache
+        for command in commands.values():
+            run(command, root)
+
+        print(f"{'command':>20} {'best (ms)':>10} {'imports (ms)':>13}")
+        imports = {}
+        for label, command in commands.items():
+            best = min(run(command, root)[0] for _ in range(args.repeat))
+            imports[label] = parse_importtime(run(command, root, importtime=True)[1])
+            total = sum(cumulative for depth, cumulative, _ in imports[label] if depth == 0)
+            print(f"{label:>20} {best * 1000:>10.1f} {total / 1000:>13.1f}")
+
+        for label in ("render-one", "build (no changes)"):
+            print(f"\nSlowest top level imports for {label} (cumulative):")
+            top_level = [(cumulative, name) for depth, cumulative, name in imports[label] if depth == 0]
+            for cumulative, name in sorted(top_level, reverse=True)[:args.top]:
+                print(f"{cumulative / 1000:>10.2f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Synthetic markdown corpora for the benchmarks"""
+import random
+from pathlib import Path
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "elvish", "valinor", "hobbit", "shire", "mithril", "rivendell"]
+
+TEMPLATE = """<!doctype html>
+<html>
+    <head>
+        <title>{{ Title }}</title>
+        <link href="/index.css" rel="stylesheet" />
+    </head>
+    <body>
+        <article>{{ Content }}</article>
+    </body>
+</html>
+"""
+
+
+def synthetic_sentence(rng: random.Random, words: int, link_density: float = 0.04) -> str:
+    """Words with links (a fraction link_density of them) and some bold, italic and code spans"""
+    parts = []
+    for i in range(words):
+        roll = rng.random()
+        if roll < link_density:
+            parts.append(f"[{rng.choice(WORDS)}](/{rng.choice(WORDS)}/{i})")
+        elif roll < link_density + 0.02:
+            parts.append(f"**{rng.choice(WORDS)}**")
+        elif roll < link_density + 0.04:
+            parts.append(f"_{rng.choice(WORDS)}_")
+        elif roll < link_density + 0.05:
+            parts.append(f"`{rng.choice(WORDS)}`")
+        else:
+            parts.append(rng.choice(WORDS))
+    return " ".join(parts)
+
+
+def synthetic_markdown(blocks: int, seed: int = 0, paragraph_words: int = 60, link_density: float = 0.04,
+                       list_items: int = 8, code_lines: int = 6) -> str:
+    """
+    A page with a title followed by `blocks` blocks cycling through headings, unordered and ordered lists
+    of about list_items items, quotes, fenced code of about code_lines lines and paragraphs of about
+    paragraph_words words
+    """
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return synthetic_sentence(rng, words, link_density)
+
+    def about(n: int) -> int:
+        return max(1, rng.randint(n // 2, n + n // 2))
+
+    out = [f"# {sentence(4)}"]
+    for i in range(blocks):
+        kind = i % 6
+        if kind == 0:
+            out.append(f"## {sentence(5)}")
+        elif kind == 1:
+            out.append("\n".join(f"- {sentence(8)}" for _ in range(about(list_items))))
+        elif kind == 2:
+            out.append("\n".join(f"{n}. {sentence(8)}" for n in range(1, about(list_items) + 1)))
+        elif kind == 3:
+            out.append("\n".join(f"> {sentence(12)}" for _ in range(rng.randint(2, 5))))
+        elif kind == 4:
+            out.append("```\n" + "\n".join(sentence(6) for _ in range(about(code_lines))) + "\n```")
+        else:
+            words = about(paragraph_words)
+            out.append("\n".join(sentence(15) for _ in range(max(1, words // 15))))
+    return "\n\n".join(out) + "\n"
+
+
+def write_corpus(root: Path, pages: int, depth: int = 2, fanout: int = 4, blocks: int = 60, **page_options) -> list[Path]:
+    """
+    Writes `pages` synthetic markdown pages under root/content, spread over directories nested up to
+    `depth` levels with `fanout` subdirectories each, plus a template at root/template.html.
+    Returns the page paths
+    """
+    content = root / "content"
+    paths = []
+    for i in range(pages):
+        directory = content
+        n = i
+        for _ in range(depth):
+            directory = directory / f"section{n % fanout}"
+            n //= fanout
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"page{i}.md"
+        path.write_text(synthetic_markdown(blocks, seed=i, **page_options))
+        paths.append(path)
+    (root / "template.html").write_text(TEMPLATE)
+    return paths
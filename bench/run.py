@@ -0,0 +1,199 @@
+"""
+Benchmarks each stage of the build on a synthetic corpus and optionally checks the timings against a
+stored baseline.
+
+    python3 bench/run.py [--pages N] [--blocks N] ... [--output results.json]
+    python3 bench/run.py --output bench/baseline.json            # store a baseline
+    python3 bench/run.py --baseline bench/baseline.json          # exit 1 if a stage regressed
+
+Timings are the best of --repeat runs. Baselines are only comparable on the same machine and corpus
+settings, so the corpus configuration is stored alongside them and checked before comparing.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import blocks
+import memo
+import minify
+import searchindex
+from blocks import block_to_blocktype, block_to_html_node, markdown_to_blocks
+from generate_page import extract_title, generate_pages_incremental
+from htmlnode import ParentNode
+from inline import text_to_textnodes
+from manifest import BuildManifest, MANIFEST_NAME
+from template import Template
+
+from corpus import TEMPLATE, write_corpus
+
+CONFIG_KEYS = ("pages", "blocks", "depth", "paragraph_words", "link_density", "list_items", "code_lines")
+
+
+def best_of(repeat: int, func) -> float:
+    """Best wall time of func over repeat runs, each starting with empty inline memos"""
+    times = []
+    for _ in range(repeat):
+        memo.clear()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def record_inline_texts(sources: list[str]) -> list[str]:
+    """Every string the block builders hand to the inline tokenizer while converting the sources"""
+    texts = []
+    original = blocks.tokenize_inline
+
+    def recording(text, depth, result):
+        texts.append(text)
+        return original(text, depth, result)
+
+    blocks.tokenize_inline = recording
+    memo.clear()
+    try:
+        for md in sources:
+            for block in markdown_to_blocks(md):
+                block_to_html_node(block)
+    finally:
+        blocks.tokenize_inline = original
+    return texts
+
+
+def run_stages(root: Path, paths: list[Path], repeat: int) -> dict[str, float]:
+    stages = {}
+
+    stages["read"] = best_of(repeat, lambda: [path.read_text() for path in paths])
+    sources = [path.read_text() for path in paths]
+
+    stages["markdown_to_blocks"] = best_of(repeat, lambda: [markdown_to_blocks(md) for md in sources])
+    all_blocks = [block for md in sources for block in markdown_to_blocks(md)]
+
+    stages["block_to_blocktype"] = best_of(repeat, lambda: [block_to_blocktype(block) for block in all_blocks])
+
+    inline_texts = record_inline_texts(sources)
+    stages["text_to_textnodes"] = best_of(repeat, lambda: [text_to_textnodes(text) for text in inline_texts])
+
+    stages["block_to_html_node"] = best_of(repeat, lambda: [block_to_html_node(block) for block in all_blocks])
+    trees = [ParentNode("div", [block_to_html_node(block) for block in markdown_to_blocks(md)]) for md in sources]
+
+    stages["to_html"] = best_of(repeat, lambda: [tree.to_html() for tree in trees])
+    contents = [tree.to_html() for tree in trees]
+    titles = [extract_title(md) for md in sources]
+
+    template = Template(TEMPLATE, "/site/")
+    stages["template"] = best_of(
+        repeat, lambda: [template.render({"Title": title, "Content": content}) for title, content in zip(titles, contents)]
+    )
+    pages = [template.render({"Title": title, "Content": content}) for title, content in zip(titles, contents)]
+
+    out = root / "written"
+    out.mkdir()
+    outputs = [out / f"page{i}.html" for i in range(len(pages))]
+    stages["write"] = best_of(repeat, lambda: [path.write_text(page) for path, page in zip(outputs, pages)])
+
+    def full_build(pipeline=False, minify_output=False, search_index=False):
+        docs = root / "docs"
+        (docs / MANIFEST_NAME).unlink(missing_ok=True)
+        (docs / searchindex.SEARCH_INDEX_NAME).unlink(missing_ok=True)
+        docs.mkdir(exist_ok=True)
+        minify.configure(minify_output)
+        searchindex.configure(search_index)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_incremental(root / "content", root / "template.html", docs, "/site/",
+                                           BuildManifest.load(docs / MANIFEST_NAME), pipeline=pipeline)
+        finally:
+            minify.configure(False)
+            searchindex.configure(False)
+
+    stages["full_build"] = best_of(repeat, full_build)
+    stages["pipeline_build"] = best_of(repeat, lambda: full_build(pipeline=True))
+    stages["minified_build"] = best_of(repeat, lambda: full_build(minify_output=True))
+    stages["indexed_build"] = best_of(repeat, lambda: full_build(search_index=True))
+    return stages
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float) -> list[str]:
+    """
+    Returns the stages that are more than threshold (a fraction) slower than the baseline. Stages that
+    slowed down by less than min_delta seconds are ignored, since tiny stages are mostly timer noise
+    """
+    regressions = []
+    print(f"{'stage':>20} {'baseline (ms)':>14} {'current (ms)':>13} {'change':>8}")
+    for stage, seconds in results["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            print(f"{stage:>20} {'-':>14} {seconds * 1000:>13.2f} {'new':>8}")
+            continue
+        change = seconds / base - 1
+        regressed = change > threshold and seconds - base > min_delta
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{stage:>20} {base * 1000:>14.2f} {seconds * 1000:>13.2f} {change:>+8.0%}{flag}")
+        if regressed:
+            regressions.append(stage)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--blocks", type=int, default=120, help="blocks per page")
+    parser.add_argument("--depth", type=int, default=2, help="directory nesting of the content tree")
+    parser.add_argument("--paragraph-words", type=int, default=60)
+    parser.add_argument("--link-density", type=float, default=0.04, help="fraction of words that are links")
+    parser.add_argument("--list-items", type=int, default=8)
+    parser.add_argument("--code-lines", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against a stored results file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown per stage before failing, as a fraction (default: 0.25)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="ignore slowdowns smaller than this many milliseconds (default: 2)")
+    args = parser.parse_args()
+
+    config = {key: getattr(args, key) for key in CONFIG_KEYS}
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        paths = write_corpus(root, args.pages, args.depth, blocks=args.blocks, paragraph_words=args.paragraph_words,
+                             link_density=args.link_density, list_items=args.list_items, code_lines=args.code_lines)
+        corpus_bytes = sum(path.stat().st_size for path in paths)
+        stages = run_stages(root, paths, args.repeat)
+
+    results = {
+        "config": config,
+        "corpus_bytes": corpus_bytes,
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "stages": stages,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline is None:
+        print(f"{args.pages} pages, {corpus_bytes / 1024:.0f} KiB of markdown")
+        for stage, seconds in stages.items():
+            print(f"{stage:>20} {seconds * 1000:>10.2f} ms")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("config") != config:
+        sys.exit(f"Baseline was recorded with a different corpus: {baseline.get('config')}")
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms / 1000)
+    if regressions:
+        sys.exit(f"Regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,4 @@
-python3 src/main.py
-cd docs && python3 -m http.server 8888
+python3 src/main.py --watch &
+WATCH_PID=$!
+trap 'kill $WATCH_PID' EXIT
+python3 src/main.py serve --host 0.0.0.0 --port 8888
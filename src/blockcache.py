@@ -0,0 +1,135 @@
+from pathlib import Path
+
+import profiler
+from blocks import PARSER_VERSION, block_to_html_node, iter_blocks
+from htmlnode import HTMLNode, ParentNode, RawHTMLNode
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# The open cache, or None when block caching is off. Set by open_cache so generate_page (and the
+# worker processes of a parallel build) can find it without threading it through every call
+current = None
+
+
+class BlockCache():
+    """
+    Persistent, content-addressed cache of rendered block HTML, stored in SQLite. Keys hash the raw block
+    together with the URL rewriting used to render it, so an edited page only parses its changed blocks.
+    Least recently used entries are evicted once the stored HTML exceeds max_bytes, and the whole cache is
+    dropped when PARSER_VERSION changes
+    """
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.used = []
+        self.added = []
+        # sqlite3 and hashlib are only imported once a cache is opened, they are among the slowest imports
+        import hashlib
+        import sqlite3
+        self.blake2b = hashlib.blake2b
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # parallel builds open one connection per worker, so wait on locks instead of failing
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS blocks (key BLOB PRIMARY KEY, html TEXT NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS blocks_used ON blocks (used)")
+            # a running total of the stored HTML, kept by the database so every worker's connection updates it
+            # and eviction never has to add up the whole table
+            if self.db.execute("SELECT value FROM meta WHERE key = 'size'").fetchone() is None:
+                self.db.execute("INSERT INTO meta SELECT 'size', COALESCE(SUM(size), 0) FROM blocks")
+            self.db.execute(
+                "CREATE TRIGGER IF NOT EXISTS blocks_insert AFTER INSERT ON blocks BEGIN "
+                "UPDATE meta SET value = value + NEW.size WHERE key = 'size'; END"
+            )
+            self.db.execute(
+                "CREATE TRIGGER IF NOT EXISTS blocks_delete AFTER DELETE ON blocks BEGIN "
+                "UPDATE meta SET value = value - OLD.size WHERE key = 'size'; END"
+            )
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'parser_version'").fetchone()
+            if row is None or row[0] != PARSER_VERSION:
+                self.db.execute("DELETE FROM blocks")
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('parser_version', ?)", (PARSER_VERSION,))
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'clock'").fetchone()
+        # a logical clock rather than wall time, so LRU order doesn't depend on the system clock
+        self.clock = int(row[0]) + 1 if row else 1
+
+    def key(self, block: str, url_key: str) -> bytes:
+        return self.blake2b(f"{url_key}\0{block}".encode(), digest_size=20).digest()
+
+    def block_node(self, block: str, url_key: str, url_rewriter=None) -> HTMLNode:
+        """Returns the block's rendered HTML as a RawHTMLNode, converting and storing it on a miss"""
+        key = self.key(block, url_key)
+        row = self.db.execute("SELECT html FROM blocks WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.hits += 1
+            profiler.count("block_cache_hits")
+            self.used.append(key)
+            return RawHTMLNode(row[0])
+        self.misses += 1
+        profiler.count("block_cache_misses")
+        html = block_to_html_node(block).to_html(url_rewriter)
+        self.added.append((key, html, len(html)))
+        return RawHTMLNode(html)
+
+    def stream_markdown_to_html_node(self, lines, url_key: str, url_rewriter=None) -> ParentNode:
+        """Cached version of blocks.stream_markdown_to_html_node"""
+        return ParentNode("div", (self.block_node(block, url_key, url_rewriter) for block in iter_blocks(lines)))
+
+    def flush(self) -> None:
+        """Writes new entries and recency updates to disk, then evicts down to max_bytes"""
+        if not self.used and not self.added:
+            return
+        with self.db:
+            self.db.executemany("UPDATE blocks SET used = ? WHERE key = ?", ((self.clock, key) for key in self.used))
+            # keys are content hashes, so a row another worker added meanwhile holds the same HTML. Replacing it
+            # would delete it without firing the delete trigger
+            self.db.executemany(
+                "INSERT INTO blocks VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET used = excluded.used",
+                ((key, html, size, self.clock) for key, html, size in self.added),
+            )
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('clock', ?)", (str(self.clock),))
+            self.evict()
+        self.used = []
+        self.added = []
+        self.clock += 1
+
+    def evict(self) -> None:
+        """Deletes the least recently used entries until the stored HTML fits in max_bytes"""
+        total = int(self.db.execute("SELECT value FROM meta WHERE key = 'size'").fetchone()[0])
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self.db.execute("SELECT key, size FROM blocks ORDER BY used"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.db.executemany("DELETE FROM blocks WHERE key = ?", doomed)
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+
+def open_cache(path: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> BlockCache:
+    """Opens the cache at path and makes it the one generate_page uses"""
+    global current
+    current = BlockCache(path, max_bytes)
+    return current
+
+
+def close_cache() -> BlockCache | None:
+    """Flushes and closes the cache generate_page uses, returning it"""
+    global current
+    cache, current = current, None
+    if cache is not None:
+        cache.close()
+    return cache
@@ -1,8 +1,18 @@
+from collections.abc import Iterator
 from enum import Enum
-from htmlnode import HTMLNode, ParentNode, LeafNode
-from inline import text_to_textnodes
+import profiler
+from memo import Memo
+from htmlnode import HTMLNode, ParentNode, LeafNode, FrozenLeafNode
+from inline import tokenize_inline
 from textnode import text_node_to_html_node
 
+# Version of the markdown to HTML conversion. Bump it whenever the same markdown would render
+# differently, so cached block HTML from older versions is thrown away
+PARSER_VERSION = "3"
+
+# Every empty quote line renders the same <br>, so they all share one immutable node
+LINE_BREAK = FrozenLeafNode("br", None)
+
 class BlockType(Enum):
     """Represents the type of formatting required for a given block of markdown text"""
     PARAGRAPH = "paragraph"
@@ -15,114 +25,148 @@ class BlockType(Enum):
 
 def markdown_to_blocks(markdown: str) -> list[str]:
     """Convert markdown to a list of markdown blocks as strings"""
-    blocks = list(map(lambda x: x.strip(), markdown.split("\n\n")))
-    blocks_ = [x for x in blocks if x]
-    return blocks_
+    return list(iter_blocks(markdown.split("\n")))
 
-def block_to_blocktype(block: str) -> BlockType:
-    """Returns the BlockType for a given block markdown  text"""
-    is_quote, is_unordered_list, is_ordered_list =  True, True, True
-    lines = block.split("\n")
+def iter_blocks(lines) -> Iterator[str]:
+    """
+    Lazily yields the markdown blocks from an iterable of lines, e.g. an open file, so only one block is
+    held in memory at a time. Blocks are separated by empty lines, except inside fenced code blocks
+    which are kept whole
+    """
+    block = []
+    in_fence = False
+    for line in lines:
+        line = line.removesuffix("\n")
+        if in_fence:
+            block.append(line)
+            if line.rstrip().endswith("```"):
+                in_fence = False
+            continue
 
-    list_seperator, is_unordered_list = get_list_seperator(block)
+        if not line:
+            text = "\n".join(block).strip()
+            if text:
+                yield text
+            block = []
+            continue
 
-    # code block check
-    if len(lines[0]) >= 3 and len(lines[-1])>= 3 and lines[0][:3] == "```" and lines[len(lines)-1][-3:] == "```":
-        return BlockType.CODE
+        block.append(line)
+        fence = line.strip()
+        # a fence opens unless the same line also closes it, e.g. ```code```
+        if fence.startswith("```") and not (len(fence) >= 6 and fence.endswith("```")):
+            in_fence = True
 
-    # rest of the checks require looking at each line, ergo: loopy time!
-    for i, line in enumerate(lines):
-        # checks if any of first 6 characters are a # followed by a space
-        length = min(6, len(line)-1)
-        for j in range(length):
-            if line[j] == "#":
-                if line[j+1] == " ":
-                    return BlockType.HEADING
-            else:
-                break
-
-        # bool checks
-        if length > 0 and line[0] != ">":
-            is_quote = False
-        if not line.startswith(list_seperator):
-            is_unordered_list = False
-        if not line.startswith(f"{i+1}. "):
-            is_ordered_list = False
-
-    if is_quote:
-        return BlockType.QUOTE
-    elif is_unordered_list:
-        return BlockType.UNORDERED_LIST
-    elif is_ordered_list:
-        return BlockType.ORDERED_LIST
-    else:
-        return BlockType.PARAGRAPH
-
-def get_list_seperator(block: str) -> tuple[str, bool]:
-    """Returns the unordered list seperator in the first position.
-    and a bool representing whether the block is an unordered list in the second position
+    text = "\n".join(block).strip()
+    if text:
+        yield text
+
+def block_to_blocktype(block: str) -> BlockType:
+    """Returns the BlockType for a given block markdown  text"""
+    return classify_block(block)[0]
+
+@profiler.timed("block_to_blocktype")
+def classify_block(block: str) -> tuple[BlockType, list[str]]:
+    """
+    Returns the BlockType for a block along with its lines, so the builders don't split it again.
+    The first line decides which type the block can be, and only that type is checked against the
+    remaining lines, stopping at the first line that doesn't fit
     """
     lines = block.split("\n")
-    for line in lines:
-        if not line:
-            continue
-        else:
-            if line.startswith("-"):
-                return "- ", True
-            if line.startswith("*"):
-                return "* ", True
-            if line.startswith("+"):
-                return "+ ", True
-            return "", False
-    return "", False
+    first = lines[0]
+
+    if first.startswith("```") and lines[-1].endswith("```"):
+        return BlockType.CODE, lines
+
+    match first[:1]:
+        case "#":
+            # 1 to 6 #s followed by a space
+            level = len(first) - len(first.lstrip("#"))
+            if level <= 6 and first[level:level + 1] == " ":
+                return BlockType.HEADING, lines
+
+        case ">":
+            if all(line.startswith(">") for line in lines):
+                return BlockType.QUOTE, lines
+
+        case "-" | "*" | "+":
+            marker = first[0] + " "
+            if all(line.startswith(marker) for line in lines):
+                return BlockType.UNORDERED_LIST, lines
+
+        case "1":
+            for number, line in enumerate(lines, 1):
+                if not line.startswith(f"{number}. "):
+                    break
+            else:
+                return BlockType.ORDERED_LIST, lines
+
+    return BlockType.PARAGRAPH, lines
 
 
 def markdown_to_html_node(markdown: str) -> ParentNode:
     """Convert markdown string to an HTMLNode tree."""
-    blocks = markdown_to_blocks(markdown)
-    nodes = []
-    for block in blocks:
-        block_type = block_to_blocktype(block)
-        match block_type:
-            case BlockType.CODE:
-                code = create_codeblock_html_node(block)
-                nodes.append(code)
-
-            case BlockType.QUOTE:
-                quote_node = create_quote_html_node(block)
-                nodes.append(quote_node)
-
-            case BlockType.HEADING:
-                heading = create_heading_html_node(block)
-                nodes.append(heading)
-
-            case BlockType.UNORDERED_LIST:
-                ul_node = create_list_html_node("ul", block)
-                nodes.append(ul_node)
-
-            case BlockType.ORDERED_LIST:
-                ol_node = create_list_html_node("ol", block)
-                nodes.append(ol_node)
-
-            case BlockType.PARAGRAPH:
-                paragraph_node = create_paragraph_html_node(block)
-                nodes.append(paragraph_node)
-
+    nodes = [block_to_html_node(block) for block in markdown_to_blocks(markdown)]
     return ParentNode("div", nodes)
 
+def stream_markdown_to_html_node(lines) -> ParentNode:
+    """
+    Like markdown_to_html_node, but reads lines lazily and converts each block only when the tree is
+    serialized, so peak memory is bounded by the largest block rather than the whole document.
+    The returned node can only be serialized once
+    """
+    return ParentNode("div", map(block_to_html_node, iter_blocks(lines)))
 
-def text_to_children(text: str) -> list[HTMLNode]:
-    """Convert markdown string to an array of HTMLNodes"""
-    text_nodes = text_to_textnodes(text)
-    html_nodes = []
+@profiler.timed("block_to_html_node")
+def block_to_html_node(block: str) -> HTMLNode:
+    """Convert a single markdown block to its HTMLNode"""
+    block_type, lines = classify_block(block)
+    match block_type:
+        case BlockType.CODE:
+            return create_codeblock_html_node(block)
+
+        case BlockType.QUOTE:
+            return create_quote_html_node(lines)
+
+        case BlockType.HEADING:
+            return create_heading_html_node(block)
+
+        case BlockType.UNORDERED_LIST:
+            return create_list_html_node("ul", lines)
+
+        case BlockType.ORDERED_LIST:
+            return create_list_html_node("ol", lines)
+
+        case BlockType.PARAGRAPH:
+            return create_paragraph_html_node(block)
+
+
+def children_fields(text: str) -> tuple[tuple, ...]:
+    """
+    The (tag, value, props items) of each LeafNode for text. Plain tuples, so memoized entries can't be
+    changed. Tokenizes directly, as the text_to_textnodes memo would only ever miss for the same text
+    """
+    text_nodes = []
+    tokenize_inline(text, 0, text_nodes)
+    fields = []
     for text_node in text_nodes:
         html_node = text_node_to_html_node(text_node)
-        html_nodes.append(html_node)
-    return html_nodes
+        fields.append((html_node.tag, html_node.value, tuple(html_node.props.items()) if html_node.props else None))
+    return tuple(fields)
 
-def create_list_html_node(tag: str, block: str) -> ParentNode:
-    """Creates a HTML Node for either an ordered or unordered list based on the input tag"""
-    lines = block.split("\n")
+children_memo = Memo("text_to_children", children_fields)
+
+@profiler.timed("text_to_children")
+def text_to_children(text: str) -> list[HTMLNode]:
+    """Convert markdown string to an array of HTMLNodes"""
+    if children_memo.maxsize <= 0:
+        # nothing is shared without the memo, so the nodes are handed out as built
+        text_nodes = []
+        tokenize_inline(text, 0, text_nodes)
+        return [text_node_to_html_node(text_node) for text_node in text_nodes]
+    return [LeafNode(tag, value, dict(props) if props else None) for tag, value, props in children_memo.lookup(text)]
+
+def create_list_html_node(tag: str, lines: list[str]) -> ParentNode:
+    """Creates a HTML Node for either an ordered or unordered list based on the input tag, from the block's lines"""
     line_nodes = []
     for line in lines:
         html_nodes = text_to_children(line[line.index(" ") + 1:])
@@ -151,9 +195,8 @@ def create_paragraph_html_node(block: str) -> ParentNode:
     html_nodes = text_to_children(text)
     return ParentNode("p", html_nodes)
 
-def create_quote_html_node(block: str) -> ParentNode:
-    """Creates a blockquote HTMLNode"""
-    lines = block.split("\n")
+def create_quote_html_node(lines: list[str]) -> ParentNode:
+    """Creates a blockquote HTMLNode from the block's lines"""
     paragraphs = []
 
     for line in lines:
@@ -163,6 +206,6 @@ def create_quote_html_node(block: str) -> ParentNode:
             html_nodes = text_to_children(content)
             paragraphs.extend(html_nodes)
         elif not content:
-            paragraphs.append(LeafNode("br", None))
+            paragraphs.append(LINE_BREAK)
 
     return ParentNode("blockquote", paragraphs)
@@ -0,0 +1,134 @@
+import os
+import time
+from pathlib import Path
+
+import profiler
+
+# Sidecar codecs, by the suffix servers look for next to the file (nginx gzip_static wants .gz)
+CODECS = ("gz", "xz")
+DEFAULT_CODECS = ("gz",)
+
+# Outputs worth compressing. Images and fonts are compressed already
+COMPRESS_SUFFIXES = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".txt", ".xml", ".map"}
+
+# Smaller files gain a few bytes at best, less than the extra request header costs
+MIN_SIZE = 256
+
+
+def compress_bytes(data: bytes, codec: str) -> bytes:
+    """Compresses data, without timestamps so unchanged input gives identical output"""
+    if codec == "gz":
+        import gzip
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if codec == "xz":
+        import lzma
+        # the default preset, 6. Preset 9 only adds a 64 MiB dictionary, which costs about 70 MB per worker
+        # and compresses nothing smaller than the default 8 MiB one any better
+        return lzma.compress(data)
+    raise ValueError(f"Unknown codec {codec!r}, expected one of {', '.join(CODECS)}")
+
+
+def parse_codecs(text: str) -> tuple[str, ...]:
+    """Parses a comma separated list of codecs, e.g. "gz,xz" """
+    codecs = tuple(dict.fromkeys(codec.strip() for codec in text.split(",") if codec.strip()))
+    unknown = [codec for codec in codecs if codec not in CODECS]
+    if unknown or not codecs:
+        raise ValueError(f"Invalid codecs {text!r}, expected a comma separated list of {', '.join(CODECS)}")
+    return codecs
+
+
+def sidecar_path(path: Path, codec: str) -> Path:
+    return path.with_name(f"{path.name}.{codec}")
+
+
+def compress_file(path: Path, codecs: tuple[str, ...]) -> tuple[int, dict[str, int], float]:
+    """
+    Writes a sidecar for every codec next to path, atomically, with path's mtime so the next build can
+    tell it is current. Returns (size of path, {codec: sidecar size}, seconds spent)
+    """
+    start = time.perf_counter()
+    stat = path.stat()
+    data = path.read_bytes()
+    sizes = {}
+    for codec in codecs:
+        compressed = compress_bytes(data, codec)
+        dest = sidecar_path(path, codec)
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        tmp.write_bytes(compressed)
+        os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        tmp.replace(dest)
+        sizes[codec] = len(compressed)
+    return stat.st_size, sizes, time.perf_counter() - start
+
+
+def sidecar_current(path: Path, sidecar: Path) -> bool:
+    """Whether sidecar was compressed from the current version of path, judged by the copied mtime"""
+    try:
+        return sidecar.stat().st_mtime_ns == path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def compress_outputs(dest_dir_path: Path, codecs: tuple[str, ...] = DEFAULT_CODECS, jobs: int | None = None,
+                     min_size: int = MIN_SIZE, static=()) -> tuple[int, int, int]:
+    """
+    Precompresses the text outputs under dest_dir_path into sidecars (index.html.gz, ...) on a pool of jobs
+    processes. Outputs whose sidecars are current are skipped, and sidecars of outputs that are gone, too
+    small or of codecs no longer in use are removed. static lists the synced static files by their path
+    relative to dest_dir_path, e.g. manifest.static, which are never removed or overwritten even when they
+    look like sidecars. Returns the number of files (compressed, unchanged, removed)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    static = set(static)
+    dirty = []
+    dirty_codecs = []
+    unchanged = 0
+    removed = 0
+    for path in sorted(dest_dir_path.rglob("*")):
+        # hidden files are the build manifest and half-written temporary files, which aren't served
+        if path.name.startswith(".") or not path.is_file():
+            continue
+        relative = path.relative_to(dest_dir_path).as_posix()
+        codec = path.suffix[1:]
+        if codec in CODECS and Path(path.stem).suffix in COMPRESS_SUFFIXES:
+            if relative in static:
+                continue
+            original = path.with_name(path.stem)
+            if codec not in codecs or not original.is_file() or original.stat().st_size < min_size:
+                path.unlink()
+                removed += 1
+            continue
+        if path.suffix not in COMPRESS_SUFFIXES or path.stat().st_size < min_size:
+            continue
+        # a static file already at a sidecar's name, e.g. data.json.gz next to data.json, is the site's own
+        path_codecs = tuple(codec for codec in codecs if f"{relative}.{codec}" not in static)
+        if all(sidecar_current(path, sidecar_path(path, codec)) for codec in path_codecs):
+            unchanged += 1
+        else:
+            dirty.append(path)
+            dirty_codecs.append(path_codecs)
+
+    original_bytes = 0
+    compressed_bytes = dict.fromkeys(codecs, 0)
+    start = time.perf_counter()
+    if len(dirty) > 1 and (jobs or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # a few files per task, so small pages don't cost a round trip each
+            results = list(pool.map(compress_file, dirty, dirty_codecs, chunksize=16))
+    else:
+        results = [compress_file(path, path_codecs) for path, path_codecs in zip(dirty, dirty_codecs)]
+    wall = time.perf_counter() - start
+
+    for size, sizes, _ in results:
+        original_bytes += size
+        for codec, compressed in sizes.items():
+            compressed_bytes[codec] += compressed
+    profiler.count("bytes_compressed", original_bytes)
+
+    print(f"Compressed {len(dirty)} of {len(dirty) + unchanged} outputs in {wall:.3f}s"
+          f" (busy {sum(seconds for _, _, seconds in results):.3f}s), removed {removed} sidecars")
+    for codec, size in compressed_bytes.items():
+        if original_bytes:
+            print(f"  {codec}: {original_bytes} -> {size} bytes, {size / original_bytes:.1%} of the original")
+    return len(dirty), unchanged, removed
@@ -0,0 +1,113 @@
+import os
+from pathlib import Path, PurePosixPath
+
+import profiler
+
+# Hex digits of the content hash put into fingerprinted names, plenty to tell the versions of one file apart
+HASH_LENGTH = 10
+
+# Hashing is mostly waiting on reads, and hashlib releases the GIL on large buffers, so threads overlap well
+HASH_THREADS = 8
+
+# URL map of the current build, e.g. {"/index.css": "/index.1a2b3c4d5e.css"}, that load_template points
+# references at. None when fingerprinting is off
+current = None
+# Short digest of current, telling apart templates and cached blocks rendered with different maps
+current_key = None
+
+
+def use(urls: dict[str, str] | None) -> None:
+    """Makes urls the URL map templates rewrite with, or turns the rewriting off with None"""
+    global current, current_key
+    current = urls
+    current_key = None
+    if urls is not None:
+        import hashlib
+        current_key = hashlib.blake2b("\0".join(f"{k}\0{v}" for k, v in sorted(urls.items())).encode(), digest_size=8).hexdigest()
+
+
+@profiler.timed("hash_asset")
+def hash_asset(path: Path) -> str:
+    """Returns the sha256 hex digest of a file, hashed straight from a memory map so it is never copied into Python"""
+    import hashlib
+    import mmap
+    with path.open("rb") as f:
+        # an empty file can't be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha256(data).hexdigest()
+
+
+def fingerprinted_path(key: str, digest: str) -> str:
+    """Puts the start of digest before the extension: images/tom.png becomes images/tom.<hash>.png"""
+    path = PurePosixPath(key)
+    return str(path.with_name(f"{path.stem}.{digest[:HASH_LENGTH]}{path.suffix}"))
+
+
+def url_map(assets: dict[str, dict]) -> dict[str, str]:
+    """Maps the root-relative URL of every asset to its fingerprinted URL"""
+    return {f"/{key}": f"/{fingerprinted_path(key, entry['hash'])}" for key, entry in assets.items()}
+
+
+def hash_assets(static_dir: Path, cached: dict[str, dict], threads: int = HASH_THREADS) -> tuple[dict[str, dict], int]:
+    """
+    Hashes every file under static_dir on a thread pool. Hashes in cached, the result of an earlier run,
+    are reused for files whose size and mtime haven't changed. Returns ({path relative to static_dir:
+    {"size", "mtime", "hash"}}, number of files hashed)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from sync import list_files
+    files = list_files(static_dir) if static_dir.is_dir() else []
+
+    def entry(path: Path) -> tuple[str, dict, bool]:
+        key = path.as_posix()
+        stat = (static_dir / path).stat()
+        old = cached.get(key)
+        if old is not None and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime_ns:
+            return key, old, False
+        return key, {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": hash_asset(static_dir / path)}, True
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        entries = list(pool.map(entry, files))
+    hashed = sum(fresh for _, _, fresh in entries)
+    profiler.count("assets_hashed", hashed)
+    return {key: value for key, value, _ in entries}, hashed
+
+
+def fingerprint_assets(static_dir: Path, write_dir: Path, manifest: "BuildManifest", hardlink: bool = False,
+                       threads: int = HASH_THREADS) -> dict[str, str]:
+    """
+    Publishes every static file under a content-hashed name as well, next to its stable copy, so it can be
+    cached forever, and removes the fingerprinted copies of old versions. Hashes are kept in the manifest.
+    Returns the URL map, which becomes the current one
+    """
+    from generate_page import remove_stale_output
+    from sync import files_match, sync_file
+
+    assets, hashed = hash_assets(static_dir, manifest.assets, threads)
+    urls = url_map(assets)
+    published = 0
+    for logical, url in urls.items():
+        src = static_dir / logical[1:]
+        dest = write_dir / url[1:]
+        if not files_match(src, dest):
+            sync_file(src, dest, hardlink)
+            published += 1
+    current_urls = set(urls.values())
+    for url in url_map(manifest.assets).values():
+        if url not in current_urls:
+            remove_stale_output(write_dir / url[1:], write_dir)
+
+    print(f"Fingerprinted {len(urls)} static files: {hashed} hashed, {published} published")
+    manifest.assets = assets
+    use(urls)
+    return urls
+
+
+def remove_fingerprints(write_dir: Path, manifest: "BuildManifest") -> None:
+    """Removes the fingerprinted copies of an earlier build that had fingerprinting on"""
+    from generate_page import remove_stale_output
+    for url in url_map(manifest.assets).values():
+        remove_stale_output(write_dir / url[1:], write_dir)
+    manifest.assets = {}
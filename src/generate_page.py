@@ -1,55 +1,121 @@
-import shutil
+import sys
 from pathlib import Path
 
 
-from blocks import markdown_to_html_node
+import profiler
+from blocks import PARSER_VERSION, stream_markdown_to_html_node
+from htmlnode import escape_text
+from template import Template, load_template
+
+# The build-only modules (manifest, output, shard) pull in hashlib and json, so they are imported
+# where they're used and render-one, which only needs render_page, starts faster
+
+def loaded(name: str):
+    """
+    The module of an optional feature (blockcache, fingerprint, minify, searchindex) if it has been imported,
+    else None. They are only imported by the builds that turn them on, so one that isn't loaded is off and
+    render-one doesn't import any of them
+    """
+    return sys.modules.get(name)
+
+def block_cache():
+    """The open block cache, or None"""
+    blockcache = loaded("blockcache")
+    return blockcache.current if blockcache is not None else None
 
 def extract_title(markdown: str) -> str:
     """Extracts the title from the markdown file"""
-    lines = markdown.split("\n")
+    return find_title(markdown.split("\n"))
+
+@profiler.timed("read_title")
+def find_title(lines) -> str:
+    """Extracts the title from an iterable of markdown lines, stopping at the first h1"""
     for line in lines:
         if line and line.startswith("# "):
             return line.lstrip("#").strip()
     raise Exception("There is no title! Please make sure at least one heading is the title! i.e. # heading")
 
-def generate_page(from_path: Path, template_path: Path, dest_path: Path, base_path: str):
+def generate_page(from_path: Path, template_path: Path, dest_path: Path, base_path: str) -> bool:
     """
     Creates the index.html page for the static site based off the given markdown files in the content folder
-    and writes it to the proper folder for hosting
+    and writes it to the proper folder for hosting. Returns False if the page came out unchanged and was left alone
     """
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
 
-    # Read markdown file
-    md = from_path.read_text()
-
-    # Read template file
-    template = template_path.read_text()
-
-    # markdown to html conversions
-    html_node = markdown_to_html_node(md)
-    content = html_node.to_html()
-
-    # extract title
-    title = extract_title(md)
+    if profiler.current is None:
+        return write_page(from_path, template_path, dest_path, base_path)
+    return profiler.current.run_page(str(from_path), from_path, dest_path, write_page, from_path, template_path, dest_path, base_path)
 
-    # replace template placeholders with actual values
-    html = template.replace("{{ Title }}", title).replace("{{ Content }}", content)
+def write_page(from_path: Path, template_path: Path, dest_path: Path, base_path: str) -> bool:
+    """
+    Renders the markdown at from_path into the template and atomically replaces dest_path with it,
+    unless dest_path already holds the same page. Returns whether dest_path was written
+    """
+    # Compiled template, only read from disk when it changes
+    template = load_template(template_path, base_path)
 
-    # replace all links
-    html = html.replace('href="/', f'href="{base_path}')
-    html = html.replace('src="/', f'src="{base_path}')
+    # the title goes in the page head, so find it first. It is usually near the top,
+    # so this rarely reads much of the file
+    with from_path.open() as f:
+        title = find_title(f)
+    # the page's words for the search index, collected as it renders
+    searchindex = loaded("searchindex")
+    terms = set() if searchindex is not None and searchindex.enabled else None
 
     # Ensure the directory exists
     dest_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # write to the destination file
-    dest_path.write_text(html)
+    # stream the markdown through the converter into the filled in template, a block at a time,
+    # so neither the source nor the page is ever held in memory as a whole. The page is compared
+    # with the one on disk as it goes, and only written out if it differs
+    from output import CompareWriter
+    out = CompareWriter(dest_path)
+    try:
+        with from_path.open() as f:
+            template.write(out, {"Title": escape_text(title), "Content": content_node(f, template, terms)})
+    except BaseException:
+        out.discard()
+        raise
+    cache = block_cache()
+    if cache is not None:
+        cache.flush()
+    if terms is not None:
+        searchindex.collected[from_path] = (title, terms)
+    return out.close()
+
+def render_page(markdown: str, template: Template, terms: set | None = None) -> str:
+    """
+    Renders markdown text into the template and returns the whole page, for callers that do their own I/O.
+    With terms, the page's words are added to it for the search index
+    """
+    title = escape_text(extract_title(markdown))
+    html = template.render({"Title": title, "Content": content_node(markdown.split("\n"), template, terms)})
+    cache = block_cache()
+    if cache is not None:
+        cache.flush()
+    return html
+
+def content_node(lines, template: Template, terms: set | None = None):
+    """
+    The lazily converted HTMLNode for the markdown lines, served from the block cache when one is open.
+    With terms, the words of every block are added to it as the node is serialized
+    """
+    cache = block_cache()
+    if cache is None:
+        node = stream_markdown_to_html_node(lines)
+    else:
+        node = cache.stream_markdown_to_html_node(lines, template.url_key, template.url_rewriter)
+    if terms is not None:
+        from searchindex import collect_terms
+        node.children = collect_terms(node.children, terms)
+    return node
 
 def copy_files(copy_dir: Path, write_dir: Path) -> None:
     """
     Copies files and directories from one directory to another. Basically the equivalent of
     ` cp -r copy_dir write_dir `
     """
+    import shutil
     for path in copy_dir.iterdir():
         dest_path = write_dir / path.name
         if path.is_file():
@@ -68,3 +134,118 @@ def generate_pages_recursive(dir_path_content: Path, template_path: Path, dest_d
             dest_dir_path_new = dest_dir_path / path.name
             dest_dir_path_new.mkdir(parents=True, exist_ok=True)
             generate_pages_recursive(path, template_path, dest_dir_path_new, base_path)
+
+def discover_pages(dir_path_content: Path, dest_dir_path: Path) -> list[tuple[Path, Path]]:
+    """
+    Finds every markdown file under dir_path_content and pairs it with the html file it renders to,
+    mirroring the layout used by generate_pages_recursive. Pages are sorted so builds are deterministic.
+    """
+    pages = []
+    for path in sorted(dir_path_content.iterdir()):
+        if path.is_file() and path.suffix == ".md":
+            pages.append((path, dest_dir_path / (path.stem + ".html")))
+        elif path.is_dir():
+            pages.extend(discover_pages(path, dest_dir_path / path.name))
+    return pages
+
+def render_pages(pages: list[tuple[Path, Path]], template_path: Path, base_path: str, jobs: int = 1, pipeline: bool = False) -> int:
+    """
+    Renders each (source, destination) pair with generate_page, on a process pool when jobs > 1.
+    With pipeline set, reading and writing run on threads alongside rendering, see pipeline.py.
+    Returns how many pages were written, the rest came out unchanged
+    """
+    if jobs > 1 and len(pages) > 1:
+        from parallel import render_pages_parallel
+        return render_pages_parallel(pages, template_path, base_path, jobs, pipeline)
+    if pipeline:
+        from pipeline import render_pages_pipelined
+        return render_pages_pipelined(pages, template_path, base_path)
+    written = 0
+    for from_path, dest_path in pages:
+        written += generate_page(from_path, template_path, dest_path, base_path)
+    return written
+
+def remove_stale_output(dest_path: Path, dest_dir_path: Path) -> None:
+    """Deletes an output file whose source is gone, along with any directories it leaves empty"""
+    print(f"Removing {dest_path}")
+    dest_path.unlink(missing_ok=True)
+    parent = dest_path.parent
+    while parent != dest_dir_path and parent.is_relative_to(dest_dir_path):
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+        parent = parent.parent
+
+def generate_pages_incremental(dir_path_content: Path, template_path: Path, dest_dir_path: Path, base_path: str, manifest: "BuildManifest", jobs: int = 1, pipeline: bool = False, shard: tuple[int, int] | None = None) -> list[tuple[Path, Path]]:
+    """
+    Like generate_pages_recursive, but only renders pages whose source, template or base path changed
+    since the build recorded in the manifest, and removes outputs whose sources were deleted.
+    Pages are discovered up front, so with jobs > 1 the dirty ones can be rendered on a process pool.
+    With shard set to (i, N), only the pages in shard i of N are built, see shard.py.
+    With the search index enabled, it is updated with the terms of the rendered pages, and pages missing
+    from it are rendered too. Returns the pages that were rendered.
+    """
+    from manifest import hash_file
+    from shard import shard_of
+    fingerprint, minify, searchindex = loaded("fingerprint"), loaded("minify"), loaded("searchindex")
+    asset_key = fingerprint.current_key if fingerprint is not None else None
+    minifying = minify is not None and minify.enabled
+    indexing = searchindex is not None and searchindex.enabled
+    template_hash = hash_file(template_path)
+    full_rebuild = manifest.needs_full_rebuild(template_hash, base_path, asset_key, minifying, PARSER_VERSION)
+    index = None
+    if indexing:
+        index = searchindex.SearchIndex.load(dest_dir_path / searchindex.SEARCH_INDEX_NAME)
+
+    pages = {}
+    urls = {}
+    dirty = []
+    for from_path, dest_path in discover_pages(dir_path_content, dest_dir_path):
+        key = from_path.relative_to(dir_path_content).as_posix()
+        if shard is not None and shard_of(key, shard[1]) != shard[0]:
+            continue
+        entry = {"hash": hash_file(from_path), "dest": dest_path.relative_to(dest_dir_path).as_posix()}
+        pages[key] = entry
+        if index is not None:
+            urls[from_path] = searchindex.page_url(base_path, entry["dest"])
+        if full_rebuild or manifest.pages.get(key) != entry or not dest_path.exists() \
+                or (index is not None and urls[from_path] not in index.ids):
+            dirty.append((from_path, dest_path))
+
+    if minifying:
+        minify.saved = 0
+    if indexing:
+        searchindex.collected = {}
+        searchindex.seconds = 0.0
+    written = render_pages(dirty, template_path, base_path, jobs, pipeline)
+
+    for key, entry in manifest.pages.items():
+        if key not in pages:
+            remove_stale_output(dest_dir_path / entry["dest"], dest_dir_path)
+
+    print(f"Rendered {len(dirty)} of {len(pages)} pages: {written} written, {len(dirty) - written} unchanged")
+    if minifying and dirty:
+        print(f"Minifying saved {minify.saved} bytes, {minify.saved // len(dirty)} per page")
+
+    if index is not None:
+        current = set(urls.values())
+        searchindex.write_index(
+            index,
+            {urls[from_path]: page for from_path, page in searchindex.collected.items()},
+            [url for url in index.ids if url not in current],
+        )
+    elif manifest.search_index:
+        from searchindex import SEARCH_INDEX_NAME
+        remove_stale_output(dest_dir_path / SEARCH_INDEX_NAME, dest_dir_path)
+
+    manifest.template_hash = template_hash
+    manifest.base_path = base_path
+    manifest.parser_version = PARSER_VERSION
+    manifest.asset_key = asset_key
+    manifest.minify = minifying
+    manifest.search_index = indexing
+    manifest.pages = pages
+    manifest.shard = f"{shard[0]}/{shard[1]}" if shard is not None else None
+    manifest.save()
+    return dirty
@@ -1,4 +1,6 @@
 import re
+import profiler
+from memo import Memo
 from textnode import TextType, TextNode
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
@@ -24,98 +26,108 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
             new_nodes.extend(temp_nodes)
     return new_nodes
 
-def extract_markdown_images(text) -> list[tuple]:
-    return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
-
-def extract_markdown_links(text) -> list[tuple]:
-    return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
-
-def split_nodes_image(old_nodes) -> list[TextNode]:
-    result = []
-    for node in old_nodes:
-        if node.text_type != TextType.TEXT:
-            result.append(node)
-            continue
-
-        # Find all images in text
-        images = extract_markdown_images(node.text)
-
-        if not images:
-            result.append(node)
-            continue
+IMAGE_PATTERN = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
+LINK_PATTERN = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
+IMAGE_RE = re.compile(IMAGE_PATTERN)
+LINK_RE = re.compile(LINK_PATTERN)
 
-        # Now we need to split text and create new nodes
-        current_text = node.text
-        for alt_text, url in images:
-            # split on first occurence of image
-            # Note: maxsplit paramter being 1 is important for avoiding
-            # issues where the image appears more than once
-            image_markdown = f"![{alt_text}]({url})"
-            parts = current_text.split(image_markdown, 1)
-
-            # Don't add empty text to a TextNode
-            if parts[0]:
-                result.append(TextNode(parts[0], TextType.TEXT))
+# Images and links matched together in one scan. Images are tried first at every position
+# and the lookbehind keeps links from starting inside an image, which gives the same
+# matches as extracting all images and then all links from the remaining text
+IMAGE_OR_LINK_RE = re.compile(f"{IMAGE_PATTERN}|{LINK_PATTERN}")
 
-            result.append(TextNode(alt_text, TextType.IMAGE, url))
+# Inline delimiters in the order they have always been applied: each one only splits
+# the plain text left over by the delimiters before it
+DELIMITERS = (("**", TextType.BOLD), ("_", TextType.ITALIC), ("`", TextType.CODE))
 
-            # Important step: set current_text to the next array element
-            # otherwise you will have the old image in the text that needs
-            # to be split by the next image and overlapping text
-            if len(parts) > 1:
-                current_text = parts[1]
-            else:
-                current_text = ""
-        if current_text:
-            result.append(TextNode(current_text, TextType.TEXT))
+def extract_markdown_images(text) -> list[tuple]:
+    return IMAGE_RE.findall(text)
 
-    return result
+def extract_markdown_links(text) -> list[tuple]:
+    return LINK_RE.findall(text)
 
-def split_nodes_link(old_nodes) -> list[TextNode]:
+def split_nodes_pattern(old_nodes, pattern, text_type) -> list[TextNode]:
+    """
+    Splits the text nodes around every match of pattern, each match becoming a node of text_type.
+    Slicing by match position keeps this linear, rather than re-splitting the rest of the text per match
+    """
     result = []
     for node in old_nodes:
-        if node.text_type != TextType.TEXT:
+        if node.text_type != TextType.TEXT or "](" not in node.text:
             result.append(node)
             continue
 
-        links = extract_markdown_links(node.text)
+        position = 0
+        for match in pattern.finditer(node.text):
+            # Don't add empty text to a TextNode
+            if match.start() > position:
+                result.append(TextNode(node.text[position:match.start()], TextType.TEXT))
+            result.append(TextNode(match.group(1), text_type, match.group(2)))
+            position = match.end()
 
-        if not links:
+        if position == 0:
             result.append(node)
-            continue
-
-        # Now we must split text and create new nodes
-        current_text = node.text
-        for alt_text, url in links:
-            # split on first occurence of links
-            # Note: maxsplits=1 is important for duplicate links
-            # in the same text
-            link_markdown = f"[{alt_text}]({url})"
-            parts = current_text.split(link_markdown, 1)
+        elif position < len(node.text):
+            result.append(TextNode(node.text[position:], TextType.TEXT))
+    return result
 
-            # Don't add empty text to a TextNode
-            if parts[0]:
-                result.append(TextNode(parts[0], TextType.TEXT))
+def split_nodes_image(old_nodes) -> list[TextNode]:
+    return split_nodes_pattern(old_nodes, IMAGE_RE, TextType.IMAGE)
 
-            result.append(TextNode(alt_text, TextType.LINK, url))
+def split_nodes_link(old_nodes) -> list[TextNode]:
+    return split_nodes_pattern(old_nodes, LINK_RE, TextType.LINK)
+
+def tokenize_inline(text, depth, result) -> None:
+    """
+    Appends the TextNodes for text to result in a single left-to-right walk. Each delimiter level
+    splits only the plain text handed down by the level above, and the leftover plain text is scanned
+    once for images and links, so no intermediate node lists are built along the way
+    """
+    if depth == len(DELIMITERS):
+        if "](" in text:
+            position = 0
+            for match in IMAGE_OR_LINK_RE.finditer(text):
+                if match.start() > position:
+                    result.append(TextNode(text[position:match.start()], TextType.TEXT))
+                if match.group(1) is not None:
+                    result.append(TextNode(match.group(1), TextType.IMAGE, match.group(2)))
+                else:
+                    result.append(TextNode(match.group(3), TextType.LINK, match.group(4)))
+                position = match.end()
+            text = text[position:]
+        if text:
+            result.append(TextNode(text, TextType.TEXT))
+        return
+
+    delimiter, text_type = DELIMITERS[depth]
+    if delimiter not in text:
+        tokenize_inline(text, depth + 1, result)
+        return
+
+    sections = text.split(delimiter)
+    if len(sections) % 2 == 0:
+        raise Exception("Missing closing symbol. Not valid Markdown")
+    for i, section in enumerate(sections):
+        if i % 2 == 0:
+            # Only add non-empty strings
+            if section:
+                tokenize_inline(section, depth + 1, result)
+        else:
+            result.append(TextNode(section, text_type))
 
-            # Important step: set current_text to the next array element
-            # otherwise you will have the old image in the text that needs
-            # to be split by the next link and overlapping text
-            if len(parts) > 1:
-                current_text = parts[1]
-            else:
-                current_text = ""
-        if current_text:
-            result.append(TextNode(current_text, TextType.TEXT))
+def textnode_fields(text) -> tuple[tuple, ...]:
+    """The (text, text_type, url) of each TextNode for text. Plain tuples, so memoized entries can't be changed"""
+    nodes = []
+    tokenize_inline(text, 0, nodes)
+    return tuple((node.text, node.text_type, node.url) for node in nodes)
 
-    return result
+textnodes_memo = Memo("text_to_textnodes", textnode_fields)
 
+@profiler.timed("text_to_textnodes")
 def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    return nodes
+    if textnodes_memo.maxsize <= 0:
+        # nothing is shared without the memo, so the nodes are handed out as built
+        nodes = []
+        tokenize_inline(text, 0, nodes)
+        return nodes
+    return [TextNode(*fields) for fields in textnodes_memo.lookup(text)]
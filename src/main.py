@@ -1,34 +1,248 @@
-import shutil
-from generate_page import copy_files, generate_pages_recursive
-from pathlib import Path
+import os
 import sys
+from pathlib import Path
+
+# Everything else is imported inside the commands that need it, so a command only pays for its own
+# imports at startup. See bench/bench_startup.py
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the static site from content/ into docs/")
+    parser.add_argument("base_path", nargs="?", default="/", help="path the site is served under (default: /)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="render pages on N worker processes, 0 for one per CPU (default: 1)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="read sources and write pages on threads while rendering, to hide slow filesystems")
+    parser.add_argument("--checksum", action="store_true",
+                        help="compare static files by content hash instead of size and mtime")
+    parser.add_argument("--hardlink", action="store_true",
+                        help="hardlink changed static files into docs/ instead of copying them when possible")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="also publish static files under content-hashed names and point the pages at those")
+    parser.add_argument("--compress", type=codecs_arg, nargs="?", const=("gz",), metavar="CODECS",
+                        help="write precompressed sidecars of the text outputs, e.g. index.html.gz (codecs: gz, xz; default: gz)")
+    parser.add_argument("--minify", action="store_true",
+                        help="collapse the whitespace between tags in the pages, leaving <pre> blocks as written")
+    parser.add_argument("--search-index", action="store_true",
+                        help="build a full-text search index of the pages into docs/search-index.bin while rendering")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every build stage and print a report when done")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="number of slowest pages listed in the profile report (default: 10)")
+    parser.add_argument("--profile-dir", type=Path, metavar="DIR",
+                        help="also dump cProfile stats for every page into DIR (implies --profile)")
+    parser.add_argument("--block-cache", type=Path, nargs="?", const=Path(".cache/blocks.sqlite3"), metavar="PATH",
+                        help="reuse rendered block HTML from an on-disk cache (default path: .cache/blocks.sqlite3)")
+    parser.add_argument("--block-cache-size", type=int, default=256, metavar="MB",
+                        help="evict the least recently used blocks beyond this size (default: 256)")
+    parser.add_argument("--memo-size", type=int, default=None, metavar="N",
+                        help="inline fragments remembered per parsing cache, 0 to turn caching off (default: 4096)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and rebuild whatever depends on a changed source")
+    parser.add_argument("--shard", type=shard_arg, metavar="I/N",
+                        help="only build shard I of N of the pages, into shards/I-of-N/ (combine them with the merge command)")
+    args = parser.parse_args(argv)
+    if args.shard is not None and args.watch:
+        parser.error("--watch can't be combined with --shard")
+    if args.shard is not None and args.fingerprint:
+        parser.error("--fingerprint can't be combined with --shard")
+    if args.shard is not None and args.compress:
+        parser.error("--compress can't be combined with --shard, pass it to the merge command instead")
+    if args.shard is not None and args.search_index:
+        parser.error("--search-index can't be combined with --shard")
+    if args.profile_dir is not None:
+        args.profile = True
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+def shard_arg(text: str) -> tuple[int, int]:
+    import argparse
+    from shard import parse_shard
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def codecs_arg(text: str) -> tuple[str, ...]:
+    import argparse
+    from compress import parse_codecs
+    try:
+        return parse_codecs(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
 
-def main():
-    if len(sys.argv) > 1:
-        base_path = sys.argv[1]
-    else:
-        base_path = "/"
+    args = parse_args(argv)
+    base_path = args.base_path
+
+    from generate_page import generate_pages_incremental
+    from manifest import BuildManifest, MANIFEST_NAME
+    from sync import sync_files
 
     cwd = Path.cwd()
     docs_dir = cwd / "docs"
+    if args.shard is not None:
+        # each shard gets its own output and manifest, so shards can be built side by side or on different hosts
+        docs_dir = cwd / "shards" / "{}-of-{}".format(*args.shard)
     static_dir = cwd / "static"
     template_path = cwd / "template.html"
     content_path = cwd / "content"
 
-    # Clean up public directory
-    if docs_dir.exists():
-        if docs_dir.is_dir():
-            shutil.rmtree(docs_dir)
-        else:
-            # in case a public file is created instead of a directory
-            docs_dir.unlink()
+    # in case a public file is created instead of a directory
+    if docs_dir.exists() and not docs_dir.is_dir():
+        docs_dir.unlink()
 
-    # Create the public directory
+    # Create the public directory. Previous output is kept so unchanged pages can be skipped
     docs_dir.mkdir(parents=True, exist_ok=True)
 
-    copy_files(static_dir, docs_dir)
+    if args.profile:
+        import profiler
+        profiler.enable(args.profile_dir)
+
+    if args.minify:
+        import minify
+        minify.configure(True)
+
+    if args.search_index:
+        import searchindex
+        searchindex.configure(True)
+
+    if args.memo_size is not None:
+        import memo
+        memo.configure(args.memo_size)
+
+    if args.block_cache is not None:
+        import blockcache
+        blockcache.open_cache(args.block_cache, args.block_cache_size * 1024 * 1024)
+
+    manifest = BuildManifest.load(docs_dir / MANIFEST_NAME)
+    # static files are synced by the merge step for sharded builds
+    if args.shard is None:
+        sync_files(static_dir, docs_dir, manifest, args.checksum, args.hardlink)
+    if args.fingerprint:
+        from fingerprint import fingerprint_assets
+        fingerprint_assets(static_dir, docs_dir, manifest, args.hardlink)
+    elif manifest.assets:
+        from fingerprint import remove_fingerprints
+        remove_fingerprints(docs_dir, manifest)
+
+    generate_pages_incremental(content_path, template_path, docs_dir, base_path, manifest, args.jobs, args.pipeline, args.shard)
+
+    if args.compress:
+        from compress import compress_outputs
+        compress_outputs(docs_dir, args.compress, static=manifest.static)
+
+    if args.profile:
+        import memo
+        memo.record_stats()
+        print(profiler.disable().report(args.profile_top))
+
+    try:
+        if args.watch:
+            from watch import Watcher
+            Watcher(content_path, static_dir, template_path, docs_dir, base_path, manifest, args.compress).run()
+    finally:
+        if args.block_cache is not None:
+            cache = blockcache.close_cache()
+            if cache.hits or cache.misses:
+                print(f"Block cache: {cache.hits} hits, {cache.misses} misses")
+
+def merge(argv) -> None:
+    """The merge command: combines the outputs of a sharded build into docs/ and syncs the static files"""
+    import argparse
+    from manifest import BuildManifest, MANIFEST_NAME
+    from shard import load_shard_manifests, merge_shards
+    from sync import sync_files
+    parser = argparse.ArgumentParser(prog="main.py merge", description="Combine the shards of a sharded build into docs/")
+    parser.add_argument("shard_dirs", nargs="*", type=Path, metavar="SHARD_DIR",
+                        help="outputs of every shard (default: every directory in shards/)")
+    parser.add_argument("--checksum", action="store_true",
+                        help="compare files by content hash instead of size and mtime")
+    parser.add_argument("--hardlink", action="store_true",
+                        help="hardlink changed files into docs/ instead of copying them when possible")
+    parser.add_argument("--compress", type=codecs_arg, nargs="?", const=("gz",), metavar="CODECS",
+                        help="write precompressed sidecars of the text outputs, e.g. index.html.gz (codecs: gz, xz; default: gz)")
+    args = parser.parse_args(argv)
+
+    cwd = Path.cwd()
+    docs_dir = cwd / "docs"
+    shard_dirs = args.shard_dirs or sorted(path for path in (cwd / "shards").glob("*") if path.is_dir())
+    # check the shards before touching docs/, so a missing or incomplete set leaves it as it was
+    shard_manifests = load_shard_manifests(shard_dirs)
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    manifest = BuildManifest.load(docs_dir / MANIFEST_NAME)
+    sync_files(cwd / "static", docs_dir, manifest, args.checksum, args.hardlink)
+    if manifest.assets:
+        from fingerprint import remove_fingerprints
+        remove_fingerprints(docs_dir, manifest)
+    if manifest.search_index:
+        # shards aren't indexed, so an index from an earlier unsharded build would go stale
+        from generate_page import remove_stale_output
+        from searchindex import SEARCH_INDEX_NAME
+        remove_stale_output(docs_dir / SEARCH_INDEX_NAME, docs_dir)
+        manifest.search_index = False
+    merge_shards(shard_dirs, docs_dir, manifest, args.checksum, args.hardlink, shard_manifests)
+    if args.compress:
+        from compress import compress_outputs
+        compress_outputs(docs_dir, args.compress, static=manifest.static)
+
+def render_one(argv) -> None:
+    """
+    The render-one command: renders one markdown file with template.html and prints the page, e.g. for
+    editor previews. It skips argparse and only imports the converter, to start as fast as possible
+    """
+    if not 1 <= len(argv) <= 2 or argv[0].startswith("-"):
+        sys.exit("usage: main.py render-one FILE [BASE_PATH]")
+    from generate_page import render_page
+    from template import load_template
+    template = load_template(Path.cwd() / "template.html", argv[1] if len(argv) > 1 else "/")
+    sys.stdout.write(render_page(Path(argv[0]).read_text(), template))
+
+def render_server(argv) -> None:
+    """The render-server command: keeps a converter running and renders markdown sent over local HTTP, e.g. for CMS previews"""
+    import argparse
+    from server import BATCH_SIZE, serve_renders
+    parser = argparse.ArgumentParser(prog="main.py render-server", description="Render markdown to pages over local HTTP")
+    parser.add_argument("base_path", nargs="?", default="/", help="path the site is served under (default: /)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8889, help="port to listen on, 0 for any free port (default: 8889)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes rendering batches, 0 to render on the server's own thread (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"most requests rendered in one batch (default: {BATCH_SIZE})")
+    parser.add_argument("--quiet", action="store_true", help="don't log every request")
+    args = parser.parse_args(argv)
+
+    cwd = Path.cwd()
+    serve_renders(args.host, args.port, cwd / "content", cwd / "template.html", args.base_path, args.workers,
+                  args.batch_size, args.quiet)
+
+def serve(argv) -> None:
+    """The serve command: serves docs/ for previews, with keep-alive, ETags, precompressed sidecars and sendfile"""
+    import argparse
+    from serve import serve_site
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Serve the built site over HTTP")
+    parser.add_argument("base_path", nargs="?", default="/", help="path the site was built for (default: /)")
+    parser.add_argument("--dir", type=Path, default=Path("docs"), help="directory to serve (default: docs)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8888, help="port to listen on, 0 for any free port (default: 8888)")
+    parser.add_argument("--quiet", action="store_true", help="don't log every request")
+    args = parser.parse_args(argv)
+    serve_site(args.dir, args.host, args.port, args.base_path, args.quiet)
 
-    generate_pages_recursive(content_path, template_path, docs_dir, base_path)
+# Subcommands, picked by the first argument. Anything else is a build, with the base path as the first argument
+COMMANDS = {
+    "merge": merge,
+    "render-one": render_one,
+    "render-server": render_server,
+    "serve": serve,
+}
 
 if __name__ == "__main__":
     main()
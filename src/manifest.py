@@ -0,0 +1,92 @@
+import hashlib
+import json
+from pathlib import Path
+
+import profiler
+
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 1
+
+
+@profiler.timed("hash_file")
+def hash_file(path: Path) -> str:
+    """Returns the sha256 hex digest of a file's contents, read in chunks so large files are never fully loaded"""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest():
+    """
+    Record of the inputs used for the last build of an output directory.
+    Pages are keyed by their path relative to the content directory and store the hash of the
+    markdown source and the path of the rendered file relative to the output directory.
+    Static files are listed by their path relative to the static directory.
+    parser_version is the blocks.PARSER_VERSION the pages were rendered with, so upgrading the converter
+    renders them again. A sharded build records which shard of the pages it holds as "i/N".
+    With fingerprinting, assets holds the size, mtime and hash of every static file and asset_key the
+    digest of the URL map the pages were rendered with. minify records whether the pages were minified,
+    and search_index whether the output holds a search index, see searchindex.py.
+    """
+    def __init__(self, path: Path, template_hash: str | None = None, base_path: str | None = None, pages: dict | None = None,
+                 static: list | None = None, shard: str | None = None, assets: dict | None = None, asset_key: str | None = None,
+                 minify: bool = False, search_index: bool = False, parser_version: str | None = None):
+        self.path = path
+        self.template_hash = template_hash
+        self.base_path = base_path
+        self.pages = pages if pages is not None else {}
+        self.static = static if static is not None else []
+        self.shard = shard
+        self.assets = assets if assets is not None else {}
+        self.asset_key = asset_key
+        self.minify = minify
+        self.search_index = search_index
+        self.parser_version = parser_version
+
+    @classmethod
+    def load(cls, path: Path) -> "BuildManifest":
+        """Loads the manifest at path, returning an empty manifest if it is missing, unreadable or from another version"""
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path)
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("template"), data.get("base_path"), data.get("pages", {}), data.get("static", []),
+                   data.get("shard"), data.get("assets"), data.get("asset_key"),
+                   data.get("minify", False), data.get("search_index", False), data.get("parser_version"))
+
+    def save(self) -> None:
+        """Writes the manifest to disk, replacing the previous one atomically"""
+        data = {
+            "version": MANIFEST_VERSION,
+            "template": self.template_hash,
+            "base_path": self.base_path,
+            "parser_version": self.parser_version,
+            "pages": self.pages,
+            "static": self.static,
+        }
+        if self.shard is not None:
+            data["shard"] = self.shard
+        if self.assets:
+            data["assets"] = self.assets
+        if self.asset_key is not None:
+            data["asset_key"] = self.asset_key
+        if self.minify:
+            data["minify"] = True
+        if self.search_index:
+            data["search_index"] = True
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True))
+        tmp_path.replace(self.path)
+
+    def needs_full_rebuild(self, template_hash: str, base_path: str, asset_key: str | None = None, minify: bool = False,
+                           parser_version: str | None = None) -> bool:
+        """
+        Whether a change to the template, base path, asset URL map, minification or the markdown converter
+        invalidates every page. Manifests from before parser_version was recorded always do
+        """
+        return (self.template_hash != template_hash or self.base_path != base_path or self.asset_key != asset_key
+                or self.minify != minify or self.parser_version != parser_version)
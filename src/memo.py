@@ -0,0 +1,61 @@
+import functools
+
+import profiler
+
+# Entries kept per memo. Pages share navigation, footers and boilerplate, so a few thousand recent
+# fragments catch most repeats while staying small
+DEFAULT_SIZE = 4096
+
+# Every Memo by name, so the build can size them and report their hit rates in one place
+MEMOS = {}
+
+
+class Memo():
+    """
+    Bounded least recently used cache in front of a single-argument function. Results are shared between
+    callers, so func must return immutable values, e.g. tuples of node fields that callers build fresh
+    nodes from. Call through lookup
+    """
+    def __init__(self, name: str, func, maxsize: int = DEFAULT_SIZE):
+        self.name = name
+        self.func = func
+        self.reported = (0, 0)
+        self.resize(maxsize)
+        MEMOS[name] = self
+
+    def resize(self, maxsize: int) -> None:
+        """Starts over with room for maxsize entries. 0 turns the cache off"""
+        self.maxsize = maxsize
+        self.lookup = functools.lru_cache(maxsize)(self.func) if maxsize > 0 else self.func
+        self.reported = (0, 0)
+
+    def clear(self) -> None:
+        self.resize(self.maxsize)
+
+    def stats(self) -> tuple[int, int]:
+        """(hits, misses) since the cache was last resized"""
+        if self.maxsize <= 0:
+            return 0, 0
+        info = self.lookup.cache_info()
+        return info.hits, info.misses
+
+
+def configure(maxsize: int) -> None:
+    """Sets the size of every memo"""
+    for memo in MEMOS.values():
+        memo.resize(maxsize)
+
+
+def clear() -> None:
+    for memo in MEMOS.values():
+        memo.clear()
+
+
+def record_stats() -> None:
+    """Adds the hits and misses since the last call to the active profiler's counters"""
+    for memo in MEMOS.values():
+        hits, misses = memo.stats()
+        if (hits, misses) != memo.reported:
+            profiler.count(f"memo_{memo.name}_hits", hits - memo.reported[0])
+            profiler.count(f"memo_{memo.name}_misses", misses - memo.reported[1])
+            memo.reported = (hits, misses)
@@ -0,0 +1,200 @@
+import re
+
+# Elements whose contents are rendered as written, so their whitespace is passed through byte for byte
+RAW_TAGS = ("pre", "textarea", "script", "style")
+
+# Elements that don't flow inline with text. Whitespace next to their tags never renders, so it is dropped,
+# while anywhere else a run of whitespace renders as one space and is collapsed to one
+BLOCK_TAGS = frozenset({
+    "!doctype", "html", "head", "body", "title", "meta", "link", "base", "script", "style", "noscript",
+    "template", "div", "article", "section", "nav", "header", "footer", "main", "aside", "address", "p", "hr",
+    "br", "pre", "blockquote", "ul", "ol", "li", "dl", "dt", "dd", "figure", "figcaption", "h1", "h2", "h3",
+    "h4", "h5", "h6", "table", "caption", "colgroup", "col", "thead", "tbody", "tfoot", "tr", "th", "td",
+    "form", "fieldset", "legend", "details", "summary", "dialog", "menu", "option", "optgroup", "textarea",
+})
+
+# HTML whitespace. Python's \s would also match non-breaking spaces, which are content
+WHITESPACE = " \t\n\r\f"
+WHITESPACE_RE = re.compile(r"[ \t\n\r\f]+")
+TAG_NAME_RE = re.compile(r"</?(!--|[!a-zA-Z][^ \t\n\r\f/>]*)")
+
+
+def names_pattern(names) -> str:
+    """A regex alternation of names, grouped by first letter so a non-matching tag fails after one character"""
+    groups = {}
+    for name in names:
+        groups.setdefault(name[0], []).append(re.escape(name[1:]))
+    return "(?:%s)" % "|".join(
+        re.escape(first) + "(?:%s)" % "|".join(sorted(rest, key=len, reverse=True)) for first, rest in sorted(groups.items())
+    )
+
+
+_BLOCK_TAG_NAME = names_pattern(BLOCK_TAGS) + "(?=[ \t\n\r\f/>])"
+# Where the minifier may have something to do: whitespace other than a single space, a space next to a block
+# tag, a comment or a raw element. Everything before the next match is copied through as is. Every branch
+# starts with a literal so the search can skip ahead to the next candidate character
+WORK_RE = re.compile(
+    r"\t|\n|\r|\f| (?: |(?=</?%s))|<(?:!--|%s(?=[ \t\n\r\f/>])|/?%s[^>]*> )"
+    % (_BLOCK_TAG_NAME, names_pattern(RAW_TAGS), _BLOCK_TAG_NAME),
+    re.IGNORECASE,
+)
+
+# Turned on by --minify, see load_template
+enabled = False
+
+# Bytes removed from the pages rendered in this process since it was last reset, for the build report
+saved = 0
+
+
+def configure(on: bool) -> None:
+    global enabled
+    enabled = on
+
+
+def tag_name(tag: str) -> str:
+    match = TAG_NAME_RE.match(tag)
+    return match.group(1).lower() if match else ""
+
+
+class Minifier():
+    """
+    Streaming whitespace minifier for HTML. feed() takes a document in chunks of any size and returns what
+    can be written so far, holding back an unfinished tag, and whitespace whose fate depends on the tag that
+    follows it. raw and drop_space carry the state over from an earlier minifier, e.g. the template text
+    before a placeholder
+    """
+    def __init__(self, raw: str | None = None, drop_space: bool = True):
+        # the raw element being passed through, if any
+        self.raw = raw
+        # whether a space here would be redundant: at the start, after a block tag or after a space
+        self.drop_space = drop_space
+        # whitespace at the end of the last chunk, written as a space unless a block tag comes next
+        self.pending = False
+        # unfinished tag at the end of the last chunk
+        self.buffer = ""
+        self.saved = 0
+
+    def state(self) -> tuple[str | None, bool]:
+        return self.raw, self.drop_space
+
+    def feed(self, chunk: str) -> str:
+        text = self.buffer + chunk
+        self.buffer = ""
+        out = []
+        pos = 0
+        end = len(text)
+        while pos < end:
+            if self.raw is not None:
+                close = text.lower().find("</" + self.raw, pos)
+                if close == -1:
+                    # hold back what could be the start of the closing tag
+                    stop = text.rfind("<", pos)
+                    stop = end if stop == -1 else stop
+                    out.append(text[pos:stop])
+                    pos = stop
+                    break
+                out.append(text[pos:close])
+                pos = close
+                self.raw = None
+                continue
+
+            if not self.pending and text[pos] not in WHITESPACE:
+                pos = self.skip(text, pos, out)
+                if pos == end:
+                    break
+
+            lt = text.find("<", pos)
+            if lt == -1:
+                out.append(self.collapse(text[pos:], None))
+                pos = end
+                break
+            if text.startswith("<!--", lt):
+                gt = text.find("-->", lt + 4)
+                gt = gt + 3 if gt != -1 else -1
+            else:
+                gt = text.find(">", lt)
+                gt = gt + 1 if gt != -1 else -1
+            if gt == -1:
+                out.append(self.collapse(text[pos:lt], None))
+                pos = lt
+                break
+            tag = text[lt:gt]
+            name = tag_name(tag)
+            block = name in BLOCK_TAGS
+            out.append(self.collapse(text[pos:lt], block))
+            out.append(tag)
+            # comments don't render, so the whitespace around one collapses as if it weren't there
+            if name != "!--":
+                self.drop_space = block
+            if name in RAW_TAGS and tag[1] != "/" and not tag.endswith("/>"):
+                self.raw = name
+            pos = gt
+        self.buffer = text[pos:]
+        return "".join(out)
+
+    def skip(self, text: str, pos: int, out: list[str]) -> int:
+        """
+        Copies text from pos up to the next place WORK_RE finds work to out, and returns where it stopped. An
+        unfinished tag or trailing whitespace is left for the caller
+        """
+        match = WORK_RE.search(text, pos)
+        stop = match.start() if match else len(text)
+        lt = text.rfind("<", pos, stop)
+        if lt != -1 and text.find(">", lt, stop) == -1:
+            # the match is inside this tag, or it is cut off at the end of the chunk
+            stop = lt
+        # whitespace before a tag that isn't known yet, or at the end of the chunk, is left for collapse()
+        while stop > pos and text[stop - 1] in WHITESPACE:
+            stop -= 1
+        if stop == pos:
+            return pos
+        out.append(text[pos:stop])
+        if text[stop - 1] == ">" and lt != -1 and text.find(">", lt) == stop - 1:
+            self.drop_space = tag_name(text[lt:stop]) in BLOCK_TAGS
+        else:
+            self.drop_space = False
+        return stop
+
+    def collapse(self, text: str, next_block: bool | None) -> str:
+        """
+        Minifies the text between two tags. next_block is whether the next tag is a block tag, or None when
+        it isn't known yet, in which case trailing whitespace is held back as pending
+        """
+        leading = self.pending or (text[:1] in WHITESPACE and text != "")
+        self.pending = False
+        core = text.strip(WHITESPACE)
+        out = ""
+        if core:
+            if leading and not self.drop_space:
+                out = " "
+            out += WHITESPACE_RE.sub(" ", core)
+            self.drop_space = False
+            trailing = text[-1] in WHITESPACE
+        else:
+            trailing = leading and not self.drop_space
+        if trailing:
+            if next_block is None:
+                self.pending = True
+            elif not next_block:
+                out += " "
+                self.drop_space = True
+        # pending whitespace counts as removed until it is written
+        self.saved += len(text) - len(out)
+        return out
+
+    def flush(self) -> str:
+        """Writes out anything held back, e.g. before a placeholder whose value isn't known"""
+        out = self.buffer
+        self.buffer = ""
+        if self.pending:
+            self.pending = False
+            self.saved -= 1
+            self.drop_space = True
+            out = " " + out
+        return out
+
+
+def minify_html(html: str) -> str:
+    """Minifies a whole document"""
+    minifier = Minifier()
+    return minifier.feed(html) + minifier.flush()
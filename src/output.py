@@ -0,0 +1,111 @@
+import hashlib
+import os
+from pathlib import Path
+
+import profiler
+from manifest import hash_file
+
+
+def temp_path(dest_path: Path) -> Path:
+    """Hidden file next to dest_path that an output is written to before it replaces dest_path"""
+    return dest_path.with_name(f".{dest_path.name}.tmp")
+
+
+def same_content(path: Path, size: int, digest: str) -> bool:
+    """Whether path exists with the given size and sha256 hex digest. Size is checked first, so most changes cost a stat"""
+    try:
+        if path.stat().st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+    return hash_file(path) == digest
+
+
+# Bytes copied at a time when an output turns out to differ partway through, see CompareWriter
+COPY_CHUNK = 1024 * 1024
+
+
+class CompareWriter():
+    """
+    Writable text sink that replaces dest_path atomically, unless the output comes out the same as what
+    dest_path already holds. The output is compared against the old file as it streams in, and a temp file
+    is only opened at the first difference, with the matching start copied into it. So an unchanged page
+    costs a read of the old one and no writes, and dest_path keeps its mtime. Call close() when done
+    """
+    def __init__(self, dest_path: Path):
+        self.dest_path = dest_path
+        self.tmp_path = None
+        self.out = None
+        # bytes of the old file the output has matched so far
+        self.matched = 0
+        try:
+            self.old = dest_path.open("rb")
+        except FileNotFoundError:
+            self.old = None
+            self.start_writing()
+
+    def start_writing(self) -> None:
+        self.tmp_path = temp_path(self.dest_path)
+        self.out = self.tmp_path.open("wb")
+        if self.old is None:
+            return
+        self.old.seek(0)
+        remaining = self.matched
+        while remaining:
+            data = self.old.read(min(remaining, COPY_CHUNK))
+            self.out.write(data)
+            remaining -= len(data)
+        self.old.close()
+        self.old = None
+
+    def write(self, text: str) -> None:
+        data = text.encode()
+        if self.out is None:
+            if self.old.read(len(data)) == data:
+                self.matched += len(data)
+                return
+            self.start_writing()
+        self.out.write(data)
+
+    def writelines(self, chunks) -> None:
+        for chunk in chunks:
+            self.write(chunk)
+
+    def close(self) -> bool:
+        """Finishes the output, moving it over dest_path if it changed. Returns whether dest_path was written"""
+        if self.out is None:
+            if self.old.read(1) == b"":
+                self.old.close()
+                profiler.count("outputs_unchanged")
+                return False
+            # the old file went on past the end of the new one
+            self.start_writing()
+        self.out.close()
+        os.replace(self.tmp_path, self.dest_path)
+        profiler.count("outputs_written")
+        return True
+
+    def discard(self) -> None:
+        """Abandons the output after an error, leaving dest_path as it was"""
+        if self.old is not None:
+            self.old.close()
+        if self.out is not None:
+            self.out.close()
+            self.tmp_path.unlink(missing_ok=True)
+
+
+def write_text_if_changed(dest_path: Path, text: str) -> bool:
+    """Writes text to dest_path through a temp file and rename, skipping the write if the content is unchanged"""
+    data = text.encode()
+    if same_content(dest_path, len(data), hashlib.sha256(data).hexdigest()):
+        profiler.count("outputs_unchanged")
+        return False
+    tmp_path = temp_path(dest_path)
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    profiler.count("outputs_written")
+    return True
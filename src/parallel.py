@@ -0,0 +1,160 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import blockcache
+import fingerprint
+import memo
+import minify
+import profiler
+import searchindex
+from generate_page import generate_page
+from pipeline import render_pages_pipelined
+
+# Number of batches handed to each worker. More batches balance uneven page sizes better,
+# fewer batches cut down on pickling and scheduling overhead
+BATCHES_PER_JOB = 4
+
+
+def batch_pages(pages: list, jobs: int, batches_per_job: int = BATCHES_PER_JOB) -> list[list]:
+    """Splits pages into contiguous batches, roughly batches_per_job batches for every worker"""
+    if not pages:
+        return []
+    size = max(1, math.ceil(len(pages) / (jobs * batches_per_job)))
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+class RenderSettings():
+    """
+    The module level configuration a worker needs to render pages the way this process would: profiling,
+    the block cache as (path, max_bytes), the memo size, pipelining, the fingerprinted asset URL map,
+    minifying and search indexing. Sent along with every batch
+    """
+    def __init__(self, profile: bool = False, pstats_dir: Path | None = None, block_cache: tuple[Path, int] | None = None,
+                 memo_size: int = memo.DEFAULT_SIZE, pipeline: bool = False, asset_urls: dict[str, str] | None = None,
+                 minify_output: bool = False, search_index: bool = False):
+        self.profile = profile
+        self.pstats_dir = pstats_dir
+        self.block_cache = block_cache
+        self.memo_size = memo_size
+        self.pipeline = pipeline
+        self.asset_urls = asset_urls
+        self.minify_output = minify_output
+        self.search_index = search_index
+
+    @classmethod
+    def current(cls, pipeline: bool = False) -> "RenderSettings":
+        """The settings this process is rendering with"""
+        active = profiler.current
+        cache = blockcache.current
+        return cls(
+            active is not None,
+            active.pstats_dir if active is not None else None,
+            (cache.path, cache.max_bytes) if cache is not None else None,
+            memo.MEMOS["text_to_children"].maxsize,
+            pipeline,
+            fingerprint.current,
+            minify.enabled,
+            searchindex.enabled,
+        )
+
+    def apply(self) -> None:
+        """Configures this worker with the settings, and starts its per-batch totals over"""
+        if any(m.maxsize != self.memo_size for m in memo.MEMOS.values()):
+            memo.configure(self.memo_size)
+        if self.asset_urls != fingerprint.current:
+            fingerprint.use(self.asset_urls)
+        minify.configure(self.minify_output)
+        minify.saved = 0
+        searchindex.configure(self.search_index)
+        searchindex.collected = {}
+        searchindex.seconds = 0.0
+
+
+class BatchResult():
+    """
+    What a worker hands back for a batch: its pid, the pages rendered and written and the seconds spent,
+    the profiler data when profiling, the bytes saved by minifying, and the collected search terms and
+    seconds spent collecting them when indexing
+    """
+    def __init__(self, pid: int, count: int, written: int, seconds: float, profile_data: dict | None = None,
+                 minify_saved: int = 0, index_terms: dict | None = None, index_seconds: float = 0.0):
+        self.pid = pid
+        self.count = count
+        self.written = written
+        self.seconds = seconds
+        self.profile_data = profile_data
+        self.minify_saved = minify_saved
+        self.index_terms = index_terms
+        self.index_seconds = index_seconds
+
+
+def render_batch(batch: list[tuple[Path, Path]], template_path: Path, base_path: str,
+                 settings: RenderSettings | None = None) -> BatchResult:
+    """Renders one batch of pages inside a worker, configured with settings (the defaults when None)"""
+    if settings is None:
+        settings = RenderSettings()
+    settings.apply()
+    if settings.profile:
+        profiler.enable(settings.pstats_dir)
+    if settings.block_cache is not None:
+        blockcache.open_cache(*settings.block_cache)
+    start = time.perf_counter()
+    try:
+        if settings.pipeline:
+            written = render_pages_pipelined(batch, template_path, base_path)
+        else:
+            written = sum(generate_page(from_path, template_path, dest_path, base_path) for from_path, dest_path in batch)
+    finally:
+        if settings.block_cache is not None:
+            blockcache.close_cache()
+        if settings.profile:
+            memo.record_stats()
+        collected = profiler.disable() if settings.profile else None
+    result = BatchResult(os.getpid(), len(batch), written, time.perf_counter() - start, minify_saved=minify.saved)
+    if collected is not None:
+        result.profile_data = collected.data()
+    if settings.search_index:
+        result.index_terms = searchindex.collected
+        result.index_seconds = searchindex.seconds
+    return result
+
+
+def render_pages_parallel(pages: list[tuple[Path, Path]], template_path: Path, base_path: str, jobs: int, pipeline: bool = False) -> int:
+    """
+    Renders pages on a pool of jobs worker processes using the same generate_page as the serial build,
+    so the output is identical. Prints the per-worker timings and returns how many pages were written.
+    When profiling, the workers profile their pages and the samples are merged into the active profiler.
+    """
+    workers = {}
+    written = 0
+    if not pages:
+        return written
+
+    active = profiler.current
+    settings = RenderSettings.current(pipeline)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(render_batch, batch, template_path, base_path, settings) for batch in batch_pages(pages, jobs)]
+        for future in futures:
+            result = future.result()
+            written += result.written
+            minify.saved += result.minify_saved
+            if result.index_terms is not None:
+                searchindex.collected.update(result.index_terms)
+                searchindex.seconds += result.index_seconds
+            if result.profile_data is not None:
+                active.merge(result.profile_data)
+            stats = workers.setdefault(result.pid, [0, 0.0])
+            stats[0] += result.count
+            stats[1] += result.seconds
+    wall = time.perf_counter() - start
+
+    busy = sum(seconds for _, seconds in workers.values())
+    for pid, (count, seconds) in sorted(workers.items()):
+        print(f"Worker {pid}: {count} pages in {seconds:.3f}s")
+    print(f"Rendered {len(pages)} pages on {len(workers)} workers in {wall:.3f}s (parallelism {busy / wall:.2f}x)")
+    return written
@@ -0,0 +1,121 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import profiler
+import searchindex
+from generate_page import extract_title, render_page
+from output import write_text_if_changed
+from template import load_template
+
+# Reader threads prefetching sources. Reads mostly wait on the filesystem, so a few threads hide
+# the latency of network mounts without competing with the renderer for the GIL
+READ_THREADS = 4
+# Sources read ahead of the renderer, and rendered pages waiting for the writer. Once either is
+# full, the stage feeding it waits, so memory stays bounded however far one stage falls behind
+READ_AHEAD = 16
+WRITE_BEHIND = 16
+# Most pages the writer takes off its queue in one go
+WRITE_BATCH = 8
+
+# Marks the end of the pages on the write queue
+DONE = None
+
+
+def read_source(path: Path) -> str:
+    text = path.read_text()
+    profiler.count("bytes_read", len(text))
+    return text
+
+
+class Writer(threading.Thread):
+    """
+    Writes rendered pages from a bounded queue on its own thread, taking whatever is waiting in batches
+    and creating each output directory only once. Pages that are already on disk unchanged are skipped.
+    The first error is kept for the renderer to raise, and the queue keeps being drained so the renderer
+    never blocks on a dead writer
+    """
+    def __init__(self, write_queue: queue.Queue):
+        super().__init__(name="page-writer", daemon=True)
+        self.queue = write_queue
+        self.created_dirs = set()
+        self.written = 0
+        self.error = None
+
+    def run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < WRITE_BATCH and batch[-1] is not DONE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is DONE:
+                    return
+                if self.error is None:
+                    try:
+                        self.write(*item)
+                    except Exception as e:
+                        self.error = e
+
+    def write(self, dest_path: Path, html: str) -> None:
+        parent = dest_path.parent
+        if parent not in self.created_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self.created_dirs.add(parent)
+        self.written += write_text_if_changed(dest_path, html)
+        profiler.count("bytes_written", len(html))
+
+
+def render_pages_pipelined(pages: list[tuple[Path, Path]], template_path: Path, base_path: str,
+                           read_threads: int = READ_THREADS, read_ahead: int = READ_AHEAD,
+                           write_behind: int = WRITE_BEHIND) -> int:
+    """
+    Renders pages in three overlapping stages: a thread pool reads sources up to read_ahead pages ahead,
+    this thread renders them in order, and a writer thread writes the results behind it. Produces the
+    same files as rendering each page with generate_page, and returns how many pages were written
+    """
+    template = load_template(template_path, base_path)
+    write_queue = queue.Queue(write_behind)
+    writer = Writer(write_queue)
+    writer.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix="page-reader") as readers:
+            remaining = iter(pages)
+            reads = deque()
+
+            def read_next() -> None:
+                for from_path, dest_path in remaining:
+                    reads.append((from_path, dest_path, readers.submit(read_source, from_path)))
+                    return
+
+            for _ in range(read_ahead):
+                read_next()
+
+            while reads:
+                from_path, dest_path, source = reads.popleft()
+                read_next()
+                print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+                terms = set() if searchindex.enabled else None
+                markdown = source.result()
+                if profiler.current is None:
+                    html = render_page(markdown, template, terms)
+                else:
+                    # the read and write stages count their own bytes on their threads, so only the render is timed
+                    html = profiler.current.run_page(str(from_path), None, None, render_page, markdown, template, terms)
+                write_queue.put((dest_path, html))
+                if terms is not None:
+                    searchindex.collected[from_path] = (extract_title(markdown), terms)
+                if writer.error is not None:
+                    break
+    finally:
+        write_queue.put(DONE)
+        writer.join()
+
+    if writer.error is not None:
+        raise writer.error
+    return writer.written
@@ -0,0 +1,152 @@
+import functools
+import time
+from pathlib import Path
+
+# The active Profiler, or None when profiling is off. Hooks check this on every call, so they cost
+# next to nothing in a normal build
+current = None
+
+
+def timed(name: str):
+    """Decorator recording each call's duration under the stage name while a profiler is active"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = current
+            if profiler is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.add(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count(name: str, n: int = 1) -> None:
+    """Adds n to a counter while a profiler is active"""
+    if current is not None:
+        current.count(name, n)
+
+
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+class Profiler():
+    """
+    Collects per-call timings for each pipeline stage, counters such as bytes read and written, and the
+    total time of every page. With pstats_dir set, each page is also run under cProfile and its stats are
+    dumped there, ready for pstats, snakeviz or a flamegraph converter
+    """
+    def __init__(self, pstats_dir: Path | None = None):
+        self.pstats_dir = pstats_dir
+        self.stages = {}
+        self.totals = {}
+        self.counters = {}
+        self.pages = []
+        # the pipeline's reader and writer threads and the asset hashing threads record into the same
+        # profiler, and a read-modify-write of a total can otherwise lose another thread's update
+        import threading
+        self.lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.stages.setdefault(name, []).append(seconds)
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def total(self, name: str) -> float:
+        return self.totals.get(name, 0.0)
+
+    def run_page(self, name: str, from_path: Path | None, dest_path: Path | None, func, *args):
+        """
+        Runs func(*args) as the rendering of one page, recording its time and the bytes it read and wrote.
+        Without paths the bytes are left to the caller to count, e.g. when another thread writes the page.
+        Returns func's result
+        """
+        rendered_before = self.total("render")
+        converted_before = self.total("block_to_html_node")
+        start = time.perf_counter()
+        if self.pstats_dir is None:
+            result = func(*args)
+        else:
+            import cProfile
+            profile = cProfile.Profile()
+            result = profile.runcall(func, *args)
+            stats_path = self.pstats_dir / (name.strip("/").replace("/", "__") + ".pstats")
+            stats_path.parent.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(stats_path)
+        elapsed = time.perf_counter() - start
+
+        self.add("page", elapsed)
+        # blocks are converted lazily while the template is written, so what's left of
+        # the render time once conversion is taken out is serialization
+        rendered = self.total("render") - rendered_before
+        converted = self.total("block_to_html_node") - converted_before
+        self.add("serialize", max(0.0, rendered - converted))
+        self.pages.append((elapsed, name))
+        if from_path is not None:
+            count("bytes_read", from_path.stat().st_size)
+        if dest_path is not None:
+            count("bytes_written", dest_path.stat().st_size)
+        return result
+
+    def data(self) -> dict:
+        """The collected samples as plain data, e.g. to send back from a worker process"""
+        return {"stages": self.stages, "counters": self.counters, "pages": self.pages}
+
+    def merge(self, data: dict) -> None:
+        """Adds the samples collected by another profiler, see data()"""
+        for name, samples in data["stages"].items():
+            self.stages.setdefault(name, []).extend(samples)
+            self.totals[name] = self.totals.get(name, 0.0) + sum(samples)
+        for name, n in data["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        self.pages.extend(data["pages"])
+
+    def report(self, slowest: int = 10) -> str:
+        """Total and p50/p95/max time per stage, the slowest pages and the counters, as a printable table"""
+        lines = [f"{'stage':<20} {'calls':>8} {'total (ms)':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} {'max (ms)':>9}"]
+        for name, samples in sorted(self.stages.items(), key=lambda item: -sum(item[1])):
+            ordered = sorted(samples)
+            lines.append(
+                f"{name:<20} {len(ordered):>8} {sum(ordered) * 1000:>11.2f} {percentile(ordered, 0.5) * 1000:>9.3f}"
+                f" {percentile(ordered, 0.95) * 1000:>9.3f} {ordered[-1] * 1000:>9.3f}"
+            )
+
+        if self.pages:
+            lines.append("")
+            lines.append(f"Slowest {min(slowest, len(self.pages))} pages:")
+            for seconds, name in sorted(self.pages, reverse=True)[:slowest]:
+                lines.append(f"{seconds * 1000:>10.2f} ms  {name}")
+
+        if self.counters:
+            lines.append("")
+            for name, n in sorted(self.counters.items()):
+                lines.append(f"{name:<20} {n:>12,}")
+
+        if self.pstats_dir is not None:
+            lines.append("")
+            lines.append(f"Per-page cProfile stats written to {self.pstats_dir}")
+        return "\n".join(lines)
+
+
+def enable(pstats_dir: Path | None = None) -> Profiler:
+    """Starts profiling in this process and returns the active profiler"""
+    global current
+    current = Profiler(pstats_dir)
+    return current
+
+
+def disable() -> Profiler | None:
+    """Stops profiling, returning the profiler that was active"""
+    global current
+    profiler, current = current, None
+    return profiler
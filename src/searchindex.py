@@ -0,0 +1,204 @@
+import re
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from htmlnode import RawHTMLNode
+
+SEARCH_INDEX_NAME = "search-index.bin"
+SEARCH_INDEX_VERSION = 1
+
+# Words of two or more letters or digits, lowercased. Single characters match nearly every page
+TERM_RE = re.compile(r"\w{2,}")
+TAG_RE = re.compile(r"<[^>]*>")
+
+# Turned on by --search-index
+enabled = False
+
+# (title, terms) of every page rendered in this process since it was last reset, by source path.
+# Worker processes hand theirs back with their results, see render_batch
+collected = {}
+# Seconds spent collecting them, for the build report
+seconds = 0.0
+
+
+def configure(on: bool) -> None:
+    global enabled
+    enabled = on
+
+
+def node_texts(node, texts: list[str]) -> None:
+    """Appends the text of every leaf under node, i.e. the TextNode texts it was built from"""
+    for child in node.children:
+        if child.children is not None:
+            node_texts(child, texts)
+        elif child.value:
+            texts.append(child.value)
+
+
+def collect_terms(blocks, terms: set):
+    """
+    Yields the block nodes of a page unchanged, collecting their text on the way, and adds the page's terms
+    to terms once the last block is through, so the page is indexed while it streams through the template.
+    Blocks from the block cache only have their HTML left, so their tags are stripped
+    """
+    global seconds
+    texts = []
+    for block in blocks:
+        start = time.perf_counter()
+        if isinstance(block, RawHTMLNode):
+            from html import unescape
+            texts.append(unescape(TAG_RE.sub(" ", block.value)))
+        elif block.children is not None:
+            node_texts(block, texts)
+        elif block.value:
+            texts.append(block.value)
+        seconds += time.perf_counter() - start
+        yield block
+    start = time.perf_counter()
+    # pages repeat most of their words, so splitting first leaves the regex only the distinct tokens
+    for token in set(" ".join(texts).lower().split()):
+        terms.update(TERM_RE.findall(token))
+    seconds += time.perf_counter() - start
+
+
+def page_url(base_path: str, dest: str) -> str:
+    """The URL a page is listed under, given its path relative to the output directory"""
+    if dest == "index.html" or dest.endswith("/index.html"):
+        dest = dest.removesuffix("index.html")
+    return base_path + dest
+
+
+def pad(data: bytes, fill: bytes) -> bytes:
+    """Pads data to a multiple of 4 bytes, so the arrays after it can be mapped straight onto typed arrays"""
+    return data + fill * (-len(data) % 4)
+
+
+class SearchIndex():
+    """
+    Inverted index of the built pages: every term maps to the sorted IDs of the pages containing it, and a
+    page's ID is its position in pages, which holds [url, title] or None for the slot of a removed page.
+    Slots are reused, so updating a few pages never renumbers the rest.
+
+    On disk it is a little-endian uint32 header length, the JSON header (pages, term count, byte length of
+    the terms and the typecode of the postings), the sorted terms as newline separated UTF-8, then a uint32
+    array of terms + 1 offsets into the postings and the postings array itself, "H" (uint16) when every ID
+    fits and "I" (uint32) otherwise. Sections are padded to 4 bytes
+    """
+    def __init__(self, path: Path, pages: list | None = None, postings: dict[str, set[int]] | None = None):
+        self.path = path
+        self.pages = pages if pages is not None else []
+        self.postings = postings if postings is not None else {}
+        self.ids = {page[0]: i for i, page in enumerate(self.pages) if page is not None}
+
+    @classmethod
+    def load(cls, path: Path) -> "SearchIndex":
+        """Loads the index at path, returning an empty index if it is missing, unreadable or from another version"""
+        import json
+        try:
+            data = path.read_bytes()
+            header_end = 4 + int.from_bytes(data[:4], "little")
+            header = json.loads(data[4:header_end])
+            if header.get("version") != SEARCH_INDEX_VERSION:
+                return cls(path)
+            terms_end = header_end + header["terms_bytes"]
+            terms = data[header_end:terms_end].decode().split("\n") if header["terms"] else []
+            offsets = array("I")
+            offsets_start = terms_end + (-terms_end % 4)
+            offsets.frombytes(data[offsets_start:offsets_start + 4 * (len(terms) + 1)])
+            ids = array(header["typecode"])
+            ids.frombytes(data[offsets_start + 4 * (len(terms) + 1):])
+        except (OSError, ValueError, KeyError):
+            return cls(path)
+        if sys.byteorder == "big":
+            offsets.byteswap()
+            ids.byteswap()
+        postings = {term: set(ids[offsets[i]:offsets[i + 1]]) for i, term in enumerate(terms)}
+        return cls(path, header["pages"], postings)
+
+    def remove(self, urls) -> None:
+        """Drops the pages at urls from the index, freeing their IDs"""
+        removed = {self.ids.pop(url) for url in urls if url in self.ids}
+        if not removed:
+            return
+        for page_id in removed:
+            self.pages[page_id] = None
+        for term in [term for term, ids in self.postings.items() if not ids.isdisjoint(removed)]:
+            ids = self.postings[term]
+            ids -= removed
+            if not ids:
+                del self.postings[term]
+
+    def update(self, pages: dict[str, tuple[str, set[str]]], removed=()) -> None:
+        """Replaces the entries of the pages, given as {url: (title, terms)}, and drops the removed urls"""
+        self.remove([*pages, *removed])
+        free = [i for i in range(len(self.pages) - 1, -1, -1) if self.pages[i] is None]
+        for url, (title, terms) in pages.items():
+            if free:
+                page_id = free.pop()
+                self.pages[page_id] = [url, title]
+            else:
+                page_id = len(self.pages)
+                self.pages.append([url, title])
+            self.ids[url] = page_id
+            for term in terms:
+                ids = self.postings.get(term)
+                if ids is None:
+                    self.postings[term] = {page_id}
+                else:
+                    ids.add(page_id)
+        while self.pages and self.pages[-1] is None:
+            self.pages.pop()
+
+    def to_bytes(self) -> bytes:
+        import json
+        terms = sorted(self.postings)
+        typecode = "H" if len(self.pages) <= 1 << 16 else "I"
+        offsets = array("I", [0])
+        ids = array(typecode)
+        for term in terms:
+            ids.extend(sorted(self.postings[term]))
+            offsets.append(len(ids))
+        if sys.byteorder == "big":
+            offsets.byteswap()
+            ids.byteswap()
+        terms_data = "\n".join(terms).encode()
+        header = json.dumps({
+            "version": SEARCH_INDEX_VERSION,
+            "pages": self.pages,
+            "terms": len(terms),
+            "terms_bytes": len(terms_data),
+            "typecode": typecode,
+        }, separators=(",", ":")).encode()
+        # JSON allows trailing whitespace, so the header is padded with spaces
+        header = pad(header, b" ")
+        return len(header).to_bytes(4, "little") + header + pad(terms_data, b"\0") + offsets.tobytes() + ids.tobytes()
+
+    def search(self, query: str) -> list[list[str]]:
+        """The [url, title] of the pages containing every term of query"""
+        matches = None
+        for term in TERM_RE.findall(query.lower()):
+            ids = self.postings.get(term, set())
+            matches = ids if matches is None else matches & ids
+        return [self.pages[page_id] for page_id in sorted(matches or ())]
+
+    def save(self) -> int:
+        """Writes the index to disk, replacing the previous one atomically. Returns its size in bytes"""
+        data = self.to_bytes()
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(self.path)
+        return len(data)
+
+
+def write_index(index: SearchIndex, rendered: dict[str, tuple[str, set[str]]], removed=()) -> None:
+    """Updates index with the rendered pages, given as {url: (title, terms)}, saves it and prints its size and cost"""
+    start = time.perf_counter()
+    if rendered or removed or not index.path.exists():
+        index.update(rendered, removed)
+        size = index.save()
+    else:
+        size = index.path.stat().st_size
+    print(f"Search index: {len(index.postings)} terms over {len(index.ids)} pages in {size} bytes, {len(rendered)} pages "
+          f"updated. Collecting terms took {seconds * 1000:.0f}ms, writing {(time.perf_counter() - start) * 1000:.0f}ms")
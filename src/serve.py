@@ -0,0 +1,278 @@
+import email.utils
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import quote, unquote, urlsplit
+
+from compress import sidecar_current
+from fingerprint import url_map
+from manifest import BuildManifest, MANIFEST_NAME
+
+# Files up to this size are kept in memory and written straight from there, larger ones are sent with sendfile
+CACHE_FILE_SIZE = 64 * 1024
+# Total size of the cached files, least recently used ones are dropped beyond it
+CACHE_BYTES = 32 * 1024 * 1024
+
+# Fingerprinted assets never change under their name, everything else is revalidated with its ETag
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def accepts_gzip(header: str | None) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q=0"""
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            q = params.strip().removeprefix("q=")
+            try:
+                return not params or float(q) > 0
+            except ValueError:
+                return True
+    return False
+
+
+class FileCache():
+    """
+    Remembers the ETag of every file served, and the bytes of small files in an LRU. Entries are keyed on
+    size and mtime, so a file replaced by a rebuild is hashed and read again. Files are read from a descriptor
+    the caller opened and took the size and mtime from, so a rebuild replacing the file in between can't pair
+    the new bytes with the old key. Safe to share between threads
+    """
+    def __init__(self, max_bytes: int = CACHE_BYTES, max_file_size: int = CACHE_FILE_SIZE):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.lock = threading.Lock()
+        self.etags = {}
+        self.bodies = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def seed(self, path: Path, size: int, mtime: int, digest: str) -> None:
+        """Records a known sha256 digest, e.g. from the build manifest, so the file never has to be hashed here"""
+        with self.lock:
+            self.etags[path] = (size, mtime, f'"{digest[:32]}"')
+
+    def etag(self, path: Path, f: BinaryIO, size: int, mtime: int) -> str:
+        with self.lock:
+            known = self.etags.get(path)
+        if known is not None and known[:2] == (size, mtime):
+            return known[2]
+        digest = hashlib.sha256()
+        f.seek(0)
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:32]}"'
+        with self.lock:
+            self.etags[path] = (size, mtime, etag)
+        return etag
+
+    def body(self, path: Path, f: BinaryIO, size: int, mtime: int) -> bytes | None:
+        """The contents of a small file, from memory when they are current. None for files too big to cache"""
+        if size > self.max_file_size:
+            return None
+        with self.lock:
+            cached = self.bodies.get(path)
+            if cached is not None and cached[:2] == (size, mtime):
+                self.bodies.move_to_end(path)
+                self.hits += 1
+                return cached[2]
+        f.seek(0)
+        data = f.read(size)
+        with self.lock:
+            self.misses += 1
+            old = self.bodies.pop(path, None)
+            if old is not None:
+                self.size -= len(old[2])
+            self.bodies[path] = (size, mtime, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self.bodies.popitem(last=False)
+                self.size -= len(evicted)
+        return data
+
+
+class StaticHandler(BaseHTTPRequestHandler):
+    """
+    Serves the files under the server's root with keep-alive, strong ETags and conditional GETs. Precompressed
+    .gz sidecars are sent to clients that accept gzip, and large bodies go out with sendfile
+    """
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, Nagle's algorithm would hold the body back for a delayed ACK
+    disable_nagle_algorithm = True
+    server: "StaticServer"
+
+    def do_GET(self) -> None:
+        self.serve(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self.serve(send_body=False)
+
+    def resolve(self, url_path: str) -> Path | None:
+        """The file a URL path points at, index.html for directories. None when there is none or it isn't public"""
+        if not url_path.startswith(self.server.base_path):
+            return None
+        relative = url_path[len(self.server.base_path):]
+        try:
+            path = (self.server.root / relative).resolve()
+        except (OSError, ValueError):
+            # e.g. an encoded null byte, which no file name can hold
+            return None
+        if not path.is_relative_to(self.server.root):
+            return None
+        if path.is_dir():
+            path = path / "index.html"
+        # hidden files are the build manifest and half-written temporary files
+        if any(part.startswith(".") for part in path.relative_to(self.server.root).parts) or not path.is_file():
+            return None
+        return path
+
+    def serve(self, send_body: bool) -> None:
+        url_path = unquote(urlsplit(self.path).path)
+        path = self.resolve(url_path)
+        if path is None:
+            self.send_error(404, "File not found")
+            return
+        if path.name == "index.html" and not url_path.endswith(("/", "index.html")):
+            # relative links in the page resolve against the directory. The path goes back out quoted, so
+            # decoded control characters can't end the header
+            self.send_response(301)
+            self.send_header("Location", quote(url_path) + "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        # every file is opened once and its length, cache key and body all come from that descriptor, so a
+        # rebuild replacing it mid-request can't send a length that doesn't match the bytes
+        with ExitStack() as files:
+            try:
+                f = files.enter_context(path.open("rb"))
+            except FileNotFoundError:
+                self.send_error(404, "File not found")
+                return
+            stat = os.fstat(f.fileno())
+            etag = self.server.files.etag(path, f, stat.st_size, stat.st_mtime_ns)
+            content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+                content_type += "; charset=utf-8"
+            headers = {
+                "Content-Type": content_type,
+                "Cache-Control": IMMUTABLE if url_path in self.server.immutable else REVALIDATE,
+                "Last-Modified": email.utils.formatdate(stat.st_mtime, usegmt=True),
+            }
+
+            body_path, body, body_stat = path, f, stat
+            sidecar = path.with_name(path.name + ".gz")
+            if sidecar_current(path, sidecar):
+                headers["Vary"] = "Accept-Encoding"
+                if accepts_gzip(self.headers.get("Accept-Encoding")):
+                    try:
+                        body = files.enter_context(sidecar.open("rb"))
+                    except FileNotFoundError:
+                        pass
+                    else:
+                        body_path, body_stat = sidecar, os.fstat(body.fileno())
+                        headers["Content-Encoding"] = "gzip"
+                        # a strong ETag belongs to one representation
+                        etag = etag[:-1] + '-gz"'
+            headers["ETag"] = etag
+
+            if self.not_modified(etag, stat.st_mtime):
+                self.send_response(304)
+                for name in ("ETag", "Cache-Control", "Last-Modified", "Vary"):
+                    if name in headers:
+                        self.send_header(name, headers[name])
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(body_stat.st_size))
+            self.end_headers()
+            if send_body:
+                self.send_file(body_path, body, body_stat.st_size, body_stat.st_mtime_ns)
+
+    def not_modified(self, etag: str, mtime: float) -> bool:
+        """Whether the client's copy is current, by If-None-Match, or by If-Modified-Since when there is none"""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                return int(mtime) <= email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_file(self, path: Path, f: BinaryIO, size: int, mtime: int) -> None:
+        """Sends the first size bytes of the open file f, whose path and mtime key the cache"""
+        data = self.server.files.body(path, f, size, mtime)
+        if data is not None:
+            self.wfile.write(data)
+            return
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except (AttributeError, OSError):
+            # no sendfile for this platform or socket, copy the rest in user space
+            f.seek(offset)
+            while offset < size and (chunk := f.read(min(1 << 20, size - offset))):
+                self.wfile.write(chunk)
+                offset += len(chunk)
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class StaticServer(ThreadingHTTPServer):
+    """Threaded HTTP server for a built site, reading the ETags of static files from its build manifest"""
+    daemon_threads = True
+    # socketserver's default listen backlog of 5 resets connections when many clients connect at once
+    request_queue_size = 128
+
+    def __init__(self, address: tuple[str, int], root: Path, base_path: str = "/", quiet: bool = False):
+        super().__init__(address, StaticHandler)
+        self.root = root.resolve()
+        self.base_path = base_path if base_path.endswith("/") else base_path + "/"
+        self.quiet = quiet
+        self.files = FileCache()
+        self.immutable = set()
+        self.load_manifest()
+
+    def load_manifest(self) -> None:
+        """
+        Seeds the ETags of static files and their fingerprinted copies from the hashes in the build manifest,
+        which were taken of the same bytes with the same size and mtime
+        """
+        manifest = BuildManifest.load(self.root / MANIFEST_NAME)
+        for key, entry in manifest.assets.items():
+            fingerprinted = url_map({key: entry})[f"/{key}"]
+            self.immutable.add(self.base_path + fingerprinted[1:])
+            for url in (f"/{key}", fingerprinted):
+                self.files.seed(self.root / url[1:], entry["size"], entry["mtime"], entry["hash"])
+
+
+def serve_site(root: Path, host: str, port: int, base_path: str = "/", quiet: bool = False) -> None:
+    """Serves root until interrupted"""
+    with StaticServer((host, port), root, base_path, quiet) as server:
+        print(f"Serving {root} on http://{host}:{server.server_address[1]}{server.base_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,253 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from generate_page import render_page
+from profiler import percentile
+from template import load_template
+
+# Most requests rendered together. A batch goes to one worker in a single round trip, so under load
+# the pickling and scheduling cost is shared between requests
+BATCH_SIZE = 16
+# Seconds the batcher waits for more requests to join a batch. Well below a render, so an idle server
+# adds next to nothing to a lone request
+BATCH_WINDOW = 0.002
+# Latency samples kept for /metrics
+METRICS_WINDOW = 10_000
+# Seconds a request waits for its render before the server gives up on it with a 504
+RENDER_TIMEOUT = 60
+
+
+def render_sources(sources: list[str], template_path: Path, base_path: str) -> list[tuple[bool, str, float]]:
+    """Renders a batch of markdown sources, returning (ok, html or error message, seconds) for each"""
+    template = load_template(template_path, base_path)
+    results = []
+    for source in sources:
+        start = time.perf_counter()
+        try:
+            results.append((True, render_page(source, template), time.perf_counter() - start))
+        except Exception as e:
+            results.append((False, str(e), time.perf_counter() - start))
+    return results
+
+
+class Renderer(threading.Thread):
+    """
+    Collects render requests into batches and renders them on a pool of worker processes, or on this
+    thread when workers is 0. submit() returns a Future of (ok, html or error message, render seconds)
+    """
+    def __init__(self, template_path: Path, base_path: str, workers: int, batch_size: int = BATCH_SIZE,
+                 batch_window: float = BATCH_WINDOW):
+        super().__init__(name="renderer", daemon=True)
+        self.template_path = template_path
+        self.base_path = base_path
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.requests = queue.Queue()
+        self.batches = 0
+
+    def submit(self, source: str) -> Future:
+        future = Future()
+        self.requests.put((source, future))
+        return future
+
+    def run(self) -> None:
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.requests.get(timeout=max(0.0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+            self.batches += 1
+            sources = [source for source, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                if self.pool is None:
+                    self.resolve(futures, render_sources(sources, self.template_path, self.base_path))
+                else:
+                    rendering = self.submit_batch(sources)
+                    rendering.add_done_callback(lambda done, futures=futures: self.resolve_from(futures, done))
+            except Exception as e:
+                # this thread has to outlive any one batch, or every later request would wait forever
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def submit_batch(self, sources: list[str]) -> Future:
+        """Hands a batch to the pool, replacing the pool once if a worker died and broke it"""
+        try:
+            return self.pool.submit(render_sources, sources, self.template_path, self.base_path)
+        except BrokenProcessPool:
+            print("A render worker died, restarting the worker pool")
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self.pool.submit(render_sources, sources, self.template_path, self.base_path)
+
+    def resolve(self, futures: list[Future], results: list) -> None:
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+    def resolve_from(self, futures: list[Future], done: Future) -> None:
+        if done.exception() is not None:
+            for future in futures:
+                future.set_exception(done.exception())
+        else:
+            self.resolve(futures, done.result())
+
+
+class Metrics():
+    """Request counts and the latencies of the most recent requests, in seconds"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.latencies = []
+        self.renders = []
+
+    def record(self, latency: float, render: float, ok: bool) -> None:
+        with self.lock:
+            self.requests += 1
+            self.errors += not ok
+            self.latencies.append(latency)
+            self.renders.append(render)
+            if len(self.latencies) > METRICS_WINDOW:
+                del self.latencies[:len(self.latencies) - METRICS_WINDOW]
+                del self.renders[:len(self.renders) - METRICS_WINDOW]
+
+    def data(self) -> dict:
+        with self.lock:
+            data = {"requests": self.requests, "errors": self.errors}
+            for name, samples in (("latency_ms", sorted(self.latencies)), ("render_ms", sorted(self.renders))):
+                if samples:
+                    data[name] = {
+                        "p50": percentile(samples, 0.5) * 1000,
+                        "p95": percentile(samples, 0.95) * 1000,
+                        "p99": percentile(samples, 0.99) * 1000,
+                        "max": samples[-1] * 1000,
+                    }
+        return data
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """
+    POST /render with markdown as the body, or GET /render?path=FILE for a file under the content
+    directory, returns the rendered page. GET /metrics returns the request latencies as JSON
+    """
+    # keep-alive, so a preview client can reuse its connection
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, which Nagle's algorithm would hold back for the
+    # client's delayed ACK, about 40ms per request on a kept-alive connection
+    disable_nagle_algorithm = True
+    server: "RenderServer"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            data = self.server.metrics.data()
+            data["batches"] = self.server.renderer.batches
+            self.respond(200, "application/json", json.dumps(data))
+        elif url.path == "/render":
+            path = parse_qs(url.query).get("path", [""])[0]
+            source_path = (self.server.content_dir / path).resolve()
+            if not path or not source_path.is_relative_to(self.server.content_dir) or not source_path.is_file():
+                self.respond(404, "text/plain", f"No markdown file {path!r} in the content directory")
+                return
+            self.render(source_path.read_text())
+        else:
+            self.respond(404, "text/plain", "Not found")
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != "/render":
+            self.respond(404, "text/plain", "Not found")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            # there's no telling where the body ends and the next request starts, so the connection is closed
+            self.respond(400, "text/plain", "Invalid Content-Length", {"Connection": "close"})
+            return
+        try:
+            source = self.rfile.read(length).decode()
+        except UnicodeDecodeError:
+            self.respond(400, "text/plain", "The markdown must be UTF-8")
+            return
+        self.render(source)
+
+    def render(self, source: str) -> None:
+        start = time.perf_counter()
+        try:
+            ok, body, render_seconds = self.server.renderer.submit(source).result(timeout=self.server.render_timeout)
+        except TimeoutError:
+            self.server.metrics.record(time.perf_counter() - start, 0.0, False)
+            self.respond(504, "text/plain", "Rendering timed out")
+            return
+        except Exception as e:
+            # e.g. the worker rendering the batch died
+            self.server.metrics.record(time.perf_counter() - start, 0.0, False)
+            self.respond(503, "text/plain; charset=utf-8", f"Rendering failed: {e}")
+            return
+        latency = time.perf_counter() - start
+        self.server.metrics.record(latency, render_seconds, ok)
+        timing = f"render;dur={render_seconds * 1000:.2f}, total;dur={latency * 1000:.2f}"
+        if ok:
+            self.respond(200, "text/html; charset=utf-8", body, {"Server-Timing": timing})
+        else:
+            self.respond(400, "text/plain; charset=utf-8", body, {"Server-Timing": timing})
+
+    def respond(self, status: int, content_type: str, body: str, headers: dict | None = None) -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class RenderServer(ThreadingHTTPServer):
+    """Threaded HTTP server handing render requests to a shared Renderer"""
+    daemon_threads = True
+    # socketserver's default listen backlog of 5 resets connections when many clients connect at once
+    request_queue_size = 128
+
+    def __init__(self, address: tuple[str, int], content_dir: Path, renderer: Renderer, quiet: bool = False,
+                 render_timeout: float = RENDER_TIMEOUT):
+        super().__init__(address, RenderHandler)
+        self.content_dir = content_dir.resolve()
+        self.renderer = renderer
+        self.render_timeout = render_timeout
+        self.metrics = Metrics()
+        self.quiet = quiet
+
+
+def serve_renders(host: str, port: int, content_dir: Path, template_path: Path, base_path: str, workers: int,
+                  batch_size: int = BATCH_SIZE, quiet: bool = False) -> None:
+    """Runs the render server until interrupted"""
+    renderer = Renderer(template_path, base_path, workers, batch_size)
+    renderer.start()
+    with RenderServer((host, port), content_dir, renderer, quiet) as server:
+        print(f"Rendering on http://{host}:{server.server_address[1]}/render with {workers or 'no'} worker processes")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if renderer.pool is not None:
+                renderer.pool.shutdown(cancel_futures=True)
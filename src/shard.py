@@ -0,0 +1,84 @@
+import hashlib
+from pathlib import Path
+
+from manifest import BuildManifest, MANIFEST_NAME
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """Parses "i/N", the i-th of N shards counting from 1"""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {text!r}, expected i/N, e.g. 1/4")
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {text!r}, i must be between 1 and N")
+    return index, count
+
+
+def shard_of(key: str, count: int) -> int:
+    """
+    The shard (1 to count) a page belongs to, from a hash of its content-relative path. The hash doesn't
+    depend on the machine, the Python version or which other pages exist, so every host agrees on it
+    """
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def load_shard_manifests(shard_dirs: list[Path]) -> list[BuildManifest]:
+    """Loads the manifest of every shard output, checking that together they make up exactly one whole build"""
+    manifests = [BuildManifest.load(shard_dir / MANIFEST_NAME) for shard_dir in shard_dirs]
+    for shard_dir, manifest in zip(shard_dirs, manifests):
+        if manifest.shard is None:
+            raise Exception(f"{shard_dir} is not the output of a sharded build")
+
+    shards = sorted(parse_shard(manifest.shard) for manifest in manifests)
+    count = shards[0][1] if shards else 0
+    # with no shards at all, merging would remove every page
+    if not shards or shards != [(i, count) for i in range(1, count + 1)]:
+        found = ", ".join(f"{i}/{n}" for i, n in shards)
+        raise Exception(f"Shards don't add up to a whole build, found: {found or 'none'}")
+    if len({(manifest.template_hash, manifest.base_path, manifest.minify, manifest.parser_version) for manifest in manifests}) > 1:
+        raise Exception("Shards were built with different templates, base paths, minify settings or converter versions")
+    return manifests
+
+
+def merge_shards(shard_dirs: list[Path], dest_dir_path: Path, manifest: BuildManifest, checksum: bool = False,
+                 hardlink: bool = False, manifests: list[BuildManifest] | None = None) -> tuple[int, int]:
+    """
+    Combines the outputs of every shard of a build into dest_dir_path: pages that differ are copied in,
+    pages no shard has any more are removed, and the merged manifest is saved. manifests are the shards'
+    manifests when the caller already loaded them with load_shard_manifests. Returns (copied, removed)
+    """
+    from generate_page import remove_stale_output
+    from sync import files_match, sync_file
+
+    pages = {}
+    copied = 0
+    if manifests is None:
+        manifests = load_shard_manifests(shard_dirs)
+    for shard_dir, shard_manifest in zip(shard_dirs, manifests):
+        for key, entry in shard_manifest.pages.items():
+            pages[key] = entry
+            src = shard_dir / entry["dest"]
+            dest = dest_dir_path / entry["dest"]
+            if not files_match(src, dest, checksum):
+                print(f"Copying {src}")
+                sync_file(src, dest, hardlink)
+                copied += 1
+
+    removed = 0
+    for key, entry in manifest.pages.items():
+        if key not in pages:
+            remove_stale_output(dest_dir_path / entry["dest"], dest_dir_path)
+            removed += 1
+
+    print(f"Merged {len(manifests)} shards: copied {copied} of {len(pages)} pages, removed {removed}")
+
+    manifest.template_hash = manifests[0].template_hash
+    manifest.base_path = manifests[0].base_path
+    manifest.parser_version = manifests[0].parser_version
+    manifest.minify = manifests[0].minify
+    manifest.pages = pages
+    manifest.shard = None
+    manifest.save()
+    return copied, removed
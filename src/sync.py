@@ -0,0 +1,135 @@
+import os
+import shutil
+from pathlib import Path
+
+import profiler
+from generate_page import remove_stale_output
+from manifest import BuildManifest, hash_file
+
+# ioctl request that clones a file's extents on copy-on-write filesystems (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+# Copying is I/O bound, so threads overlap the waiting despite the GIL
+SYNC_THREADS = 8
+
+
+def files_match(src: Path, dest: Path, checksum: bool = False) -> bool:
+    """Whether dest already holds src, judged by size and mtime, or by content hash when checksum is set"""
+    try:
+        dest_stat = dest.stat()
+    except FileNotFoundError:
+        return False
+    src_stat = src.stat()
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if checksum:
+        return hash_file(src) == hash_file(dest)
+    return src_stat.st_mtime_ns == dest_stat.st_mtime_ns
+
+
+def clone_file(src_fd: int, dest_fd: int) -> bool:
+    """Tries to reflink dest to src's data. Returns False where the platform or filesystem can't"""
+    try:
+        import fcntl
+        fcntl.ioctl(dest_fd, FICLONE, src_fd)
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def copy_fd(src_fd: int, dest_fd: int, size: int) -> None:
+    """Copies size bytes in the kernel with copy_file_range, falling back to sendfile and then a plain read/write loop"""
+    copied = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                sent = os.copy_file_range(src_fd, dest_fd, size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+            return
+        except OSError:
+            # e.g. EXDEV across filesystems on older kernels, retry from where it stopped
+            pass
+    try:
+        while copied < size:
+            sent = os.sendfile(dest_fd, src_fd, copied, size - copied)
+            if sent == 0:
+                break
+            copied += sent
+        return
+    except (AttributeError, OSError):
+        pass
+    os.lseek(src_fd, copied, os.SEEK_SET)
+    os.lseek(dest_fd, copied, os.SEEK_SET)
+    while chunk := os.read(src_fd, 1 << 20):
+        os.write(dest_fd, chunk)
+
+
+@profiler.timed("static_copy")
+def sync_file(src: Path, dest: Path, hardlink: bool = False) -> None:
+    """
+    Puts a copy of src at dest, replacing it atomically. With hardlink, dest becomes another link to src
+    when both are on the same filesystem; otherwise the data is reflinked where supported, or copied in
+    the kernel. The source mtime is kept so the next sync can tell the files apart by size and mtime
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    tmp.unlink(missing_ok=True)
+    src_stat = src.stat()
+    profiler.count("bytes_copied", src_stat.st_size)
+
+    if hardlink and src_stat.st_dev == dest.parent.stat().st_dev:
+        try:
+            os.link(src, tmp)
+            tmp.replace(dest)
+            return
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    with src.open("rb") as src_file, tmp.open("wb") as dest_file:
+        if not clone_file(src_file.fileno(), dest_file.fileno()):
+            copy_fd(src_file.fileno(), dest_file.fileno(), src_stat.st_size)
+    shutil.copymode(src, tmp)
+    os.utime(tmp, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    tmp.replace(dest)
+
+
+def list_files(root: Path) -> list[Path]:
+    """Every file under root, as paths relative to it"""
+    return sorted(path.relative_to(root) for path in root.rglob("*") if path.is_file())
+
+
+def sync_files(copy_dir: Path, write_dir: Path, manifest: BuildManifest | None = None, checksum: bool = False,
+               hardlink: bool = False, threads: int = SYNC_THREADS) -> tuple[int, int, int]:
+    """
+    Incremental version of copy_files: only files that are missing or differ in the output are copied,
+    on a thread pool. With a manifest, outputs whose static source was deleted are removed as well.
+    Returns the number of files (copied, skipped, removed)
+    """
+    # concurrent.futures pulls in logging, so it is imported only when a sync actually runs
+    from concurrent.futures import ThreadPoolExecutor
+    files = list_files(copy_dir) if copy_dir.is_dir() else []
+
+    def sync(path: Path) -> bool:
+        if files_match(copy_dir / path, write_dir / path, checksum):
+            return False
+        print(f"Copying {copy_dir / path}")
+        sync_file(copy_dir / path, write_dir / path, hardlink)
+        return True
+
+    # comparing (hashing with checksum) and copying both run on the pool, list() re-raises the first error
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        copied = sum(list(pool.map(sync, files)))
+
+    removed = 0
+    if manifest is not None:
+        current = {path.as_posix() for path in files}
+        for key in manifest.static:
+            if key not in current:
+                remove_stale_output(write_dir / key, write_dir)
+                removed += 1
+        manifest.static = sorted(current)
+
+    print(f"Copied {copied} of {len(files)} static files")
+    return copied, len(files) - copied, removed
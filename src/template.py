@@ -0,0 +1,129 @@
+import re
+import sys
+from itertools import islice
+from pathlib import Path
+
+import profiler
+from htmlnode import HTMLNode
+
+# Placeholders look like {{ Title }}. Splitting on the capture group leaves literal text at the
+# even indices and placeholder names at the odd ones
+PLACEHOLDER_RE = re.compile(r"\{\{ (\w+) \}\}")
+URL_ATTRIBUTE_RE = re.compile(r'\b(href|src)="([^"]*)"')
+
+# Serialized chunks are joined this many at a time before they are fed to the minifier, which has a fixed
+# cost per call
+MINIFY_BATCH = 512
+
+# Compiled templates keyed by (template path, base path, asset map key, minify), stored with the mtime they were compiled at
+_template_cache = {}
+
+
+def base_path_rewriter(base_path: str, url_map: dict[str, str] | None = None):
+    """
+    Returns a url_rewriter that points root-relative URLs at base_path, or None when nothing needs rewriting.
+    With url_map, URLs found in it are first swapped for their mapped (fingerprinted) URL
+    """
+    if base_path == "/":
+        rewrite = None
+    else:
+        rewrite = lambda url: base_path + url[1:] if url.startswith("/") else url
+    if not url_map:
+        return rewrite
+    if rewrite is None:
+        return lambda url: url_map.get(url, url)
+    return lambda url: rewrite(url_map.get(url, url))
+
+
+class Template():
+    """
+    A page template compiled once into literal text and placeholder segments. Root-relative URLs in the
+    literal text are rewritten at compile time, and HTMLNode values get the same rewriting while they are
+    serialized, so rendering never rescans the page. url_map and url_map_key are the asset URL map and its
+    digest, see fingerprint.py. With minify, the literal text is minified once here and HTMLNode values
+    are streamed through a minifier picking up where the literal text before them left off
+    """
+    def __init__(self, text: str, base_path: str = "/", url_map: dict[str, str] | None = None, url_map_key: str | None = None,
+                 minify: bool = False):
+        self.base_path = base_path
+        # what the rendered URLs depend on, keying the block cache
+        self.url_key = base_path if url_map_key is None else f"{base_path} {url_map_key}"
+        self.url_rewriter = base_path_rewriter(base_path, url_map)
+        self.segments = PLACEHOLDER_RE.split(text)
+        if self.url_rewriter is not None:
+            for i in range(0, len(self.segments), 2):
+                self.segments[i] = URL_ATTRIBUTE_RE.sub(
+                    lambda match: f'{match.group(1)}="{self.url_rewriter(match.group(2))}"', self.segments[i]
+                )
+        # minifier state at every placeholder, None when not minifying
+        self.minifier_states = None
+        self.literal_saved = 0
+        if minify:
+            self.minify_literals()
+
+    def minify_literals(self) -> None:
+        from minify import Minifier
+        minifier = Minifier()
+        self.minifier_states = {}
+        for i in range(0, len(self.segments), 2):
+            self.segments[i] = minifier.feed(self.segments[i]) + minifier.flush()
+            self.minifier_states[i + 1] = minifier.state()
+            # the value could be text, so whitespace after it is kept
+            minifier.drop_space = False
+        self.literal_saved = minifier.saved
+
+    def iter_render(self, values: dict):
+        """Yields the page in chunks. Unknown placeholders are left in place, HTMLNode values are streamed"""
+        if self.minifier_states is not None:
+            import minify
+        for i, segment in enumerate(self.segments):
+            if i % 2 == 0:
+                yield segment
+                continue
+            value = values.get(segment)
+            if value is None:
+                yield f"{{{{ {segment} }}}}"
+            elif isinstance(value, HTMLNode):
+                if self.minifier_states is None:
+                    yield from value.iter_html(self.url_rewriter)
+                    continue
+                minifier = minify.Minifier(*self.minifier_states[i])
+                chunks = value.iter_html(self.url_rewriter)
+                while batch := "".join(islice(chunks, MINIFY_BATCH)):
+                    yield minifier.feed(batch)
+                yield minifier.flush()
+                minify.saved += minifier.saved
+            else:
+                yield value
+        if self.minifier_states is not None:
+            minify.saved += self.literal_saved
+
+    @profiler.timed("render")
+    def render(self, values: dict) -> str:
+        """Renders the whole page with a single join"""
+        return "".join(self.iter_render(values))
+
+    @profiler.timed("render")
+    def write(self, fp, values: dict) -> None:
+        """Streams the rendered page into a writable text sink"""
+        fp.writelines(self.iter_render(values))
+
+
+@profiler.timed("template_load")
+def load_template(template_path: Path, base_path: str = "/") -> Template:
+    """
+    Returns the compiled template, only re-reading the file when its mtime changes. URLs are rewritten
+    with the current asset URL map, if any, and minified when minify is enabled
+    """
+    # fingerprint and minify are only imported by the builds that turn them on, see generate_page.loaded
+    fingerprint, minify = sys.modules.get("fingerprint"), sys.modules.get("minify")
+    url_map, url_map_key = (fingerprint.current, fingerprint.current_key) if fingerprint is not None else (None, None)
+    minifying = minify is not None and minify.enabled
+    key = (str(template_path), base_path, url_map_key, minifying)
+    mtime = template_path.stat().st_mtime_ns
+    cached = _template_cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    template = Template(template_path.read_text(), base_path, url_map, url_map_key, minifying)
+    _template_cache[key] = (mtime, template)
+    return template
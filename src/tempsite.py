@@ -0,0 +1,42 @@
+"""A throwaway site for the tests to build, see TempSiteTestCase"""
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+
+
+class TempSiteTestCase(unittest.TestCase):
+    """
+    Gives every test a fresh site in a temporary directory: root, holding content/, static/, docs/ and
+    template.html. Subclasses set template_text, and pages as {path under content/: markdown}. The
+    directory is removed after tearDown
+    """
+    template_text = TEMPLATE
+    pages = {}
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.content = self.root / "content"
+        self.static = self.root / "static"
+        self.docs = self.root / "docs"
+        self.template = self.root / "template.html"
+        for path in (self.content, self.static, self.docs):
+            path.mkdir()
+        self.template.write_text(self.template_text)
+        self.write_pages(self.pages)
+
+    def write_pages(self, pages: dict[str, str]) -> None:
+        """Writes markdown sources under content/, creating their directories"""
+        for name, markdown in pages.items():
+            path = self.content / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(markdown)
+
+    def quiet(self):
+        """Silences the progress messages of whatever runs inside the with block"""
+        return contextlib.redirect_stdout(io.StringIO())
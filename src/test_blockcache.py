@@ -0,0 +1,121 @@
+import unittest
+from unittest import mock
+
+import blockcache
+from blockcache import BlockCache
+from generate_page import generate_page
+from htmlnode import RawHTMLNode
+from tempsite import TempSiteTestCase
+
+TEMPLATE = '<title>{{ Title }}</title><a href="/">home</a><article>{{ Content }}</article>'
+MARKDOWN = "# Page\n\nSome *text* with a [link](/about)\n\n- one\n- two\n"
+
+class TestBlockCache(TempSiteTestCase):
+    template_text = TEMPLATE
+    pages = {"page.md": MARKDOWN}
+
+    def setUp(self):
+        super().setUp()
+        self.path = self.root / "cache" / "blocks.sqlite3"
+
+    def tearDown(self):
+        blockcache.close_cache()
+
+    def test_miss_then_hit(self):
+        cache = BlockCache(self.path)
+        node = cache.block_node("some **bold** text", "/")
+        self.assertIsInstance(node, RawHTMLNode)
+        self.assertEqual(node.to_html(), "<p>some <b>bold</b> text</p>")
+        cache.close()
+
+        cache = BlockCache(self.path)
+        with mock.patch("blockcache.block_to_html_node") as convert:
+            node = cache.block_node("some **bold** text", "/")
+        convert.assert_not_called()
+        self.assertEqual(node.to_html(), "<p>some <b>bold</b> text</p>")
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        cache.close()
+
+    def test_url_key_separates_entries(self):
+        cache = BlockCache(self.path)
+        rewriter = lambda url: "/site" + url
+        self.assertEqual(cache.block_node("[a](/b)", "/").to_html(), '<p><a href="/b">a</a></p>')
+        self.assertEqual(cache.block_node("[a](/b)", "/site/", rewriter).to_html(), '<p><a href="/site/b">a</a></p>')
+        self.assertEqual(cache.misses, 2)
+        cache.close()
+
+    def test_parser_version_invalidates(self):
+        cache = BlockCache(self.path)
+        cache.block_node("text", "/")
+        cache.close()
+
+        with mock.patch("blockcache.PARSER_VERSION", "test"):
+            cache = BlockCache(self.path)
+            cache.block_node("text", "/")
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+            cache.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = BlockCache(self.path, max_bytes=55)
+        cache.block_node("first", "/")
+        cache.block_node("second", "/")
+        cache.flush()
+        cache.block_node("first", "/")
+        cache.flush()
+        cache.block_node("a block long enough to need room", "/")
+        cache.close()
+
+        cache = BlockCache(self.path, max_bytes=55)
+        cache.block_node("first", "/")
+        cache.block_node("second", "/")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+    def test_size_total_is_kept_up_to_date(self):
+        def sizes(cache):
+            total = cache.db.execute("SELECT value FROM meta WHERE key = 'size'").fetchone()[0]
+            return int(total), cache.db.execute("SELECT SUM(size) FROM blocks").fetchone()[0] or 0
+
+        cache = BlockCache(self.path, max_bytes=55)
+        other = BlockCache(self.path, max_bytes=55)
+        for block in ("first", "second", "third"):
+            cache.block_node(block, "/")
+            other.block_node(block, "/")
+        cache.flush()
+        # the same blocks again, from another connection
+        other.flush()
+        self.assertEqual(sizes(cache), (37, 37))
+        cache.block_node("a block long enough to need room", "/")
+        cache.flush()
+        self.assertEqual(sizes(cache), (51, 51))
+        other.close()
+        cache.close()
+
+        # caches written before the total was kept get one on opening
+        cache = BlockCache(self.path)
+        with cache.db:
+            cache.db.execute("DELETE FROM meta WHERE key = 'size'")
+        cache.close()
+        cache = BlockCache(self.path)
+        self.assertEqual(sizes(cache), (51, 51))
+        cache.close()
+        with mock.patch("blockcache.PARSER_VERSION", "test"):
+            cache = BlockCache(self.path)
+        self.assertEqual(sizes(cache), (0, 0))
+        cache.close()
+
+    def test_generate_page_output_matches(self):
+        source = self.content / "page.md"
+        with self.quiet():
+            generate_page(source, self.template, self.docs / "plain.html", "/site/")
+            cache = blockcache.open_cache(self.path)
+            generate_page(source, self.template, self.docs / "cold.html", "/site/")
+            generate_page(source, self.template, self.docs / "warm.html", "/site/")
+        expected = (self.docs / "plain.html").read_text()
+        self.assertEqual((self.docs / "cold.html").read_text(), expected)
+        self.assertEqual((self.docs / "warm.html").read_text(), expected)
+        self.assertEqual((cache.hits, cache.misses), (3, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
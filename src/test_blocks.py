@@ -1,5 +1,6 @@
+import io
 import unittest
-from blocks import BlockType, markdown_to_blocks, block_to_blocktype, markdown_to_html_node
+from blocks import BlockType, markdown_to_blocks, block_to_blocktype, classify_block, markdown_to_html_node, iter_blocks, stream_markdown_to_html_node
 
 class TestBlocks(unittest.TestCase):
     def test_markdown_to_blocks(self):
@@ -76,6 +77,23 @@ This is the same paragraph on a new line
                 ]
             )
 
+    def test_iter_blocks_from_file(self):
+        f = io.StringIO("# Title\n\nFirst paragraph\nsame paragraph\n\n\n- a\n- b\n")
+        blocks = iter_blocks(f)
+        self.assertEqual(next(blocks), "# Title")
+        self.assertEqual(list(blocks), ["First paragraph\nsame paragraph", "- a\n- b"])
+
+    def test_iter_blocks_keeps_fenced_code_whole(self):
+        md = "before\n\n```\nfirst\n\n\nsecond\n```\n\nafter"
+        self.assertEqual(
+            list(iter_blocks(io.StringIO(md))),
+            ["before", "```\nfirst\n\n\nsecond\n```", "after"],
+        )
+
+    def test_iter_blocks_single_line_fence(self):
+        md = "```code```\n\nafter"
+        self.assertEqual(list(iter_blocks(md.split("\n"))), ["```code```", "after"])
+
     def test_block_to_blocktype_heading(self):
         block1 = "# hello sir"
         self.assertEqual(block_to_blocktype(block1), BlockType.HEADING)
@@ -136,6 +154,16 @@ This is the same paragraph on a new line
         block = "This is just a paragraph"
         self.assertEqual(block_to_blocktype(block), BlockType.PARAGRAPH)
 
+    def test_block_to_blocktype_first_line_decides(self):
+        self.assertEqual(block_to_blocktype("text\n## not a heading"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_blocktype("## heading\ntext"), BlockType.HEADING)
+        self.assertEqual(block_to_blocktype(">quote\na"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_blocktype("#"), BlockType.PARAGRAPH)
+
+    def test_classify_block_returns_lines(self):
+        self.assertEqual(classify_block("- a\n- b"), (BlockType.UNORDERED_LIST, ["- a", "- b"]))
+        self.assertEqual(classify_block("1. a\n2. b\n2. c"), (BlockType.PARAGRAPH, ["1. a", "2. b", "2. c"]))
+
 
 class TestMarkdownToHTMLNode(unittest.TestCase):
 
@@ -188,6 +216,18 @@ the **same** even with inline stuff
         #     "<div><pre><code>\ncode here\n</code></pre></div>",
         # )
 
+    def test_codeblock_with_blank_lines(self):
+        md = "```\nfirst\n\nsecond\n```"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(html, "<div><pre><code>first\n\nsecond\n</code></pre></div>")
+
+    def test_stream_matches_markdown_to_html_node(self):
+        md = "# Title\n\nSome **bold** text\n\n> quote\n\n1. one\n2. two\n\n```\ncode\n```\n"
+        self.assertEqual(
+            stream_markdown_to_html_node(io.StringIO(md)).to_html(),
+            markdown_to_html_node(md).to_html(),
+        )
+
     def test_headings(self):
         md = """
 # Heading 1
@@ -0,0 +1,78 @@
+import gzip
+import lzma
+import os
+import unittest
+
+from compress import compress_outputs, parse_codecs
+from tempsite import TempSiteTestCase
+
+PAGE = "<p>" + "hello world " * 100 + "</p>"
+
+class TestCompress(TempSiteTestCase):
+    def setUp(self):
+        super().setUp()
+        (self.docs / "blog").mkdir()
+        (self.docs / "index.html").write_text(PAGE)
+        (self.docs / "blog" / "index.html").write_text(PAGE * 2)
+        (self.docs / "index.css").write_text("body {}")
+        (self.docs / "tom.png").write_bytes(bytes(1000))
+        (self.docs / ".build-manifest.json").write_text("{}" * 200)
+
+    def compress(self, codecs=("gz",), jobs=1, static=()):
+        with self.quiet():
+            return compress_outputs(self.docs, codecs, jobs, static=static)
+
+    def test_parse_codecs(self):
+        self.assertEqual(parse_codecs("gz"), ("gz",))
+        self.assertEqual(parse_codecs("xz, gz,xz"), ("xz", "gz"))
+        for text in ("", "zip", "gz,br"):
+            with self.assertRaises(ValueError):
+                parse_codecs(text)
+
+    def test_writes_sidecars(self):
+        self.assertEqual(self.compress(("gz", "xz")), (2, 0, 0))
+        self.assertEqual(gzip.decompress((self.docs / "index.html.gz").read_bytes()).decode(), PAGE)
+        self.assertEqual(lzma.decompress((self.docs / "blog" / "index.html.xz").read_bytes()).decode(), PAGE * 2)
+        # too small, already compressed and hidden files are left alone
+        for name in ("index.css.gz", "tom.png.gz", ".build-manifest.json.gz"):
+            self.assertFalse((self.docs / name).exists())
+
+    def test_unchanged_outputs_are_skipped(self):
+        self.compress()
+        self.assertEqual(self.compress(), (0, 2, 0))
+        (self.docs / "index.html").write_text(PAGE + "!")
+        os.utime(self.docs / "index.html", ns=(0, 0))
+        self.assertEqual(self.compress(), (1, 1, 0))
+        self.assertEqual(gzip.decompress((self.docs / "index.html.gz").read_bytes()).decode(), PAGE + "!")
+
+    def test_stale_sidecars_are_removed(self):
+        self.compress(("gz", "xz"))
+        (self.docs / "blog" / "index.html").unlink()
+        self.assertEqual(self.compress(("gz",)), (0, 1, 3))
+        self.assertEqual(sorted(path.name for path in self.docs.rglob("*.?z")), ["index.html.gz"])
+
+    def test_static_files_are_never_sidecars(self):
+        # a real asset that looks like a sidecar, with and without its "original" next to it
+        static = ["data.json", "data.json.gz", "archive.xml.xz"]
+        (self.docs / "data.json").write_text(PAGE)
+        (self.docs / "data.json.gz").write_bytes(b"site's own")
+        (self.docs / "archive.xml.xz").write_bytes(b"also the site's")
+        for _ in range(2):
+            self.compress(("gz", "xz"), static=static)
+        self.assertEqual((self.docs / "data.json.gz").read_bytes(), b"site's own")
+        self.assertEqual((self.docs / "archive.xml.xz").read_bytes(), b"also the site's")
+        self.assertEqual(lzma.decompress((self.docs / "data.json.xz").read_bytes()).decode(), PAGE)
+
+    def test_process_pool_matches_serial(self):
+        for i in range(10):
+            (self.docs / f"page{i}.html").write_text(PAGE * i + PAGE)
+        self.compress(jobs=1)
+        serial = {path: path.read_bytes() for path in self.docs.rglob("*.gz")}
+        for path in serial:
+            path.unlink()
+        self.assertEqual(self.compress(jobs=2), (12, 0, 0))
+        self.assertEqual({path: path.read_bytes() for path in self.docs.rglob("*.gz")}, serial)
+
+
+if __name__ == "__main__":
+    unittest.main()
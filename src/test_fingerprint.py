@@ -0,0 +1,92 @@
+import hashlib
+import os
+import unittest
+
+import fingerprint
+from fingerprint import fingerprint_assets, fingerprinted_path, hash_asset, remove_fingerprints
+from generate_page import generate_pages_incremental
+from manifest import BuildManifest, MANIFEST_NAME
+from tempsite import TempSiteTestCase
+from template import Template
+
+class TestFingerprint(TempSiteTestCase):
+    template_text = '<link href="/index.css">{{ Content }}'
+    pages = {"index.md": "# Home\n\n![tom](/images/tom.png)"}
+
+    def setUp(self):
+        super().setUp()
+        (self.static / "images").mkdir()
+        (self.static / "index.css").write_text("body {}")
+        (self.static / "images" / "tom.png").write_bytes(bytes(range(256)) * 100)
+        self.manifest = BuildManifest.load(self.docs / MANIFEST_NAME)
+
+    def tearDown(self):
+        fingerprint.use(None)
+
+    def fingerprint(self) -> dict[str, str]:
+        with self.quiet():
+            return fingerprint_assets(self.static, self.docs, self.manifest)
+
+    def test_hash_asset(self):
+        self.assertEqual(hash_asset(self.static / "images" / "tom.png"), hashlib.sha256(bytes(range(256)) * 100).hexdigest())
+        (self.static / "empty").write_bytes(b"")
+        self.assertEqual(hash_asset(self.static / "empty"), hashlib.sha256().hexdigest())
+
+    def test_fingerprinted_path(self):
+        self.assertEqual(fingerprinted_path("images/tom.png", "0123456789abcdef"), "images/tom.0123456789.png")
+        self.assertEqual(fingerprinted_path("CNAME", "0123456789abcdef"), "CNAME.0123456789")
+
+    def test_publishes_hashed_copies(self):
+        urls = self.fingerprint()
+        digest = hashlib.sha256(b"body {}").hexdigest()[:10]
+        self.assertEqual(urls["/index.css"], f"/index.{digest}.css")
+        self.assertEqual((self.docs / f"index.{digest}.css").read_text(), "body {}")
+        self.assertEqual(set(urls), {"/index.css", "/images/tom.png"})
+        self.assertEqual(fingerprint.current, urls)
+
+    def test_unchanged_files_are_not_rehashed(self):
+        urls = self.fingerprint()
+        # same size and mtime, so the cached hash is trusted
+        stat = (self.static / "index.css").stat()
+        (self.static / "index.css").write_text("body []")
+        os.utime(self.static / "index.css", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.fingerprint(), urls)
+
+    def test_changed_file_replaces_old_version(self):
+        old = self.fingerprint()["/index.css"]
+        (self.static / "index.css").write_text("body { color: red }")
+        new = self.fingerprint()["/index.css"]
+        self.assertNotEqual(old, new)
+        self.assertFalse((self.docs / old[1:]).exists())
+        self.assertEqual((self.docs / new[1:]).read_text(), "body { color: red }")
+
+        with self.quiet():
+            remove_fingerprints(self.docs, self.manifest)
+        self.assertFalse((self.docs / new[1:]).exists())
+        self.assertEqual(self.manifest.assets, {})
+
+    def test_template_rewrites_through_url_map(self):
+        template = Template('<link href="/index.css"><img src="/other.png">', "/site/", {"/index.css": "/index.abc.css"}, "k")
+        self.assertEqual(template.render({}), '<link href="/site/index.abc.css"><img src="/site/other.png">')
+        self.assertEqual(template.url_key, "/site/ k")
+
+    def test_pages_follow_asset_changes(self):
+        def build() -> str:
+            with self.quiet():
+                fingerprint_assets(self.static, self.docs, self.manifest)
+                generate_pages_incremental(self.content, self.template, self.docs, "/", self.manifest)
+            return (self.docs / "index.html").read_text()
+
+        urls = self.fingerprint()
+        html = build()
+        self.assertIn(f'href="{urls["/index.css"]}"', html)
+        self.assertIn(f'src="{urls["/images/tom.png"]}"', html)
+
+        (self.static / "index.css").write_text("body { color: red }")
+        html = build()
+        self.assertIn(f'href="{fingerprint.current["/index.css"]}"', html)
+        self.assertNotIn(urls["/index.css"], html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
+import io
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import FrozenLeafNode, HTMLNode, LeafNode, ParentNode
 
 class TestHTMLNode(unittest.TestCase):
     def test_to_html(self):
@@ -62,6 +63,27 @@ class TestLeafNode(unittest.TestCase):
         node3 = LeafNode("span", "Inline text")
         self.assertEqual(node3.to_html(), "<span>Inline text</span>")
 
+    def test_leaf_escapes_text(self):
+        self.assertEqual(LeafNode("p", "a < b & c > d").to_html(), "<p>a &lt; b &amp; c &gt; d</p>")
+        self.assertEqual(LeafNode(None, "<script>").to_html(), "&lt;script&gt;")
+        self.assertEqual(LeafNode("code", 'say "hi"').to_html(), '<code>say "hi"</code>')
+
+    def test_leaf_escapes_props(self):
+        node = LeafNode("a", "link", {"href": '/search?a=1&b="2"'})
+        self.assertEqual(node.to_html(), '<a href="/search?a=1&amp;b=&quot;2&quot;">link</a>')
+        self.assertEqual(node.to_html(lambda url: "/site" + url), '<a href="/site/search?a=1&amp;b=&quot;2&quot;">link</a>')
+
+    def test_leaf_no_instance_dict(self):
+        self.assertFalse(hasattr(LeafNode("p", "text"), "__dict__"))
+
+    def test_frozen_leaf(self):
+        node = FrozenLeafNode("a", "link", {"href": "/page"})
+        self.assertEqual(node.to_html(), '<a href="/page">link</a>')
+        with self.assertRaises(AttributeError):
+            node.value = "changed"
+        with self.assertRaises(TypeError):
+            node.props["href"] = "/other"
+
 class TestParentNode(unittest.TestCase):
     def test_to_html(self):
         child_node = LeafNode("span", "child")
@@ -110,3 +132,27 @@ class TestParentNode(unittest.TestCase):
             parent_node.to_html(),
             '<div class="container" id="main"><span>child</span></div>'
         )
+
+    def test_write_html(self):
+        node = ParentNode("div", [ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")])], {"id": "main"})
+        sink = io.StringIO()
+        node.write_html(sink)
+        self.assertEqual(sink.getvalue(), '<div id="main"><p><b>bold</b> text</p></div>')
+        self.assertEqual(sink.getvalue(), node.to_html())
+
+    def test_write_html_leaf(self):
+        sink = io.StringIO()
+        LeafNode("i", "leaf").write_html(sink)
+        self.assertEqual(sink.getvalue(), "<i>leaf</i>")
+
+    def test_to_html_deeply_nested(self):
+        depth = 50000
+        node = LeafNode(None, "deep")
+        for _ in range(depth):
+            node = ParentNode("span", [node])
+        self.assertEqual(node.to_html(), "<span>" * depth + "deep" + "</span>" * depth)
+
+    def test_to_html_nested_missing_children(self):
+        node = ParentNode("div", [LeafNode("b", "ok"), ParentNode("p", None)])
+        with self.assertRaisesRegex(ValueError, "ParentNode must have children"):
+            node.to_html()
@@ -277,3 +277,47 @@ class TestInline(unittest.TestCase):
             TextNode(" where no one else goes", TextType.TEXT)
         ]
         self.assertListEqual(expected_result, text_to_textnodes(text))
+
+class TestTokenizer(unittest.TestCase):
+    def test_image_then_link(self):
+        text = "![img](a.png)[link](b)"
+        expected_result = [
+            TextNode("img", TextType.IMAGE, "a.png"),
+            TextNode("link", TextType.LINK, "b"),
+        ]
+        self.assertListEqual(expected_result, text_to_textnodes(text))
+
+    def test_link_inside_bold_stays_bold(self):
+        text = "**[link](url)** after"
+        expected_result = [
+            TextNode("[link](url)", TextType.BOLD),
+            TextNode(" after", TextType.TEXT),
+        ]
+        self.assertListEqual(expected_result, text_to_textnodes(text))
+
+    def test_link_after_bang_split_by_bold(self):
+        text = "hey!**bold**[link](url)"
+        expected_result = [
+            TextNode("hey!", TextType.TEXT),
+            TextNode("bold", TextType.BOLD),
+            TextNode("link", TextType.LINK, "url"),
+        ]
+        self.assertListEqual(expected_result, text_to_textnodes(text))
+
+    def test_bold_takes_precedence_over_italic(self):
+        text = "**a_b** _c_"
+        expected_result = [
+            TextNode("a_b", TextType.BOLD),
+            TextNode(" ", TextType.TEXT),
+            TextNode("c", TextType.ITALIC),
+        ]
+        self.assertListEqual(expected_result, text_to_textnodes(text))
+
+    def test_unmatched_delimiter_in_code(self):
+        with self.assertRaisesRegex(Exception, "Missing closing symbol. Not valid Markdown"):
+            text_to_textnodes("`snake_case`")
+
+    def test_many_links_same_as_splitters(self):
+        text = " ".join(f"word [l{i}](/p{i}) ![i{i}](/i{i}.png)" for i in range(200))
+        nodes = split_nodes_link(split_nodes_image([TextNode(text, TextType.TEXT)]))
+        self.assertListEqual(nodes, text_to_textnodes(text))
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+from tempsite import TempSiteTestCase
+
+SRC = Path(__file__).resolve().parent
+
+class TestMain(TempSiteTestCase):
+    def python(self, *args: str, cwd: Path = SRC) -> str:
+        return subprocess.run([sys.executable, *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+    def test_imports_are_lazy(self):
+        loaded = self.python("-c", "import sys, main; print(sorted(set(sys.modules) & {'argparse', 'generate_page', 'blocks', 'sqlite3', 'hashlib', 'json'}))")
+        self.assertEqual(loaded.strip(), "[]")
+
+    def test_render_one(self):
+        self.template.write_text('<title>{{ Title }}</title><a href="/">home</a>{{ Content }}')
+        (self.root / "page.md").write_text("# Hello\n\nSome **bold** [text](/about)")
+        html = self.python(str(SRC / "main.py"), "render-one", "page.md", "/site/", cwd=self.root)
+        self.assertEqual(
+            html,
+            '<title>Hello</title><a href="/site/">home</a><div><h1>Hello</h1><p>Some <b>bold</b> <a href="/site/about">text</a></p></div>',
+        )
+
+    def test_render_one_imports(self):
+        self.template.write_text("{{ Content }}")
+        (self.root / "page.md").write_text("# Hello")
+        code = f"import sys; sys.argv = ['main.py', 'render-one', 'page.md']; sys.path.insert(0, {str(SRC)!r}); import main; main.main(); " \
+               "print(sorted(set(sys.modules) & {'argparse', 'sqlite3', 'hashlib', 'json', 'concurrent.futures', 'shutil', " \
+               "'blockcache', 'fingerprint', 'minify', 'searchindex'}), file=sys.stderr)"
+        result = subprocess.run([sys.executable, "-c", code], cwd=self.root, check=True, capture_output=True, text=True)
+        self.assertEqual(result.stderr.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest import mock
+
+import minify
+from generate_page import generate_pages_incremental
+from manifest import BuildManifest, MANIFEST_NAME, hash_file
+from tempsite import TempSiteTestCase
+
+TEMPLATE = "<title>{{ Title }}</title><article>{{ Content }}</article>"
+
+class TestBuildManifest(TempSiteTestCase):
+    template_text = TEMPLATE
+    pages = {"index.md": "# Home\n\nhello", "blog/post.md": "# Post\n\nworld"}
+
+    def build(self, base_path="/"):
+        manifest = BuildManifest.load(self.docs / MANIFEST_NAME)
+        with self.quiet():
+            rendered = generate_pages_incremental(self.content, self.template, self.docs, base_path, manifest)
+        return sorted(dest.relative_to(self.docs).as_posix() for _, dest in rendered)
+
+    def test_hash_file(self):
+        self.assertEqual(hash_file(self.template), hash_file(self.template))
+        self.assertNotEqual(hash_file(self.template), hash_file(self.content / "index.md"))
+
+    def test_load_missing_manifest(self):
+        manifest = BuildManifest.load(self.docs / MANIFEST_NAME)
+        self.assertEqual(manifest.pages, {})
+        self.assertTrue(manifest.needs_full_rebuild(hash_file(self.template), "/"))
+
+    def test_first_build_renders_everything(self):
+        self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+        self.assertIn("<title>Post</title>", (self.docs / "blog" / "post.html").read_text())
+
+    def test_unchanged_build_renders_nothing(self):
+        self.build()
+        self.assertEqual(self.build(), [])
+
+    def test_changed_source_renders_only_that_page(self):
+        self.build()
+        (self.content / "index.md").write_text("# Home\n\nchanged")
+        self.assertEqual(self.build(), ["index.html"])
+        self.assertIn("changed", (self.docs / "index.html").read_text())
+
+    def test_template_or_base_path_change_renders_everything(self):
+        self.build()
+        self.template.write_text(TEMPLATE + "\n")
+        self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+        self.assertEqual(self.build("/site/"), ["blog/post.html", "index.html"])
+
+    def test_converter_upgrade_renders_everything(self):
+        self.build()
+        with mock.patch("generate_page.PARSER_VERSION", "next"):
+            self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+            self.assertEqual(self.build(), [])
+        # manifests written before the version was recorded
+        manifest = BuildManifest.load(self.docs / MANIFEST_NAME)
+        manifest.parser_version = None
+        manifest.save()
+        self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+
+    def test_minify_change_renders_everything(self):
+        self.build()
+        minify.configure(True)
+        try:
+            self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+            self.assertEqual(self.build(), [])
+        finally:
+            minify.configure(False)
+        self.assertEqual(self.build(), ["blog/post.html", "index.html"])
+
+    def test_missing_output_is_rendered(self):
+        self.build()
+        (self.docs / "index.html").unlink()
+        self.assertEqual(self.build(), ["index.html"])
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        (self.content / "blog" / "post.md").unlink()
+        self.assertEqual(self.build(), [])
+        self.assertFalse((self.docs / "blog").exists())
+        self.assertTrue((self.docs / "index.html").exists())
+
+if __name__ == "__main__":
+    unittest.main()
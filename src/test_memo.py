@@ -0,0 +1,60 @@
+import unittest
+
+import memo
+import profiler
+from blocks import children_memo, text_to_children
+from inline import text_to_textnodes, textnodes_memo
+from memo import Memo
+
+class TestMemo(unittest.TestCase):
+    def setUp(self):
+        memo.configure(memo.DEFAULT_SIZE)
+
+    def tearDown(self):
+        memo.configure(memo.DEFAULT_SIZE)
+        profiler.disable()
+
+    def test_hits_and_misses(self):
+        calls = []
+        squares = Memo("test_squares", lambda n: calls.append(n) or n * n, maxsize=2)
+        try:
+            self.assertEqual([squares.lookup(n) for n in (2, 3, 2, 4, 2, 3)], [4, 9, 4, 16, 4, 9])
+            self.assertEqual(calls, [2, 3, 4, 3])
+            self.assertEqual(squares.stats(), (2, 4))
+        finally:
+            del memo.MEMOS["test_squares"]
+
+    def test_disabled(self):
+        text = "some **bold** text with a [link](/x) and ![an image](/y.png)"
+        memoized = ([node.to_html() for node in text_to_children(text)], text_to_textnodes(text))
+        memo.configure(0)
+        for _ in range(2):
+            self.assertEqual(([node.to_html() for node in text_to_children(text)], text_to_textnodes(text)), memoized)
+        self.assertEqual(children_memo.stats(), (0, 0))
+        self.assertEqual(textnodes_memo.stats(), (0, 0))
+
+    def test_results_are_copies(self):
+        nodes = text_to_textnodes("a [link](/x) here")
+        nodes[1].url = "/changed"
+        nodes.append(None)
+        self.assertEqual(text_to_textnodes("a [link](/x) here")[1].url, "/x")
+        self.assertEqual(len(text_to_textnodes("a [link](/x) here")), 3)
+        self.assertEqual(textnodes_memo.stats(), (2, 1))
+
+        children = text_to_children("a [link](/x) here")
+        children[1].props["href"] = "/changed"
+        self.assertEqual(text_to_children("a [link](/x) here")[1].to_html(), '<a href="/x">link</a>')
+
+    def test_record_stats(self):
+        active = profiler.enable()
+        text_to_children("repeated text")
+        text_to_children("repeated text")
+        memo.record_stats()
+        text_to_children("repeated text")
+        memo.record_stats()
+        self.assertEqual(active.counters["memo_text_to_children_hits"], 2)
+        self.assertEqual(active.counters["memo_text_to_children_misses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+import minify
+from htmlnode import LeafNode, ParentNode
+from minify import Minifier, minify_html
+from template import Template
+
+DOCUMENT = """<!doctype html>
+<html>
+    <head>
+        <title>Home</title>
+    </head>
+    <body>
+        <!-- a comment > with a bracket -->
+        <p>Some   <b>bold</b>
+           and <i>italic</i> text</p>
+        <p>line <br>break <span>x</span></p>
+        <pre><code>def f():
+    return  1
+</code></pre>
+        <textarea>  keep
+  this </textarea>
+    </body>
+</html>
+"""
+
+MINIFIED = (
+    "<!doctype html><html><head><title>Home</title></head><body><!-- a comment > with a bracket -->"
+    "<p>Some <b>bold</b> and <i>italic</i> text</p>"
+    "<p>line<br>break <span>x</span></p><pre><code>def f():\n    return  1\n</code></pre>"
+    "<textarea>  keep\n  this </textarea></body></html>"
+)
+
+class TestMinify(unittest.TestCase):
+    def test_minify_html(self):
+        self.assertEqual(minify_html(DOCUMENT), MINIFIED)
+
+    def test_any_chunking_gives_the_same_output(self):
+        for split in range(len(DOCUMENT) + 1):
+            minifier = Minifier()
+            out = minifier.feed(DOCUMENT[:split]) + minifier.feed(DOCUMENT[split:]) + minifier.flush()
+            self.assertEqual(out, MINIFIED, split)
+            self.assertEqual(minifier.saved, len(DOCUMENT) - len(MINIFIED))
+
+    def test_inline_whitespace_is_kept(self):
+        self.assertEqual(minify_html("<p>a <b>b</b> <i>c</i></p>"), "<p>a <b>b</b> <i>c</i></p>")
+        self.assertEqual(minify_html("<ul>\n  <li>a</li>\n  <li>b</li>\n</ul>"), "<ul><li>a</li><li>b</li></ul>")
+
+    def test_comments_keep_the_space_around_them(self):
+        self.assertEqual(minify_html("a <!-- note --> b"), "a <!-- note -->b")
+        self.assertEqual(minify_html("a<!-- note -->\n  b"), "a<!-- note --> b")
+        self.assertEqual(minify_html("<p> <!-- note --> a</p>"), "<p><!-- note -->a</p>")
+        for split in range(1, 16):
+            text = "a <!-- note --> b"
+            minifier = Minifier()
+            self.assertEqual(minifier.feed(text[:split]) + minifier.feed(text[split:]) + minifier.flush(), "a <!-- note -->b")
+
+    def test_template_literals_and_values(self):
+        template = Template("<div>\n  <p>Hello {{ Name }} there</p>\n  <pre>{{ Content }}</pre>\n</div>\n", minify=True)
+        self.assertEqual(template.segments, ["<div><p>Hello ", "Name", " there</p><pre>", "Content", "</pre></div>"])
+        content = ParentNode("code", [LeafNode(None, "x  =\n  1")])
+        minify.saved = 0
+        self.assertEqual(
+            template.render({"Name": "Tom", "Content": content}),
+            "<div><p>Hello Tom there</p><pre><code>x  =\n  1</code></pre></div>",
+        )
+        self.assertEqual(minify.saved, template.literal_saved)
+
+    def test_streamed_values_are_minified(self):
+        template = Template("<article>\n{{ Content }}\n</article>", minify=True)
+        content = ParentNode("div", [LeafNode("p", "a\n   b"), LeafNode("p", "c")])
+        self.assertEqual(template.render({"Content": content}), "<article><div><p>a b</p><p>c</p></div></article>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from generate_page import generate_page
+from output import CompareWriter, write_text_if_changed
+from tempsite import TempSiteTestCase
+
+class TestOutput(TempSiteTestCase):
+    pages = {"page.md": "# Title\n\nhello"}
+
+    def setUp(self):
+        super().setUp()
+        self.dest = self.docs / "page.html"
+
+    def age(self, path: Path) -> int:
+        """Moves path's mtime into the past, returning it"""
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+        return path.stat().st_mtime_ns
+
+    def test_write_text_if_changed(self):
+        self.assertTrue(write_text_if_changed(self.dest, "<p>one</p>"))
+        mtime = self.age(self.dest)
+        self.assertFalse(write_text_if_changed(self.dest, "<p>one</p>"))
+        self.assertEqual(self.dest.stat().st_mtime_ns, mtime)
+
+        # same size, different bytes
+        self.assertTrue(write_text_if_changed(self.dest, "<p>two</p>"))
+        self.assertEqual(self.dest.read_text(), "<p>two</p>")
+        self.assertEqual([path.name for path in self.docs.iterdir()], ["page.html"])
+
+    def write(self, *chunks) -> bool:
+        out = CompareWriter(self.dest)
+        out.writelines(chunks)
+        return out.close()
+
+    def test_compare_writer(self):
+        self.assertTrue(self.write("<p>", "one", "</p>"))
+        mtime = self.age(self.dest)
+        with mock.patch("output.temp_path", side_effect=AssertionError("opened a temp file")):
+            self.assertFalse(self.write("<p>o", "ne</p>"))
+        self.assertEqual(self.dest.stat().st_mtime_ns, mtime)
+
+        # different partway through, longer, shorter
+        for chunks in (("<p>", "two", "</p>"), ("<p>", "two</p>", "<p>three</p>"), ("<p>", "two</p>")):
+            self.assertTrue(self.write(*chunks))
+            self.assertEqual(self.dest.read_text(), "".join(chunks))
+        self.assertEqual([path.name for path in self.docs.iterdir()], ["page.html"])
+
+    def test_compare_writer_discard(self):
+        self.dest.write_text("<p>one</p>")
+        out = CompareWriter(self.dest)
+        out.write("<p>changed")
+        out.discard()
+        self.assertEqual(self.dest.read_text(), "<p>one</p>")
+        self.assertEqual([path.name for path in self.docs.iterdir()], ["page.html"])
+
+    def test_generate_page_skips_unchanged(self):
+        source = self.content / "page.md"
+        out = self.docs / "out" / "page.html"
+
+        with self.quiet():
+            self.assertTrue(generate_page(source, self.template, out, "/"))
+            mtime = self.age(out)
+            self.assertFalse(generate_page(source, self.template, out, "/"))
+            self.assertEqual(out.stat().st_mtime_ns, mtime)
+            source.write_text("# Title\n\nchanged")
+            self.assertTrue(generate_page(source, self.template, out, "/"))
+        self.assertIn("changed", out.read_text())
+        self.assertEqual([path.name for path in out.parent.iterdir()], ["page.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
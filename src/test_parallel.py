@@ -0,0 +1,54 @@
+import unittest
+
+import memo
+import minify
+from generate_page import discover_pages, render_pages
+from parallel import RenderSettings, batch_pages, render_pages_parallel
+from tempsite import TempSiteTestCase
+
+class TestParallel(TempSiteTestCase):
+    template_text = '<title>{{ Title }}</title><link href="/index.css">{{ Content }}'
+    pages = {
+        f"section{i % 3}/page{i}.md": f"# Page {i}\n\nSome **bold** text and a [link](/page{i + 1})\n\n- one\n- two\n\n```\ncode {i}\n```"
+        for i in range(12)
+    }
+
+    def test_batch_pages(self):
+        pages = list(range(10))
+        batches = batch_pages(pages, jobs=2, batches_per_job=2)
+        self.assertEqual(sum(batches, []), pages)
+        self.assertEqual(len(batches), 4)
+        self.assertEqual(batch_pages([], jobs=4), [])
+
+    def test_batch_pages_more_jobs_than_pages(self):
+        self.assertEqual(batch_pages([1, 2], jobs=8), [[1], [2]])
+
+    def test_parallel_output_matches_serial(self):
+        serial = discover_pages(self.content, self.root / "serial")
+        parallel = discover_pages(self.content, self.root / "parallel")
+        with self.quiet():
+            render_pages(serial, self.template, "/site/")
+            written = render_pages_parallel(parallel, self.template, "/site/", jobs=2)
+
+        self.assertEqual(written, len(parallel))
+        for (_, serial_dest), (_, parallel_dest) in zip(serial, parallel):
+            self.assertEqual(serial_dest.read_bytes(), parallel_dest.read_bytes())
+
+    def test_settings_carry_the_configuration(self):
+        minify.configure(True)
+        memo.configure(7)
+        try:
+            settings = RenderSettings.current(pipeline=True)
+            self.assertEqual((settings.minify_output, settings.memo_size, settings.pipeline), (True, 7, True))
+            self.assertIsNone(settings.block_cache)
+            minify.configure(False)
+            memo.configure(memo.DEFAULT_SIZE)
+            settings.apply()
+            self.assertTrue(minify.enabled)
+            self.assertEqual(memo.MEMOS["text_to_children"].maxsize, 7)
+        finally:
+            minify.configure(False)
+            memo.configure(memo.DEFAULT_SIZE)
+
+if __name__ == "__main__":
+    unittest.main()
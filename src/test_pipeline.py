@@ -0,0 +1,42 @@
+import unittest
+
+from generate_page import discover_pages, render_pages
+from pipeline import render_pages_pipelined
+from tempsite import TempSiteTestCase
+
+class TestPipeline(TempSiteTestCase):
+    template_text = '<title>{{ Title }}</title><link href="/index.css">{{ Content }}'
+    pages = {
+        f"section{i % 3}/page{i}.md": f"# Page {i}\n\nSome **bold** text and a [link](/page{i + 1})\n\n> quote\n\n```\ncode {i}\n```"
+        for i in range(40)
+    }
+
+    def test_same_output_as_serial(self):
+        serial = self.root / "serial"
+        piped = self.root / "piped"
+        with self.quiet():
+            render_pages(discover_pages(self.content, serial), self.template, "/site/")
+            render_pages_pipelined(discover_pages(self.content, piped), self.template, "/site/", read_ahead=3, write_behind=2)
+
+        outputs = sorted(path.relative_to(serial) for path in serial.rglob("*.html"))
+        self.assertEqual(len(outputs), 40)
+        self.assertEqual(outputs, sorted(path.relative_to(piped) for path in piped.rglob("*.html")))
+        for path in outputs:
+            self.assertEqual((piped / path).read_text(), (serial / path).read_text())
+
+    def test_write_error_is_raised(self):
+        blocked = self.root / "blocked"
+        blocked.write_text("a file where a directory should be")
+        with self.quiet():
+            with self.assertRaises(OSError):
+                render_pages_pipelined(discover_pages(self.content, blocked), self.template, "/", write_behind=1)
+
+    def test_read_error_is_raised(self):
+        pages = [(self.content / "missing.md", self.root / "out" / "missing.html")]
+        with self.quiet():
+            with self.assertRaises(FileNotFoundError):
+                render_pages_pipelined(pages, self.template, "/")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import pstats
+import threading
+import unittest
+
+import profiler
+from generate_page import generate_page
+from pipeline import render_pages_pipelined
+from profiler import Profiler, percentile
+from tempsite import TempSiteTestCase
+
+@profiler.timed("double")
+def double(x):
+    return x * 2
+
+class TestProfiler(TempSiteTestCase):
+    pages = {"page.md": "# Title\n\nSome **bold** text\n\n- a\n- b"}
+
+    def tearDown(self):
+        profiler.disable()
+
+    def test_disabled_hooks_do_nothing(self):
+        self.assertIsNone(profiler.current)
+        self.assertEqual(double(2), 4)
+        profiler.count("bytes_read", 10)
+
+    def test_timed_and_count(self):
+        active = profiler.enable()
+        double(1)
+        double(2)
+        profiler.count("bytes_read", 10)
+        profiler.count("bytes_read", 5)
+        self.assertEqual(len(active.stages["double"]), 2)
+        self.assertEqual(active.counters, {"bytes_read": 15})
+        self.assertIs(profiler.disable(), active)
+        double(3)
+        self.assertEqual(len(active.stages["double"]), 2)
+
+    def test_count_from_threads(self):
+        active = profiler.enable()
+
+        def record():
+            for _ in range(10000):
+                profiler.count("bytes_read", 1)
+                double(1)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(active.counters, {"bytes_read": 80000})
+        self.assertEqual(len(active.stages["double"]), 80000)
+        self.assertAlmostEqual(active.total("double"), sum(active.stages["double"]))
+
+    def test_percentile(self):
+        samples = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 0.5), 50.0)
+        self.assertEqual(percentile(samples, 0.95), 95.0)
+        self.assertEqual(percentile([3.0], 0.95), 3.0)
+
+    def test_merge_and_report(self):
+        first, second = Profiler(), Profiler()
+        first.add("render", 0.002)
+        second.add("render", 0.004)
+        second.counters["bytes_written"] = 100
+        second.pages.append((0.004, "slow.md"))
+        first.pages.append((0.001, "fast.md"))
+        first.merge(second.data())
+        self.assertEqual(first.stages["render"], [0.002, 0.004])
+
+        report = first.report(slowest=1)
+        self.assertIn("render", report)
+        self.assertIn("Slowest 1 pages:", report)
+        self.assertIn("slow.md", report)
+        self.assertNotIn("fast.md", report)
+        self.assertIn("bytes_written", report)
+
+    def test_profiled_page(self):
+        source = self.content / "page.md"
+        dest = self.docs / "page.html"
+        active = profiler.enable(self.root / "pstats")
+        with self.quiet():
+            generate_page(source, self.template, dest, "/")
+
+        for stage in ("page", "render", "serialize", "block_to_html_node", "block_to_blocktype", "text_to_children", "read_title"):
+            self.assertIn(stage, active.stages)
+        self.assertEqual(active.counters["bytes_read"], source.stat().st_size)
+        self.assertEqual(active.counters["bytes_written"], dest.stat().st_size)
+        stats_files = list((self.root / "pstats").iterdir())
+        self.assertEqual(len(stats_files), 1)
+        pstats.Stats(str(stats_files[0]))
+
+    def test_profiled_pipeline(self):
+        self.write_pages({f"page{i}.md": f"# Page {i}\n\nSome **bold** text" for i in range(3)})
+        pages = [(self.content / f"page{i}.md", self.docs / f"page{i}.html") for i in range(3)]
+        active = profiler.enable(self.root / "pstats")
+        with self.quiet():
+            render_pages_pipelined(pages, self.template, "/")
+
+        for stage in ("page", "render", "serialize", "block_to_html_node"):
+            self.assertIn(stage, active.stages)
+        self.assertEqual(sorted(name for _, name in active.pages), [str(from_path) for from_path, _ in pages])
+        self.assertEqual(active.counters["bytes_written"], sum(dest.stat().st_size for _, dest in pages))
+        self.assertEqual(len(list((self.root / "pstats").iterdir())), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+import blockcache
+import searchindex
+from blocks import markdown_to_html_node
+from generate_page import generate_pages_incremental
+from htmlnode import RawHTMLNode
+from manifest import BuildManifest, MANIFEST_NAME
+from searchindex import SEARCH_INDEX_NAME, SearchIndex, collect_terms
+from tempsite import TempSiteTestCase
+
+TEMPLATE = "<title>{{ Title }}</title><article>{{ Content }}</article>"
+
+class TestSearchIndex(TempSiteTestCase):
+    template_text = TEMPLATE
+    pages = {
+        "index.md": "# Home\n\nHello **shire** and [Rivendell](/rivendell)",
+        "blog/post.md": "# Post\n\n```\nshire code\n```\n\n- hello world",
+    }
+
+    def setUp(self):
+        super().setUp()
+        searchindex.configure(True)
+
+    def tearDown(self):
+        searchindex.configure(False)
+        blockcache.close_cache()
+
+    def build(self, jobs=1, pipeline=False) -> SearchIndex:
+        manifest = BuildManifest.load(self.docs / MANIFEST_NAME)
+        with self.quiet():
+            generate_pages_incremental(self.content, self.template, self.docs, "/site/", manifest, jobs, pipeline)
+        return SearchIndex.load(self.docs / SEARCH_INDEX_NAME)
+
+    def test_collect_terms(self):
+        terms = set()
+        node = markdown_to_html_node("# Big Title\n\nSome _italic_ text a b\n\n> quoted\n>\n> line")
+        self.assertEqual([n.tag for n in collect_terms(node.children, terms)], ["h1", "p", "blockquote"])
+        self.assertEqual(terms, {"big", "title", "some", "italic", "text", "quoted", "line"})
+        terms = set()
+        list(collect_terms([RawHTMLNode("<p>Fish &amp; <b>chips</b></p>")], terms))
+        self.assertEqual(terms, {"fish", "chips"})
+
+    def test_page_url(self):
+        self.assertEqual(searchindex.page_url("/site/", "index.html"), "/site/")
+        self.assertEqual(searchindex.page_url("/site/", "blog/index.html"), "/site/blog/")
+        self.assertEqual(searchindex.page_url("/site/", "blog/myindex.html"), "/site/blog/myindex.html")
+        self.assertEqual(searchindex.page_url("/site/", "notindex.html"), "/site/notindex.html")
+
+    def test_round_trip(self):
+        index = SearchIndex(self.docs / SEARCH_INDEX_NAME)
+        index.update({"/a/": ("A", {"hobbit", "ring"}), "/b/": ("B", {"ring", "élan"})})
+        data = index.to_bytes()
+        self.assertEqual(len(data) % 4, 0)
+        index.save()
+        loaded = SearchIndex.load(index.path)
+        self.assertEqual(loaded.postings, {"hobbit": {0}, "ring": {0, 1}, "élan": {1}})
+        self.assertEqual(loaded.search("Ring élan"), [["/b/", "B"]])
+        self.assertEqual(loaded.to_bytes(), data)
+
+    def test_removed_slots_are_reused(self):
+        index = SearchIndex(self.docs / SEARCH_INDEX_NAME)
+        index.update({"/a/": ("A", {"x1"}), "/b/": ("B", {"x1", "x2"}), "/c/": ("C", {"x3"})})
+        index.update({"/d/": ("D", {"x3"})}, removed=["/a/"])
+        self.assertEqual(index.pages, [["/d/", "D"], ["/b/", "B"], ["/c/", "C"]])
+        self.assertEqual(index.postings, {"x1": {1}, "x2": {1}, "x3": {0, 2}})
+        index.update({}, removed=["/c/"])
+        self.assertEqual(len(index.pages), 2)
+
+    def test_unreadable_index_is_empty(self):
+        path = self.docs / SEARCH_INDEX_NAME
+        path.write_bytes(b"\x05\x00\x00\x00junk")
+        self.assertEqual(SearchIndex.load(path).pages, [])
+
+    def test_build_indexes_pages(self):
+        index = self.build()
+        self.assertEqual(index.search("shire"), [["/site/blog/post.html", "Post"], ["/site/", "Home"]])
+        self.assertEqual(index.search("hello rivendell"), [["/site/", "Home"]])
+        self.assertEqual(index.search("mordor"), [])
+
+    def test_incremental_updates(self):
+        self.build()
+        (self.content / "index.md").write_text("# Home\n\nMordor")
+        (self.content / "blog" / "new.md").write_text("# New\n\nMordor too")
+        (self.content / "blog" / "post.md").unlink()
+        index = self.build()
+        self.assertEqual(index.search("shire"), [])
+        self.assertEqual(index.search("mordor"), [["/site/blog/new.html", "New"], ["/site/", "Home"]])
+
+        # pages missing from the index are rendered again, even when unchanged
+        (self.docs / SEARCH_INDEX_NAME).unlink()
+        self.assertEqual(len(self.build().ids), 2)
+
+    def test_parallel_pipelined_and_cached_builds_match(self):
+        expected = self.build().to_bytes()
+        for jobs, pipeline in ((2, False), (1, True)):
+            (self.docs / SEARCH_INDEX_NAME).unlink()
+            self.assertEqual(self.build(jobs, pipeline).to_bytes(), expected)
+        blockcache.open_cache(self.root / "blocks.sqlite3")
+        for _ in range(2):
+            (self.docs / SEARCH_INDEX_NAME).unlink()
+            self.assertEqual(self.build().to_bytes(), expected)
+
+    def test_turning_it_off_removes_the_index(self):
+        self.build()
+        searchindex.configure(False)
+        self.build()
+        self.assertFalse((self.docs / SEARCH_INDEX_NAME).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import gzip
+import http.client
+import os
+import threading
+import unittest
+
+import fingerprint
+from compress import compress_outputs
+from fingerprint import fingerprint_assets
+from manifest import BuildManifest, MANIFEST_NAME
+from serve import CACHE_FILE_SIZE, StaticServer, accepts_gzip
+from tempsite import TempSiteTestCase
+
+PAGE = "<p>" + "hello world " * 100 + "</p>"
+
+class TestStaticServer(TempSiteTestCase):
+    def setUp(self):
+        super().setUp()
+        (self.docs / "blog").mkdir()
+        (self.docs / "index.html").write_text(PAGE)
+        (self.docs / "blog" / "index.html").write_text("<p>blog</p>")
+        (self.docs / "big.js").write_bytes(b"x" * (CACHE_FILE_SIZE * 3 + 5))
+        (self.static / "index.css").write_text("body {}")
+
+        manifest = BuildManifest(self.docs / MANIFEST_NAME)
+        with self.quiet():
+            self.urls = fingerprint_assets(self.static, self.docs, manifest)
+            compress_outputs(self.docs, jobs=1)
+        (self.docs / "index.css").write_text("body {}")
+        manifest.save()
+
+        self.server = StaticServer(("127.0.0.1", 0), self.docs, "/site/", quiet=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=30)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        fingerprint.use(None)
+
+    def get(self, path: str, headers: dict | None = None, method: str = "GET") -> tuple[http.client.HTTPResponse, bytes]:
+        self.connection.request(method, path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_serves_files(self):
+        response, body = self.get("/site/blog/")
+        self.assertEqual((response.status, body), (200, b"<p>blog</p>"))
+        self.assertEqual(response.getheader("Content-Type"), "text/html; charset=utf-8")
+        response, body = self.get("/site/big.js")
+        self.assertEqual(body, (self.docs / "big.js").read_bytes())
+        response, body = self.get("/site/big.js", method="HEAD")
+        self.assertEqual((response.getheader("Content-Length"), body), (str(CACHE_FILE_SIZE * 3 + 5), b""))
+
+    def test_missing_and_hidden_files(self):
+        for path in ("/site/nope.html", "/site/" + MANIFEST_NAME, "/site/../static/index.css", "/index.html"):
+            response, _ = self.get(path)
+            self.assertEqual(response.status, 404, path)
+        response, _ = self.get("/site/blog")
+        self.assertEqual((response.status, response.getheader("Location")), (301, "/site/blog/"))
+
+    def test_hostile_paths(self):
+        # decoded CR LF in a redirect must not start a new header
+        response, _ = self.get("/site/blog/%0d%0aSet-Cookie:%20evil=1/..")
+        self.assertEqual(response.status, 301)
+        self.assertIsNone(response.getheader("Set-Cookie"))
+        self.assertEqual(response.getheader("Location"), "/site/blog/%0D%0ASet-Cookie%3A%20evil%3D1/../")
+        # a null byte is a 404, and the connection stays usable
+        response, _ = self.get("/site/blog%00")
+        self.assertEqual(response.status, 404)
+        self.assertEqual(self.get("/site/blog/")[0].status, 200)
+
+    def test_body_comes_from_the_opened_file(self):
+        path = self.docs / "blog" / "index.html"
+        with path.open("rb") as f:
+            stat = os.fstat(f.fileno())
+            # a rebuild replaces the file after it was opened
+            replacement = path.with_name(".index.html.tmp")
+            replacement.write_text("<p>rebuilt blog</p>")
+            replacement.replace(path)
+            self.assertEqual(self.server.files.body(path, f, stat.st_size, stat.st_mtime_ns), b"<p>blog</p>")
+
+    def test_conditional_get(self):
+        response, _ = self.get("/site/blog/index.html")
+        etag = response.getheader("ETag")
+        response, body = self.get("/site/blog/index.html", {"If-None-Match": etag})
+        self.assertEqual((response.status, body), (304, b""))
+
+        (self.docs / "blog" / "index.html").write_text("<p>new blog</p>")
+        response, body = self.get("/site/blog/index.html", {"If-None-Match": etag})
+        self.assertEqual((response.status, body), (200, b"<p>new blog</p>"))
+        self.assertNotEqual(response.getheader("ETag"), etag)
+
+    def test_gzip_sidecar(self):
+        response, body = self.get("/site/", {"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body).decode(), PAGE)
+        response, body = self.get("/site/", {"Accept-Encoding": "gzip;q=0"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(body.decode(), PAGE)
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+
+    def test_fingerprinted_assets(self):
+        url = "/site" + self.urls["/index.css"]
+        response, body = self.get(url)
+        self.assertEqual((response.status, body), (200, b"body {}"))
+        self.assertIn("immutable", response.getheader("Cache-Control"))
+        # strong ETags are content hashes, so both names of the same bytes share one
+        self.assertEqual(response.getheader("ETag"), self.get("/site/index.css")[0].getheader("ETag"))
+
+    def test_small_files_are_cached(self):
+        for _ in range(3):
+            self.get("/site/blog/")
+        self.assertEqual((self.server.files.hits, self.server.files.misses), (2, 1))
+
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip("gzip, deflate"))
+        self.assertTrue(accepts_gzip("br;q=1.0, gzip;q=0.8"))
+        self.assertTrue(accepts_gzip("*"))
+        self.assertFalse(accepts_gzip("gzip;q=0"))
+        self.assertFalse(accepts_gzip(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import http.client
+import json
+import threading
+import unittest
+from pathlib import Path
+
+from server import Renderer, RenderServer
+from tempsite import TempSiteTestCase
+
+TEMPLATE = '<title>{{ Title }}</title><a href="/">home</a>{{ Content }}'
+
+class TestRenderServer(TempSiteTestCase):
+    template_text = TEMPLATE
+    pages = {"blog/post.md": "# Post\n\nSome _text_"}
+    workers = 0
+
+    def setUp(self):
+        super().setUp()
+        renderer = Renderer(self.template, "/site/", self.workers)
+        renderer.start()
+        self.server = RenderServer(("127.0.0.1", 0), self.content, renderer, quiet=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=30)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        if self.server.renderer.pool is not None:
+            self.server.renderer.pool.shutdown()
+
+    def request(self, method: str, path: str, body: str | None = None) -> tuple[int, str, http.client.HTTPResponse]:
+        self.connection.request(method, path, body.encode() if body is not None else None)
+        response = self.connection.getresponse()
+        return response.status, response.read().decode(), response
+
+    def test_render_markdown(self):
+        status, body, response = self.request("POST", "/render", "# Hello\n\n[link](/about)")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, '<title>Hello</title><a href="/site/">home</a><div><h1>Hello</h1><p><a href="/site/about">link</a></p></div>')
+        self.assertIn("render;dur=", response.getheader("Server-Timing"))
+
+    def test_render_path(self):
+        status, body, _ = self.request("GET", "/render?path=blog/post.md")
+        self.assertEqual(status, 200)
+        self.assertIn("<h1>Post</h1><p>Some <i>text</i></p>", body)
+        status, _, _ = self.request("GET", "/render?path=../template.html")
+        self.assertEqual(status, 404)
+
+    def test_errors_and_metrics(self):
+        status, body, _ = self.request("POST", "/render", "no title here")
+        self.assertEqual(status, 400)
+        self.assertIn("There is no title", body)
+        self.request("POST", "/render", "# Fine")
+
+        status, body, _ = self.request("GET", "/metrics")
+        metrics = json.loads(body)
+        self.assertEqual((metrics["requests"], metrics["errors"]), (2, 1))
+        self.assertGreater(metrics["latency_ms"]["max"], 0)
+
+    def test_concurrent_requests(self):
+        results = {}
+
+        def render(i):
+            connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=30)
+            connection.request("POST", "/render", f"# Page {i}".encode())
+            results[i] = connection.getresponse().read().decode()
+            connection.close()
+
+        threads = [threading.Thread(target=render, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(20):
+            self.assertIn(f"<h1>Page {i}</h1>", results[i])
+
+
+    def test_invalid_utf8(self):
+        self.connection.request("POST", "/render", b"# Caf\xe9")
+        response = self.connection.getresponse()
+        self.assertEqual((response.status, response.read()), (400, b"The markdown must be UTF-8"))
+        status, _, _ = self.request("POST", "/render", "# Still up")
+        self.assertEqual(status, 200)
+
+    def test_invalid_content_length(self):
+        for length in ("abc", "-5"):
+            self.connection.putrequest("POST", "/render")
+            self.connection.putheader("Content-Length", length)
+            self.connection.endheaders()
+            response = self.connection.getresponse()
+            self.assertEqual((response.status, response.read()), (400, b"Invalid Content-Length"))
+            self.assertTrue(response.will_close)
+            self.connection.close()
+        status, _, _ = self.request("POST", "/render", "# Still up")
+        self.assertEqual(status, 200)
+
+    def test_render_timeout(self):
+        # a renderer that was never started leaves every request waiting
+        stalled = RenderServer(("127.0.0.1", 0), self.server.content_dir, Renderer(Path("template.html"), "/", 0), quiet=True,
+                               render_timeout=0.05)
+        threading.Thread(target=stalled.serve_forever, daemon=True).start()
+        connection = http.client.HTTPConnection("127.0.0.1", stalled.server_address[1], timeout=30)
+        try:
+            connection.request("POST", "/render", b"# Hello")
+            self.assertEqual(connection.getresponse().status, 504)
+        finally:
+            connection.close()
+            stalled.shutdown()
+            stalled.server_close()
+
+
+class TestRenderServerWorkers(TestRenderServer):
+    workers = 2
+
+    def test_dead_worker(self):
+        self.request("POST", "/render", "# Warm up")
+        for process in list(self.server.renderer.pool._processes.values()):
+            process.kill()
+            process.join()
+        # the pool only notices the dead worker once it is used again, so a request may fail on the way
+        with self.quiet():
+            statuses = [self.request("POST", "/render", f"# Page {i}")[0] for i in range(3)]
+        self.assertTrue(set(statuses) <= {200, 503}, statuses)
+        self.assertEqual(statuses[-1], 200)
+        self.assertTrue(self.server.renderer.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from manifest import BuildManifest, MANIFEST_NAME
+from shard import load_shard_manifests, parse_shard, shard_of
+
+MAIN = Path(__file__).resolve().parent / "main.py"
+
+class TestShard(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for text in ("0/4", "5/4", "1", "a/b", "1/2/3"):
+            with self.assertRaises(ValueError):
+                parse_shard(text)
+
+    def test_shard_of(self):
+        keys = [f"blog/post{i}/index.md" for i in range(200)]
+        shards = [shard_of(key, 4) for key in keys]
+        self.assertEqual(shards, [shard_of(key, 4) for key in keys])
+        self.assertEqual(set(shards), {1, 2, 3, 4})
+        self.assertTrue(all(shard_of(key, 1) == 1 for key in keys))
+
+    def test_missing_shard(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shard_dirs = []
+            for i in (1, 3):
+                shard_dir = Path(tmp) / f"{i}-of-3"
+                shard_dir.mkdir()
+                BuildManifest(shard_dir / MANIFEST_NAME, "t", "/", shard=f"{i}/3").save()
+                shard_dirs.append(shard_dir)
+            with self.assertRaisesRegex(Exception, "1/3, 3/3"):
+                load_shard_manifests(shard_dirs)
+            with self.assertRaisesRegex(Exception, "found: none"):
+                load_shard_manifests([])
+
+
+class TestShardedBuild(unittest.TestCase):
+    """Builds a site in N shards with separate processes, as separate hosts would, and merges them"""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.sharded = self.root / "sharded"
+        self.whole = self.root / "whole"
+        for site in (self.sharded, self.whole):
+            (site / "static" / "images").mkdir(parents=True)
+            (site / "static" / "index.css").write_text("body {}")
+            (site / "static" / "images" / "logo.png").write_bytes(b"png")
+            (site / "template.html").write_text('<title>{{ Title }}</title><link href="/index.css">{{ Content }}')
+            for i in range(30):
+                page = site / "content" / f"section{i % 4}" / f"page{i}" / "index.md"
+                page.parent.mkdir(parents=True)
+                page.write_text(f"# Page {i}\n\nSome **bold** text and a [link](/section{i % 4}/page{i + 1})")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_main(self, cwd: Path, *args: str) -> None:
+        subprocess.run([sys.executable, str(MAIN), *args], cwd=cwd, check=True, capture_output=True, text=True)
+
+    def outputs(self, docs: Path) -> dict[str, bytes]:
+        return {path.relative_to(docs).as_posix(): path.read_bytes()
+                for path in docs.rglob("*") if path.is_file() and path.name != MANIFEST_NAME}
+
+    def build_shards(self, count: int) -> None:
+        shards = [subprocess.Popen([sys.executable, str(MAIN), "/site/", "--shard", f"{i}/{count}"], cwd=self.sharded,
+                                   stdout=subprocess.DEVNULL) for i in range(1, count + 1)]
+        self.assertEqual([shard.wait() for shard in shards], [0] * count)
+
+    def test_merged_shards_match_whole_build(self):
+        self.run_main(self.whole, "/site/")
+        self.build_shards(3)
+        shard_pages = [len(BuildManifest.load(self.sharded / "shards" / f"{i}-of-3" / MANIFEST_NAME).pages) for i in (1, 2, 3)]
+        self.assertEqual(sum(shard_pages), 30)
+        self.assertTrue(all(shard_pages))
+
+        self.run_main(self.sharded, "merge")
+        self.assertEqual(self.outputs(self.sharded / "docs"), self.outputs(self.whole / "docs"))
+
+        # a page deleted from the content disappears from the merged output
+        (self.sharded / "content" / "section0" / "page0" / "index.md").unlink()
+        self.build_shards(3)
+        self.run_main(self.sharded, "merge")
+        self.assertFalse((self.sharded / "docs" / "section0" / "page0" / "index.html").exists())
+        self.assertEqual(len(BuildManifest.load(self.sharded / "docs" / MANIFEST_NAME).pages), 29)
+
+    def test_merge_without_shards_leaves_docs_alone(self):
+        self.run_main(self.whole, "/site/")
+        before = self.outputs(self.whole / "docs")
+        result = subprocess.run([sys.executable, str(MAIN), "merge"], cwd=self.whole, capture_output=True, text=True)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("found: none", result.stderr)
+        self.assertEqual(self.outputs(self.whole / "docs"), before)
+        self.assertEqual(len(BuildManifest.load(self.whole / "docs" / MANIFEST_NAME).pages), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import unittest
+
+from manifest import BuildManifest, MANIFEST_NAME
+from sync import copy_fd, files_match, sync_file, sync_files
+from tempsite import TempSiteTestCase
+
+class TestSync(TempSiteTestCase):
+    def setUp(self):
+        super().setUp()
+        (self.static / "images").mkdir()
+        (self.static / "index.css").write_text("body {}")
+        (self.static / "images" / "tom.png").write_bytes(bytes(range(256)) * 100)
+        self.manifest = BuildManifest.load(self.docs / MANIFEST_NAME)
+
+    def sync(self, **kwargs):
+        with self.quiet():
+            return sync_files(self.static, self.docs, self.manifest, **kwargs)
+
+    def test_first_sync_copies_everything(self):
+        self.assertEqual(self.sync(), (2, 0, 0))
+        self.assertEqual((self.docs / "images" / "tom.png").read_bytes(), (self.static / "images" / "tom.png").read_bytes())
+        self.assertEqual(self.manifest.static, ["images/tom.png", "index.css"])
+
+    def test_unchanged_files_are_skipped(self):
+        self.sync()
+        self.assertEqual(self.sync(), (0, 2, 0))
+        self.assertEqual(self.sync(checksum=True), (0, 2, 0))
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        (self.static / "index.css").write_text("body { color: red }")
+        self.assertEqual(self.sync(), (1, 1, 0))
+        self.assertEqual((self.docs / "index.css").read_text(), "body { color: red }")
+
+    def test_checksum_ignores_mtime(self):
+        self.sync()
+        os.utime(self.static / "index.css", ns=(0, 0))
+        self.assertFalse(files_match(self.static / "index.css", self.docs / "index.css"))
+        self.assertEqual(self.sync(checksum=True), (0, 2, 0))
+
+    def test_deleted_file_is_removed(self):
+        self.sync()
+        (self.static / "images" / "tom.png").unlink()
+        self.assertEqual(self.sync(), (0, 1, 1))
+        self.assertFalse((self.docs / "images").exists())
+
+    def test_hardlink(self):
+        self.sync(hardlink=True)
+        self.assertTrue((self.docs / "index.css").samefile(self.static / "index.css"))
+        self.assertEqual(self.sync(hardlink=True), (0, 2, 0))
+
+    def test_sync_file_keeps_mtime(self):
+        dest = self.docs / "copy.css"
+        sync_file(self.static / "index.css", dest)
+        self.assertEqual(dest.stat().st_mtime_ns, (self.static / "index.css").stat().st_mtime_ns)
+
+    def test_copy_fd(self):
+        src = self.static / "images" / "tom.png"
+        dest = self.docs / "tom.png"
+        with src.open("rb") as src_file, dest.open("wb") as dest_file:
+            copy_fd(src_file.fileno(), dest_file.fileno(), src.stat().st_size)
+        self.assertEqual(dest.read_bytes(), src.read_bytes())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from htmlnode import LeafNode, ParentNode
+from template import Template, base_path_rewriter, load_template
+
+class TestTemplate(unittest.TestCase):
+    def test_segments(self):
+        template = Template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        self.assertEqual(template.segments, ["<title>", "Title", "</title><body>", "Content", "</body>"])
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}")
+        content = ParentNode("p", [LeafNode("b", "hi")])
+        self.assertEqual(
+            template.render({"Title": "Home", "Content": content}),
+            "<title>Home</title><p><b>hi</b></p>",
+        )
+
+    def test_unknown_placeholder_is_kept(self):
+        template = Template("{{ Title }} {{ Other }}")
+        self.assertEqual(template.render({"Title": "Home"}), "Home {{ Other }}")
+
+    def test_write_matches_render(self):
+        template = Template('<link href="/index.css">{{ Content }}', "/site/")
+        values = {"Content": ParentNode("p", [LeafNode("a", "x", {"href": "/page"})])}
+        sink = io.StringIO()
+        template.write(sink, values)
+        self.assertEqual(sink.getvalue(), template.render(values))
+
+    def test_base_path_rewrites_template_and_nodes(self):
+        template = Template('<link href="/index.css"><a href="https://example.com">{{ Content }}', "/site/")
+        content = ParentNode("p", [
+            LeafNode("a", "page", {"href": "/blog/"}),
+            LeafNode("img", "", {"src": "/images/tom.png", "alt": "/tom"}),
+            LeafNode(None, 'text with href="/ in it'),
+        ])
+        self.assertEqual(
+            template.render({"Content": content}),
+            '<link href="/site/index.css"><a href="https://example.com">'
+            '<p><a href="/site/blog/">page</a><img src="/site/images/tom.png" alt="/tom"></img>text with href="/ in it</p>',
+        )
+
+    def test_base_path_rewriter(self):
+        self.assertIsNone(base_path_rewriter("/"))
+        rewrite = base_path_rewriter("/site/")
+        self.assertEqual(rewrite("/a.css"), "/site/a.css")
+        self.assertEqual(rewrite("https://example.com"), "https://example.com")
+
+    def test_load_template_cached_until_mtime_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "template.html"
+            path.write_text("one {{ Content }}")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+
+            path.write_text("two {{ Content }}")
+            os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000_000))
+            second = load_template(path)
+            self.assertIsNot(second, first)
+            self.assertEqual(second.segments[0], "two ")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -72,5 +72,9 @@ class TestTextNode(unittest.TestCase):
         node = TextNode("This is a failed test", None)
         self.assertRaises(Exception, text_node_to_html_node, node)
 
+    def test_no_instance_dict(self):
+        node = TextNode("text", TextType.TEXT)
+        self.assertFalse(hasattr(node, "__dict__"))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from generate_page import generate_pages_incremental
+from manifest import BuildManifest, MANIFEST_NAME
+from tempsite import TempSiteTestCase
+import watch
+from watch import Watcher, changed_files
+
+def touch(path: Path, text: str) -> None:
+    """Writes text and moves the mtime forward, so the change is seen even on coarse mtime filesystems"""
+    mtime = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(text)
+    os.utime(path, ns=(mtime + 1_000_000_000, mtime + 1_000_000_000))
+
+class TestWatcher(TempSiteTestCase):
+    pages = {"index.md": "# Home", "blog/post.md": "# Post"}
+
+    def setUp(self):
+        super().setUp()
+        (self.static / "index.css").write_text("body {}")
+
+        manifest = BuildManifest.load(self.docs / MANIFEST_NAME)
+        with self.quiet():
+            generate_pages_incremental(self.content, self.template, self.docs, "/", manifest)
+        self.watcher = Watcher(self.content, self.static, self.template, self.docs, "/", manifest)
+        self.addCleanup(self.watcher.close)
+
+    def poll(self) -> int:
+        with self.quiet():
+            return self.watcher.poll()
+
+    def test_changed_files(self):
+        old = {Path("a"): (1, 1), Path("b"): (1, 1)}
+        new = {Path("a"): (2, 1), Path("c"): (1, 1)}
+        self.assertEqual(changed_files(old, new), ([Path("a"), Path("c")], [Path("b")]))
+
+    def test_no_changes(self):
+        self.assertEqual(self.poll(), 0)
+
+    def test_markdown_change_renders_only_its_page(self):
+        before = (self.docs / "index.html").stat().st_mtime_ns
+        touch(self.content / "blog" / "post.md", "# Edited")
+        self.assertEqual(self.poll(), 1)
+        self.assertIn("<title>Edited</title>", (self.docs / "blog" / "post.html").read_text())
+        self.assertEqual((self.docs / "index.html").stat().st_mtime_ns, before)
+        self.assertEqual(BuildManifest.load(self.docs / MANIFEST_NAME).pages, self.watcher.manifest.pages)
+
+    def test_new_and_deleted_pages(self):
+        touch(self.content / "new.md", "# New")
+        (self.content / "blog" / "post.md").unlink()
+        self.assertEqual(self.poll(), 2)
+        self.assertTrue((self.docs / "new.html").exists())
+        self.assertFalse((self.docs / "blog").exists())
+
+    def test_template_change_renders_every_page(self):
+        touch(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(self.poll(), 2)
+        self.assertTrue((self.docs / "index.html").read_text().startswith("<h1>Home</h1>"))
+        self.assertTrue((self.docs / "blog" / "post.html").read_text().startswith("<h1>Post</h1>"))
+
+    def test_static_change_copies_only_that_file(self):
+        touch(self.static / "index.css", "body { color: red }")
+        self.assertEqual(self.poll(), 1)
+        self.assertEqual((self.docs / "index.css").read_text(), "body { color: red }")
+        (self.static / "index.css").unlink()
+        self.assertEqual(self.poll(), 1)
+        self.assertFalse((self.docs / "index.css").exists())
+
+    def test_invalid_page_does_not_stop_others(self):
+        touch(self.content / "index.md", "no title")
+        touch(self.content / "blog" / "post.md", "# Still fine")
+        # only the page that rendered counts as updated
+        self.assertEqual(self.poll(), 1)
+        self.assertIn("Still fine", (self.docs / "blog" / "post.html").read_text())
+
+    def test_new_moved_and_deleted_directories(self):
+        (self.content / "docs" / "deep").mkdir(parents=True)
+        touch(self.content / "docs" / "deep" / "page.md", "# Deep")
+        self.assertEqual(self.poll(), 1)
+        self.assertTrue((self.docs / "docs" / "deep" / "page.html").exists())
+        touch(self.content / "docs" / "deep" / "page.md", "# Deeper")
+        self.assertEqual(self.poll(), 1)
+        self.assertIn("Deeper", (self.docs / "docs" / "deep" / "page.html").read_text())
+        (self.content / "blog").rename(self.content / "news")
+        self.assertEqual(self.poll(), 2)
+        self.assertTrue((self.docs / "news" / "post.html").exists())
+        self.assertFalse((self.docs / "blog").exists())
+        (self.content / "news" / "post.md").unlink()
+        (self.content / "news").rmdir()
+        self.assertEqual(self.poll(), 1)
+        self.assertEqual(sorted(self.watcher.pages.files), [self.content / "docs" / "deep" / "page.md", self.content / "index.md"])
+
+
+class TestWatcherWithoutInotify(TestWatcher):
+    """The same changes, picked up by walking the sources on every poll"""
+    def setUp(self):
+        patcher = mock.patch.object(watch.Inotify, "open", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+        self.assertIsNone(self.watcher.pages.inotify)
+
+if __name__ == "__main__":
+    unittest.main()
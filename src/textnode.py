@@ -10,6 +10,9 @@ class TextType(Enum):
     IMAGE = "image"
 
 class TextNode():
+    # The inline tokenizer allocates one of these per text fragment, slots keep them compact
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
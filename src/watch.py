@@ -0,0 +1,326 @@
+import os
+import struct
+import time
+from pathlib import Path
+
+import fingerprint
+import searchindex
+from generate_page import generate_page, generate_pages_incremental, remove_stale_output
+from manifest import BuildManifest, hash_file
+from sync import sync_file
+
+# Seconds between polls. Kept well below the 100ms edit-to-refresh budget
+POLL_INTERVAL = 0.03
+
+# inotify event bits, from <sys/inotify.h>. A watched directory reports files being created, written,
+# touched, moved or deleted in it, and being moved or deleted itself
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x40, 0x80, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF = 0x400, 0x800
+IN_Q_OVERFLOW, IN_IGNORED = 0x4000, 0x8000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE \
+    | IN_DELETE_SELF | IN_MOVE_SELF
+# struct inotify_event without its name: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def changed_files(old: dict, new: dict) -> tuple[list[Path], list[Path]]:
+    """Returns the (added or modified, removed) paths between two snapshots"""
+    changed = [path for path, stat in new.items() if old.get(path) != stat]
+    removed = [path for path in old if path not in new]
+    return changed, removed
+
+
+class Inotify():
+    """
+    Linux's inotify, called through ctypes, reporting which of the watched directories had something change
+    in them. open returns None where it isn't available, e.g. on macOS
+    """
+    def __init__(self, libc, fd: int):
+        self.libc = libc
+        self.fd = fd
+        self.paths = {}
+        self.watches = {}
+
+    @staticmethod
+    def open() -> "Inotify | None":
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        return Inotify(libc, fd) if fd >= 0 else None
+
+    def watch(self, directory: Path) -> bool:
+        """Starts reporting changes in directory. False if it can't be watched, e.g. past fs.inotify.max_user_watches"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            return False
+        self.paths[wd] = directory
+        self.watches[directory] = wd
+        return True
+
+    def unwatch(self, directory: Path) -> None:
+        wd = self.watches.pop(directory, None)
+        # a directory moved within the tree keeps its watch, which may already be under its new path
+        if wd is not None and self.paths.get(wd) == directory:
+            del self.paths[wd]
+            # fails harmlessly when the directory is gone, the kernel has dropped the watch already
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def changed(self, root: Path) -> set[Path] | None:
+        """
+        The watched directories with changes since the last call. None when events were lost or root itself
+        went away, and everything has to be rescanned
+        """
+        directories = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return directories
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size + length
+                directory = self.paths.get(wd)
+                if mask & IN_Q_OVERFLOW or (directory == root and mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED)):
+                    return None
+                if directory is not None:
+                    directories.add(directory)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class SourceTree():
+    """
+    The (mtime_ns, size) of every file under root, optionally only those ending in suffix, in files. With
+    inotify, changes only rescans the directories it reported changes in, so an idle poll reads no
+    directories at all. Without it, every call walks the whole tree
+    """
+    def __init__(self, root: Path, suffix: str | None = None):
+        self.root = root
+        self.suffix = suffix
+        self.inotify = Inotify.open() if root.is_dir() else None
+        self.files = {}
+        # (files, subdirectories) directly inside each directory of the tree
+        self.dirs = {}
+        # how long the last walk of the whole tree took
+        self.walk_seconds = 0.0
+        self.add_tree(root)
+
+    def scan(self, directory: Path) -> tuple[dict[Path, tuple[int, int]], set[Path]]:
+        """The files and subdirectories directly inside directory"""
+        files = {}
+        subdirs = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirs.add(Path(entry.path))
+                    elif entry.is_file() and (self.suffix is None or entry.name.endswith(self.suffix)):
+                        stat = entry.stat()
+                        files[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        return files, subdirs
+
+    def add_tree(self, directory: Path) -> list[Path]:
+        """Adds directory and everything under it, returning the files found"""
+        added = []
+        stack = [directory]
+        while stack:
+            directory = stack.pop()
+            # watched before it is scanned, so a file created in between is still reported
+            if self.inotify is not None and not self.inotify.watch(directory) and directory.is_dir():
+                print(f"Can't watch {directory}, falling back to scanning {self.root} on every poll")
+                self.inotify.close()
+                self.inotify = None
+            files, subdirs = self.scan(directory)
+            self.files.update(files)
+            self.dirs[directory] = (set(files), subdirs)
+            added.extend(files)
+            stack.extend(subdirs)
+        return added
+
+    def remove_tree(self, directory: Path) -> list[Path]:
+        """Drops directory and everything under it, returning the files dropped"""
+        removed = []
+        stack = [directory]
+        while stack:
+            directory = stack.pop()
+            if self.inotify is not None:
+                self.inotify.unwatch(directory)
+            files, subdirs = self.dirs.pop(directory, ((), ()))
+            for path in files:
+                del self.files[path]
+            removed.extend(files)
+            stack.extend(subdirs)
+        return removed
+
+    def changes(self) -> tuple[list[Path], list[Path]]:
+        """Returns the (added or modified, removed) files since the last call"""
+        directories = self.inotify.changed(self.root) if self.inotify is not None else None
+        if directories is None:
+            start = time.perf_counter()
+            old = self.files
+            if self.inotify is not None:
+                self.inotify.close()
+            self.inotify = Inotify.open() if self.root.is_dir() else None
+            self.files = {}
+            self.dirs = {}
+            self.add_tree(self.root)
+            self.walk_seconds = time.perf_counter() - start
+            return changed_files(old, self.files)
+
+        changed = []
+        removed = []
+        for directory in directories:
+            if directory not in self.dirs:
+                # under a directory dropped earlier in this loop
+                continue
+            old_files, old_subdirs = self.dirs[directory]
+            files, subdirs = self.scan(directory)
+            for path, stat in files.items():
+                if self.files.get(path) != stat:
+                    self.files[path] = stat
+                    changed.append(path)
+            for path in old_files - files.keys():
+                del self.files[path]
+                removed.append(path)
+            self.dirs[directory] = (set(files), subdirs)
+            for subdir in old_subdirs - subdirs:
+                removed.extend(self.remove_tree(subdir))
+            for subdir in subdirs - old_subdirs:
+                changed.extend(self.add_tree(subdir))
+        return changed, removed
+
+    def close(self) -> None:
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+class Watcher():
+    """
+    Keeps the output directory in sync with the sources by polling them, see SourceTree. Changes are mapped onto the
+    outputs that depend on them: the template feeds every page, a markdown file only its own page and a
+    static file only its copy (and, with fingerprinting, the pages), so each change re-renders as little as possible
+    """
+    def __init__(self, content_dir: Path, static_dir: Path, template_path: Path, dest_dir: Path, base_path: str, manifest: BuildManifest,
+                 compress: tuple[str, ...] | None = None):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.dest_dir = dest_dir
+        self.base_path = base_path
+        self.manifest = manifest
+        # codecs of the precompressed sidecars kept up to date, see compress.py
+        self.compress = compress
+        self.pages = SourceTree(content_dir, ".md")
+        self.static = SourceTree(static_dir)
+        self.template = self.template_stat()
+
+    def template_stat(self) -> tuple[int, int] | None:
+        try:
+            stat = self.template_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def page_dest(self, from_path: Path) -> Path:
+        return self.dest_dir / from_path.relative_to(self.content_dir).with_suffix(".html")
+
+    def page_url(self, from_path: Path) -> str:
+        return searchindex.page_url(self.base_path, self.page_dest(from_path).relative_to(self.dest_dir).as_posix())
+
+    def poll(self) -> int:
+        """Checks the sources once and rebuilds whatever depends on a change. Returns the number of outputs updated"""
+        updated = 0
+
+        template = self.template_stat()
+        changed, removed = self.pages.changes()
+        if template != self.template:
+            self.template = template
+            if template is not None:
+                print(f"{self.template_path} changed, rebuilding every page")
+                # the manifest no longer matches the template, so every page is dirty
+                updated += len(generate_pages_incremental(self.content_dir, self.template_path, self.dest_dir, self.base_path, self.manifest))
+        else:
+            searchindex.collected = {}
+            searchindex.seconds = 0.0
+            for from_path in changed:
+                dest_path = self.page_dest(from_path)
+                try:
+                    generate_page(from_path, self.template_path, dest_path, self.base_path)
+                except Exception as e:
+                    # a half-written or invalid page shouldn't stop the others, the next save retries it
+                    print(f"Failed to render {from_path}: {e}")
+                    continue
+                key = from_path.relative_to(self.content_dir).as_posix()
+                self.manifest.pages[key] = {"hash": hash_file(from_path), "dest": dest_path.relative_to(self.dest_dir).as_posix()}
+                updated += 1
+            for from_path in removed:
+                remove_stale_output(self.page_dest(from_path), self.dest_dir)
+                self.manifest.pages.pop(from_path.relative_to(self.content_dir).as_posix(), None)
+            if searchindex.enabled and (changed or removed):
+                searchindex.write_index(
+                    searchindex.SearchIndex.load(self.dest_dir / searchindex.SEARCH_INDEX_NAME),
+                    {self.page_url(from_path): page for from_path, page in searchindex.collected.items()},
+                    [self.page_url(from_path) for from_path in removed],
+                )
+            if changed or removed:
+                self.manifest.save()
+            updated += len(removed)
+
+        changed, removed = self.static.changes()
+        for path in changed:
+            print(f"Copying {path}")
+            sync_file(path, self.dest_dir / path.relative_to(self.static_dir))
+        for path in removed:
+            remove_stale_output(self.dest_dir / path.relative_to(self.static_dir), self.dest_dir)
+        if changed or removed:
+            self.manifest.static = sorted(path.relative_to(self.static_dir).as_posix() for path in self.static.files)
+            if fingerprint.current is not None:
+                # a new version of an asset gets a new name, which every page referencing it has to pick up
+                key = fingerprint.current_key
+                fingerprint.fingerprint_assets(self.static_dir, self.dest_dir, self.manifest)
+                if fingerprint.current_key != key:
+                    print("Fingerprinted static files changed, rebuilding every page")
+                    updated += len(generate_pages_incremental(self.content_dir, self.template_path, self.dest_dir, self.base_path, self.manifest))
+            self.manifest.save()
+        updated += len(changed) + len(removed)
+
+        if updated and self.compress:
+            from compress import compress_outputs
+            # the edit loop is about latency, a single process is quicker for a handful of outputs
+            compress_outputs(self.dest_dir, self.compress, jobs=1, static=self.manifest.static)
+        return updated
+
+    def run(self) -> None:
+        """Polls until interrupted, reporting how long each rebuild took. Stops watching the sources when it returns"""
+        print(f"Watching {self.content_dir}, {self.static_dir} and {self.template_path} for changes. Press Ctrl+C to stop")
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    updated = self.poll()
+                except Exception as e:
+                    # e.g. a broken template, the watcher keeps going until the next save fixes it
+                    print(f"Rebuild failed: {e}")
+                    updated = 0
+                if updated:
+                    print(f"Updated {updated} outputs in {(time.perf_counter() - start) * 1000:.0f}ms")
+                # without inotify every poll walks the sources, so a large tree gets at least as long to rest
+                # as the walk took, rather than keeping a core busy
+                time.sleep(max(POLL_INTERVAL, self.pages.walk_seconds + self.static.walk_seconds))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.pages.close()
+        self.static.close()